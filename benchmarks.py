@@ -1,5 +1,10 @@
 import time
+import asyncio
+import tracemalloc
+import multiprocessing
 from easydb import pda
+from easydb import aio
+from easydb import flat
 from random import randrange
 from argparse import ArgumentParser
 
@@ -16,7 +21,8 @@ class TestModel(pda.Table):
             .integer('aId', True, True, True) \
             .text('aKey', 64, True, True) \
             .text('aString') \
-            .integer('aInt')
+            .integer('aInt') \
+            .index('aInt')
 
 
 class DBBenchmark():
@@ -119,6 +125,13 @@ class DBBenchmark():
         result = self._table.where('aInt', 100, '>=').where('aInt', 200, '<').count()
         self.timeDiff(timerStart, f" {result} counted in ")
 
+        # --- SCAN AND COUNT ---
+
+        timerStart = time.time()
+        print(f"{capt}scan and count rows:", end="")
+        result = self._table.where('aString', 'a%', 'like').where('aKey', 'n', '>=').count()
+        self.timeDiff(timerStart, f" {result} counted in ")
+
         # --- DELETE ---
 
         print(f"{capt}delete {rows} rows in:", end="")
@@ -139,6 +152,174 @@ class DBBenchmark():
 
         self.timeDiff(timerStart, ' ')
 
+        # --- BULK WRITE ---
+
+        print(f"{capt}insert {rows} rows in batches in:", end="")
+        bulk = [{'aKey': self.generateText(50), 'aString': self.generateText(100), 'aInt': i} for i in range(1, rows)]
+        timerStart = time.time()
+        self._table.insert_many(bulk, batch_size=500)
+        self.timeDiff(timerStart, ' ')
+
+
+def sequenceWorker(datapath: str, dbname: str, rows: int, block: int):
+    db = flat.FlatDatabase(datapath, dbname, sequence_block=block).connect()
+    table = flat.FlatTable(db, 'SequenceBenchmark', 'aId integer primary_key autoincrement, aInt integer')
+
+    for i in range(rows):
+        table.insert({'aInt': i})
+
+    db.release_sequences()
+
+
+def sequenceBenchmark(rows: int = 1000, processes: int = 4, datapath: str = 'tests/data', dbname: str = 'flat.db'):
+    print(f"Benchmarks for Flatfile autoincrement with {processes} processes")
+
+    for block in (1, 100):
+        db = flat.FlatDatabase(datapath, dbname).connect()
+
+        if db.table_exists('SequenceBenchmark'):
+            db.drop_table('SequenceBenchmark')
+
+        db.create_table('SequenceBenchmark')
+        print(f"   + insert {rows} rows per process, sequence block {block}:", end="")
+        timerStart = time.time()
+        workers = [multiprocessing.Process(target=sequenceWorker, args=(datapath, dbname, rows, block)) for i in range(processes)]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+        td = round((time.time() - timerStart), 5)
+        print(f" {td} secs")
+        db.drop_table('SequenceBenchmark')
+
+
+def statementBenchmark(rows: int = 1000, dbtype: str = 'SQ3', **kwargs):
+    try:
+        if dbtype == 'SQ3':
+            print("Benchmarks for the statement cache, SQLite in memory")
+            pda.Database('statements').db_sq3(':memory:')
+        else:
+            print("Benchmarks for the statement cache and prepared statements, MySQL")
+            pda.Database('statements').db_msq(kwargs.get('host', 'localhost'), kwargs.get('dbname'),
+                                              kwargs.get('dbuser', 'db_test'), kwargs.get('dbpass', 'db_password'))
+
+        TestModel(database='statements').drop()
+        table = TestModel(database='statements')
+    except:
+        print("   + not connected to a database !")
+        return
+
+    for cached in (False, True):
+        print(f"   + insert and find {rows} rows, {'cached' if cached else 'built per call'}:", end="")
+        instance = table.instance
+
+        if not cached:
+            instance._hotcursor = lambda sql: instance._cursor  # the plain cursor, no prepared statements
+        else:
+            del instance._hotcursor
+
+        timerStart = time.time()
+
+        for i in range(1, rows):
+            if not cached:
+                instance._statements.clear()
+
+            key = i if cached else i + rows
+            table.insert({'aId': key, 'aKey': f"key{key}", 'aString': 'statement', 'aInt': i})
+            table.find(key)
+
+        td = time.time() - timerStart
+        print(f" {round(td, 5)} secs, {round(td / rows * 1000000, 1)} usecs per call")
+
+
+def rowformatBenchmark(rows: int = 1000):
+    print(f"Benchmarks for row formats, SQLite in memory, findall of {rows} rows")
+    pda.Database('rowformats').db_sq3(':memory:')
+    table = TestModel(database='rowformats')
+    table.insert_many({'aKey': f"key{i}", 'aString': 'rowformat', 'aInt': i} for i in range(rows))
+
+    for rowformat in pda.ROWFORMATS:
+        timerStart = time.time()
+        table.rowformat(rowformat).findall()
+        td = time.time() - timerStart
+        tracemalloc.start()  # a second run, tracing slows it down
+        result = table.rowformat(rowformat).findall()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        print(f"   + {rowformat}: {round(td, 5)} secs, {round(size / 1048576, 1)} MB result, "
+              f"{round(peak / 1048576, 1)} MB peak")
+
+
+def columnsBenchmark(rows: int = 1000):
+    if pda.numpy is None:
+        print("Benchmarks for columnar fetch skipped, numpy not installed")
+        return
+
+    print(f"Benchmarks for columnar fetch, SQLite in memory, {rows} rows into numpy arrays")
+    pda.Database('columns').db_sq3(':memory:')
+    table = TestModel(database='columns')
+    table.insert_many({'aKey': f"key{i}", 'aString': 'columns', 'aInt': i} for i in range(rows))
+
+    def from_dicts():
+        result = table.findall()
+        return {column: pda.numpy.array([row[column] for row in result]) for column in ('aId', 'aInt')}
+
+    def from_columns():
+        return table.findall_columns('aId, aInt')
+
+    for caption, fetch in (('findall and convert', from_dicts), ('findall_columns', from_columns)):
+        timerStart = time.time()
+        fetch()
+        td = time.time() - timerStart
+        tracemalloc.start()
+        result = fetch()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        print(f"   + {caption}: {round(td, 5)} secs, {round(size / 1048576, 1)} MB result, "
+              f"{round(peak / 1048576, 1)} MB peak")
+
+
+def asyncBenchmark(rows: int = 1000, workers: int = 4, datapath: str = 'tests/data'):
+    print(f"Benchmarks for the asyncio api, SQLite with {workers} workers")
+    pda.Database('asyncbench').db_sq3(f"{datapath}/asyncbench.db")
+    adb = aio.AsyncDatabase('asyncbench', workers=workers)
+
+    async def run():
+        await adb.table(TestModel).drop()
+        await adb.table(TestModel).insert_many({'aKey': f"key{i}", 'aString': 'async', 'aInt': i} for i in range(1, rows))
+        lag = 0.0
+        done = False
+
+        async def ticker():  # measures how long the event loop is blocked
+            nonlocal lag
+
+            while not done:
+                tick = time.time()
+                await asyncio.sleep(0.001)
+                lag = max(lag, time.time() - tick - 0.001)
+
+        tick_task = asyncio.create_task(ticker())
+        timerStart = time.time()
+        requests = asyncio.Semaphore(100)  # requests in flight, like a busy server
+
+        async def request(key):
+            async with requests:
+                return await adb.table(TestModel).find(key)
+
+        await asyncio.gather(*(request(i) for i in range(1, rows)))
+        td = time.time() - timerStart
+        done = True
+        await tick_task
+        print(f"   + find {rows} rows, 100 requests in flight: {round(td, 5)} secs, event loop blocked {round(lag * 1000, 1)} ms at most")
+
+    asyncio.run(run())
+    adb.close()
+
 
 parser = ArgumentParser()
 parser.add_argument("-r", "--rows", dest="rows",  default=1000, help="set no. of rows to generate and process")
@@ -161,3 +342,10 @@ del bm
 bm = DBBenchmark('FLAT', 'Benchmarks for Flatfile Database', dbname='flat.db')
 bm.executeBenchmarks(rows)
 del bm
+
+sequenceBenchmark(rows)
+statementBenchmark(rows)
+statementBenchmark(rows, 'MSQ', dbname='db_test')
+rowformatBenchmark(rows)
+columnsBenchmark(rows)
+asyncBenchmark(rows)
@@ -0,0 +1,436 @@
+"""
+module v1.3.1
+asyncio facade for the Data-Access-Layer, the blocking drivers run on a bounded thread pool
+"""
+
+import asyncio
+import functools
+import itertools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from . import pda
+
+ASYNC_WORKERS: int = 10
+
+
+class AsyncDatabase():
+    """
+    runs the operations of a database on a thread pool of its own. a mysql or sqlite database needs a connection
+    pool, set up with Database.pool() or with pool=True, the workers should not exceed its connections.
+    a sqlite ':memory:' database cannot be pooled, every connection would open a database of its own
+    """
+    __db: pda.Database = None
+    __executor: ThreadPoolExecutor = None
+
+    def __init__(self, name: str = pda.DEFAULT_DATABASE, workers: int = ASYNC_WORKERS, timeout: float = 30.0,
+                 pool: bool = False):
+        """
+        init class
+        -
+        - name: the name of the database, which is set up already
+        - workers: number of threads
+        - timeout: seconds to wait for a connection of the pool
+        - pool: replace the single connection of the database with a pool of a connection per worker, the
+          synchronous tables of the database use the pool as well
+        """
+        if not pda.Database.isinitialized(name):
+            raise pda.PDAException(f"no database connection found for database {name}")
+
+        self.__db = pda.Database(name)
+
+        if self.__db.dbtype() in ('SQ3', 'MSQ') and not self.__db.pooled():
+            if self.__db.dbtype() == 'SQ3' and self.__db.name() in ('', ':memory:'):
+                raise pda.PDAException(f"sqlite memory database {name} cannot be used by the thread pool")
+
+            if pool is not True:
+                raise pda.PDAException(f"database {name} has no connection pool, call pool() first or pass pool=True")
+
+            self.__db.pool(minsize=1, maxsize=workers, timeout=timeout)
+
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"easydb-{name}")
+
+    def database(self) -> pda.Database:
+        """
+        returns the database
+        """
+        return self.__db
+
+    async def run(self, function, *args, **kwargs):
+        """
+        runs a blocking function on the thread pool and returns its result
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(function, *args, **kwargs))
+
+    async def execute(self, stmt: str, params=None) -> bool:
+        """
+        executes a database sql statement
+        -
+        - stmt: the sql statement
+        - params: sql parameters
+        """
+        return await self.run(self.__db.execute, stmt, params)
+
+    def table(self, model, *args, **kwargs):
+        """
+        returns an async table for a pda.Table model class of the database
+        -
+        - model: the pda.Table subclass
+        - args, kwargs: passed on to the model
+        """
+        return AsyncTable(self, model, *args, **kwargs)
+
+    def close(self):
+        """
+        waits for the running operations and stops the thread pool
+        """
+        self.__executor.shutdown(wait=True)
+
+
+class AsyncTable():
+    """
+    asyncio facade of a pda.Table. the chain functions are collected and applied on the thread pool together with
+    the query, the table is set up there on first use. the operations of a table run one after another in a context
+    of the table, so a transaction keeps its connection from begintransaction() until commit or rollback
+    """
+    __db: AsyncDatabase = None
+    __model = None
+    __args: tuple = ()
+    __kwargs: dict = {}
+    __table: pda.Table = None
+    __chain: list = []
+    __context: contextvars.Context = None
+    __lock: asyncio.Lock = None
+
+    def __init__(self, database: AsyncDatabase, model, *args, **kwargs):
+        """
+        init class
+        -
+        - database: the async database
+        - model: the pda.Table subclass
+        - args, kwargs: passed on to the model
+        """
+        self.__db = database
+        self.__model = model
+        self.__args = args
+        self.__kwargs = {'database': database.database().alias(), **kwargs}
+        self.__table = None
+        self.__chain = []
+        self.__context = contextvars.copy_context()
+        self.__lock = asyncio.Lock()
+
+    def __prepare(self, chain: list) -> pda.Table:
+        if self.__table is None:
+            self.__table = self.__model(*self.__args, **self.__kwargs)
+
+        for method, args in chain:
+            getattr(self.__table, method)(*args)
+
+        return self.__table
+
+    async def __call(self, method: str, *args, **kwargs):
+        chain, self.__chain = self.__chain, []
+
+        def call():
+            return getattr(self.__prepare(chain), method)(*args, **kwargs)
+
+        async with self.__lock:
+            return await self.__db.run(self.__context.run, call)
+
+    def where(self, field: str, value: any, compare: str = '=', conditional: str = 'and'):
+        """
+        chain function
+        -
+        - field: field name in the table
+        - value: the value
+        - compare: operator
+        - conditional: operator
+        """
+        self.__chain.append(('where', (field, value, compare, conditional)))
+        return self
+
+    def limit(self, limit: int = 0):
+        """
+        chain function
+        -
+        - limit: limit of the selection
+        """
+        self.__chain.append(('limit', (limit, )))
+        return self
+
+    def offset(self, offset: int = 0):
+        """
+        chain function
+        -
+        - offset: sets the selections offset
+        """
+        self.__chain.append(('offset', (offset, )))
+        return self
+
+    def orderby(self, fields: str, direction: str = 'ASC'):
+        """
+        chain function
+        -
+        - fields: comma separated list of fields
+        - direction: ASC or DESC
+        """
+        self.__chain.append(('orderby', (fields, direction)))
+        return self
+
+    def rowformat(self, rowformat: str = pda.ROWFORMAT_DICT):
+        """
+        chain function
+        -
+        - rowformat: format of the rows of the next query
+        """
+        self.__chain.append(('rowformat', (rowformat, )))
+        return self
+
+    async def create(self, sql: str):
+        """
+        creates the table
+        """
+        await self.__call('create', sql)
+        return self
+
+    async def drop(self):
+        """
+        drops the table
+        """
+        await self.__call('drop')
+        return self
+
+    async def insert(self, data: dict, empty_is_null: bool = True) -> bool:
+        """
+        inserts a row
+        """
+        return await self.__call('insert', data, empty_is_null)
+
+    async def insert_many(self, rows, batch_size: int = 1000, empty_is_null: bool = True, on_insert_error=None) -> bool:
+        """
+        inserts rows in batches, on_insert_error is called on the thread pool
+        """
+        return await self.__call('insert_many', rows, batch_size, empty_is_null, on_insert_error)
+
+    async def update(self, key, data: dict) -> bool:
+        """
+        updates a single row
+        """
+        return await self.__call('update', key, data)
+
+    async def updateall(self, data: dict) -> bool:
+        """
+        updates the selected rows
+        """
+        return await self.__call('updateall', data)
+
+    async def delete(self, key) -> bool:
+        """
+        deletes a row
+        """
+        return await self.__call('delete', key)
+
+    async def deleteall(self) -> bool:
+        """
+        deletes the selected rows
+        """
+        return await self.__call('deleteall')
+
+    async def find(self, key):
+        """
+        finds a single row by its primary key
+        """
+        return await self.__call('find', key)
+
+    async def find_many(self, keys, chunk_size: int = 500) -> dict:
+        """
+        finds rows by their primary keys
+        """
+        return await self.__call('find_many', keys, chunk_size)
+
+    async def count(self, select: str = '', prepared_params: tuple = ()) -> int:
+        """
+        counts the selected rows
+        """
+        return await self.__call('count', select, prepared_params)
+
+    async def findfirst(self, select: str = '', prepared_params: tuple = ()):
+        """
+        finds the first selected row
+        """
+        return await self.__call('findfirst', select, prepared_params)
+
+    async def findall(self, select: str = '', prepared_params: tuple = (), fetchone: bool = False):
+        """
+        finds the selected rows
+        """
+        return await self.__call('findall', select, prepared_params, fetchone)
+
+    async def findall_columns(self, columns='', batch_size: int = 10000) -> dict:
+        """
+        finds the selected rows and returns a numpy array per column
+        """
+        return await self.__call('findall_columns', columns, batch_size)
+
+    async def iterall(self, select: str = '', prepared_params: tuple = (), batch_size: int = 1000):
+        """
+        finds the selected rows and yields them one by one. the rows are fetched on the thread pool batch_size rows
+        at a time, the table is reserved for each fetch only, so the consumer can await other operations of the
+        table. the stream runs in a copy of the table context, its connection is not used by those operations
+        """
+        chain, self.__chain = self.__chain, []
+        context = self.__context.copy()
+
+        def stream():
+            return self.__prepare(chain).iterall(select, prepared_params, batch_size)
+
+        def fetch(rows):
+            return list(itertools.islice(rows, batch_size))
+
+        async with self.__lock:
+            rows = await self.__db.run(context.run, stream)
+
+        try:
+            while True:
+                async with self.__lock:
+                    batch = await self.__db.run(context.run, fetch, rows)
+
+                if not batch:
+                    break
+
+                for row in batch:
+                    yield row
+        finally:
+            async with self.__lock:
+                await self.__db.run(context.run, rows.close)
+
+    async def begintransaction(self):
+        """
+        starts a transaction, it keeps its connection until commit or rollback
+        """
+        await self.__call('begintransaction')
+        return self
+
+    async def committransaction(self):
+        """
+        commits a transaction
+        """
+        await self.__call('committransaction')
+        return self
+
+    async def rollbacktransaction(self):
+        """
+        rolls back a transaction
+        """
+        await self.__call('rollbacktransaction')
+        return self
+
+    async def import_csv(self, **kwargs) -> bool:
+        """
+        imports a csv file, see pda.Table.import_csv
+        """
+        return await self.__call('import_csv', **kwargs)
+
+    async def export_csv(self, **kwargs) -> int:
+        """
+        exports the selected rows into a csv file, see pda.Table.export_csv
+        """
+        return await self.__call('export_csv', **kwargs)
+
+
+class AsyncFindLoader():
+    """
+    coalesces the find() calls of tasks on a table. the keys requested within one event loop iteration, or a window,
+    are fetched with a single find_many, every key once, and each caller gets its row
+    """
+    __db: AsyncDatabase = None
+    __model = None
+    __kwargs: dict = {}
+    __window: float = 0.0
+    __max_batch: int = 500
+    __batch: dict = None
+    __loads: set = set()
+    __requests: int = 0
+    __queries: int = 0
+
+    def __init__(self, database: AsyncDatabase, model, window: float = 0.0, max_batch: int = 500, **kwargs):
+        """
+        init class
+        -
+        - database: the async database
+        - model: the pda.Table subclass
+        - window: seconds to collect keys before they are fetched, 0 collects the keys of one loop iteration
+        - max_batch: number of keys which are fetched right away
+        - kwargs: passed on to the model
+        """
+        self.__db = database
+        self.__model = model
+        self.__kwargs = kwargs
+        self.__window = window
+        self.__max_batch = max_batch
+        self.__batch = None
+        self.__loads = set()
+        self.__requests = 0
+        self.__queries = 0
+
+    async def find(self, key):
+        """
+        finds a single row by its primary key together with the keys of other tasks
+        - key: the primary key of the table
+        - return: the row, None when not found, False when database exception
+        """
+        loop = asyncio.get_running_loop()
+        self.__requests += 1
+        batch = self.__batch
+
+        if batch is None:
+            batch = self.__batch = {}
+
+            if self.__window > 0:
+                loop.call_later(self.__window, self.__dispatch, batch)
+            else:
+                loop.call_soon(self.__dispatch, batch)
+
+        normalized = pda.FindLoader.normalize(key)
+
+        if normalized not in batch:
+            batch[normalized] = (key, loop.create_future())
+
+        future = batch[normalized][1]
+
+        if len(batch) >= self.__max_batch:
+            self.__dispatch(batch)
+
+        return await asyncio.shield(future)  # a cancelled caller must not cancel the row of the others
+
+    def __dispatch(self, batch: dict):
+        if self.__batch is not batch:  # dispatched already when it got full
+            return
+
+        self.__batch = None
+        self.__queries += 1
+        load = asyncio.ensure_future(self.__load(batch))
+        self.__loads.add(load)
+        load.add_done_callback(self.__loads.discard)
+
+    async def __load(self, batch: dict):
+        try:
+            keys = [key for key, future in batch.values()]
+            rows = await self.__db.table(self.__model, **self.__kwargs).find_many(keys, self.__max_batch)
+
+            if rows is not False:
+                rows = {pda.FindLoader.normalize(row_key): row for row_key, row in rows.items()}
+
+            for normalized, (key, future) in batch.items():  # pylint: disable=unused-variable
+                if not future.done():
+                    future.set_result(False if rows is False else rows.get(normalized))
+        except Exception as pdaex:  # pylint: disable=broad-except
+            for key, future in batch.values():
+                if not future.done():
+                    future.set_exception(pdaex)
+
+    def statistics(self) -> dict:
+        """
+        returns the number of find requests and of the queries they needed
+        """
+        return {'requests': self.__requests, 'queries': self.__queries}
@@ -1,15 +1,40 @@
 """
-module v1.2.0
+module v1.3.0
 Flatfile database
 """
 
 import os
+import atexit
 import shutil
 import fcntl
 import json
 import re
+import bisect
+import hashlib
+import itertools
+import operator
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+STORAGE_FILE = 'file'
+STORAGE_SEGMENT = 'segment'
+SEGMENT_SIZE = 64 * 1024 * 1024
+LAYOUT_FLAT = 'flat'
+LAYOUT_SHARDED = 'sharded'
+PARALLEL_MIN_ROWS = 10000
+READ_THREADS = 16
+
+COMPARE_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le
+}
+
 
 class FlatException(Exception):
     """
@@ -44,17 +69,36 @@ class FlatDatabase():
     __fullpath: str = ''
     __master: str = ''
     __connected: bool = False
-
-    def __init__(self, path: str, name: str):
+    __storage: str = STORAGE_FILE
+    __layout: str = LAYOUT_FLAT
+    __workers: int = 0
+    __executor: ProcessPoolExecutor = None
+    __sequence_block: int = 1
+    __sequences: dict = {}
+    __sequence_lock: threading.Lock = None
+
+    def __init__(self, path: str, name: str, storage: str = STORAGE_FILE, layout: str = LAYOUT_FLAT, workers: int = 0,
+                 sequence_block: int = 1):
         """
         init class
         -
         - path: the path to the database
         - name: the name of the database
+        - storage: default storage for new tables, 'file' (one file per row) or 'segment' (append only segments)
+        - layout: default layout for new file tables, 'flat' (one directory) or 'sharded' (hash prefix directories)
+        - workers: number of processes to scan tables with PARALLEL_MIN_ROWS or more rows, 0 or 1 scans sequentially
+        - sequence_block: number of autoincrement values a process reserves at once
         """
         self.__path = path
         self.__name = name
         self.__connected = False
+        self.__storage = storage
+        self.__layout = layout
+        self.__workers = workers
+        self.__executor = None
+        self.__sequence_block = max(1, sequence_block)
+        self.__sequences = {}
+        self.__sequence_lock = threading.Lock()  # threads of a process share its blocks
         self.__fullpath = f"{self.__path}{os.sep}{self.__name}"
         self.__master = f"{self.__fullpath}{os.sep}.flat_database_master"
 
@@ -64,6 +108,9 @@ class FlatDatabase():
         if not self.database_exists():
             self.create_database()
 
+    def __del__(self):
+        self.release_sequences()
+
     def connect(self):
         """
         connects to the database
@@ -103,21 +150,74 @@ class FlatDatabase():
         """
         return self.__fullpath
 
-    def create_table(self, name: str):
+    def master(self) -> str:
+        """
+        returns the path of the database master directory
+        -
+        """
+        return self.__master
+
+    def path(self) -> str:
+        """
+        returns the path to the database
+        -
+        """
+        return self.__path
+
+    def name(self) -> str:
+        """
+        returns the name of the database
+        -
+        """
+        return self.__name
+
+    def workers(self) -> int:
+        """
+        returns the number of processes for parallel scans
+        -
+        """
+        return self.__workers
+
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        returns the process pool for parallel scans, which is started on first use
+        -
+        """
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=self.__workers)
+
+        return self.__executor
+
+    def create_table(self, name: str, storage: str = '', layout: str = ''):
         """
         creates a table in the database
         -
         - name: the name of the table
+        - storage: 'file' or 'segment', default: the databases storage
+        - layout: 'flat' or 'sharded' for file storage, default: the databases layout
         """
         if self.__connected is False:
             raise FlatDBException("not connected to database")
 
+        if not storage:
+            storage = self.__storage
+
+        if storage not in (STORAGE_FILE, STORAGE_SEGMENT):
+            raise FlatDBException(f"unknown storage {storage} for table {name}")
+
+        if not layout:
+            layout = self.__layout if storage == STORAGE_FILE else LAYOUT_FLAT
+
+        if layout not in (LAYOUT_FLAT, LAYOUT_SHARDED) or (storage == STORAGE_SEGMENT and layout != LAYOUT_FLAT):
+            raise FlatDBException(f"layout {layout} not supported for table {name}")
+
         location = f"{self.__fullpath}{os.sep}{name}{os.sep}"
 
         if os.path.exists(location):
             raise FlatDBException(f"table {name} does already exist")
 
         Path(location).mkdir()
+        self.__sequences.pop(name, None)
 
         sequence = f"{self.__master}{os.sep}.sequence_{name}"
 
@@ -125,6 +225,29 @@ class FlatDatabase():
             sequence = 0
             file.write(str(sequence))
 
+        properties = f"{self.__master}{os.sep}.table_{name}"
+
+        with open(properties, "w", encoding="utf-8") as file:
+            json.dump({'storage': storage, 'layout': layout}, file)
+
+        self.write_statistics(name, {'rows': 0, 'cardinality': {}})
+
+    def table_properties(self, name: str) -> dict:
+        """
+        returns the properties of a table, tables created prior to v1.3.0 have none
+        -
+        - name: the name of the table
+        """
+        properties = {'storage': STORAGE_FILE, 'layout': LAYOUT_FLAT}
+
+        try:
+            with open(f"{self.__master}{os.sep}.table_{name}", "r", encoding="utf-8") as file:
+                properties.update(json.load(file))
+        except OSError:
+            pass
+
+        return properties
+
     def drop_table(self, name: str):
         """
         drops a table in the database
@@ -146,6 +269,16 @@ class FlatDatabase():
 
         shutil.rmtree(location)
         os.remove(sequence)
+        self.__sequences.pop(name, None)
+
+        for meta in (f".table_{name}", f".stats_{name}"):
+            if os.path.isfile(f"{self.__master}{os.sep}{meta}"):
+                os.remove(f"{self.__master}{os.sep}{meta}")
+
+        with os.scandir(self.__master) as entries:
+            for entry in entries:
+                if entry.name == f".index_{name}" or entry.name.startswith(f".index_{name}."):
+                    os.remove(entry.path)
 
     def table_exists(self, name: str) -> bool:
         """
@@ -153,33 +286,1180 @@ class FlatDatabase():
         -
         - name: the name of the table
         """
-        if self.__connected is False:
-            raise FlatDBException("not connected to database")
+        if self.__connected is False:
+            raise FlatDBException("not connected to database")
+
+        location = f"{self.__fullpath}{os.sep}{name}{os.sep}"
+        return os.path.exists(location)
+
+    def migrate_table(self, name: str, layout: str):
+        """
+        moves the row files of a file table in place into another layout. the table must not be
+        used while it is migrated, an interrupted migration can be completed by running it again
+        -
+        - name: the name of the table
+        - layout: 'flat' or 'sharded'
+        """
+        if self.__connected is False:
+            raise FlatDBException("not connected to database")
+
+        properties = self.table_properties(name)
+
+        if properties['storage'] != STORAGE_FILE or layout not in (LAYOUT_FLAT, LAYOUT_SHARDED):
+            raise FlatDBException(f"table {name} cannot be migrated to layout {layout}")
+
+        location = f"{self.__fullpath}{os.sep}{name}{os.sep}"
+        staging = f"{location}.migrate{os.sep}"  # keys and shard directories can have the same name
+        target = FlatFileStorage(location, layout == LAYOUT_SHARDED)
+        Path(staging).mkdir(exist_ok=True)
+
+        for dirpath, dirnames, filenames in os.walk(location[:-1], topdown=False):  # pylint: disable=unused-variable
+            if dirpath == staging[:-1]:
+                continue
+
+            for filename in filenames:
+                os.rename(os.path.join(dirpath, filename), staging+filename)
+
+            if dirpath != location[:-1]:
+                os.rmdir(dirpath)
+
+        for filename in os.listdir(staging):
+            destination = target.path(filename)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.rename(staging+filename, destination)
+
+        os.rmdir(staging)
+        properties['layout'] = layout
+
+        with open(f"{self.__master}{os.sep}.table_{name}", "w", encoding="utf-8") as file:
+            json.dump(properties, file)
+
+    def sequence(self, name: str) -> int:
+        """
+        increases the auto incremnt number of a table and returns it. the numbers are reserved in blocks of
+        sequence_block per process, so the sequence file is locked once per block
+        -
+        - name: the name of the table
+        """
+        return self.sequences(name, 1)[0]
+
+    def sequences(self, name: str, count: int) -> list:
+        """
+        increases the auto incremnt number of a table by count and returns the numbers,
+        taking the file lock at most once
+        -
+        - name: the name of the table
+        - count: how many numbers are needed
+        """
+        if self.__connected is False:
+            raise FlatDBException("not connected to database")
+
+        with self.__sequence_lock:
+            block = self.__sequences.get(name)
+
+            # a forked process must not hand out the numbers of its parents block
+            if block is None or block['pid'] != os.getpid():
+                block = {'pid': os.getpid(), 'next': 1, 'last': 0}
+
+            available = block['last'] - block['next'] + 1
+
+            if available >= count:
+                numbers = list(range(block['next'], block['next'] + count))
+                block['next'] += count
+                return numbers
+
+            numbers = list(range(block['next'], block['last'] + 1))
+            block = self.__reserve(name, max(count - available, self.__sequence_block))
+            numbers.extend(range(block['next'], block['next'] + count - available))
+            block['next'] += count - available
+            return numbers
+
+    def __reserve(self, name: str, size: int) -> dict:
+        location = f"{self.__master}{os.sep}.sequence_{name}"
+
+        with open(location, "r+", encoding="utf-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            sequence = int(file.read() or 0)
+            file.seek(0)
+            file.write(str(sequence + size))
+            file.truncate()
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+        if size > 1:
+            _SEQUENCE_HOLDERS.add(self)
+
+        block = {'pid': os.getpid(), 'next': sequence + 1, 'last': sequence + size}
+        self.__sequences[name] = block
+        return block
+
+    def release_sequences(self):
+        """
+        returns the unused numbers of the reserved blocks. this is only possible as long as no other process
+        has reserved a block after them, otherwise the unused numbers are left as a gap in the sequence
+        -
+        """
+        for name, block in self.__sequences.items():
+            if block['pid'] != os.getpid() or block['next'] > block['last']:
+                continue
+
+            try:
+                with open(f"{self.__master}{os.sep}.sequence_{name}", "r+", encoding="utf-8") as file:
+                    fcntl.flock(file, fcntl.LOCK_EX)
+
+                    if int(file.read() or 0) == block['last']:
+                        file.seek(0)
+                        file.write(str(block['next'] - 1))
+                        file.truncate()
+
+                    fcntl.flock(file, fcntl.LOCK_UN)
+            except (OSError, ValueError):
+                continue
+
+        self.__sequences.clear()
+
+    def statistics(self, name: str):
+        """
+        returns the statistics of a table, None when they have never been collected
+        -
+        - name: the name of the table
+        """
+        if self.__connected is False:
+            raise FlatDBException("not connected to database")
+
+        try:
+            with open(f"{self.__master}{os.sep}.stats_{name}", "r", encoding="utf-8") as file:
+                fcntl.flock(file, fcntl.LOCK_SH)
+                statistics = json.load(file)
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+            return statistics
+        except (OSError, ValueError):
+            return None
+
+    def write_statistics(self, name: str, statistics: dict):
+        """
+        replaces the statistics of a table
+        -
+        - name: the name of the table
+        - statistics: rows and cardinality per field
+        """
+        if self.__connected is False:
+            raise FlatDBException("not connected to database")
+
+        with open(f"{self.__master}{os.sep}.stats_{name}", "a+", encoding="utf-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            file.seek(0)
+            file.truncate()
+            json.dump(statistics, file)
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+    def count_rows(self, name: str, delta: int):
+        """
+        adds the number of inserted or removed rows to the row counter of a table
+        -
+        - name: the name of the table
+        - delta: positive for inserted, negative for removed rows
+        """
+        if self.__connected is False:
+            raise FlatDBException("not connected to database")
+
+        try:
+            with open(f"{self.__master}{os.sep}.stats_{name}", "r+", encoding="utf-8") as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                statistics = json.load(file)
+                statistics['rows'] = max(statistics['rows'] + delta, 0)
+                file.seek(0)
+                json.dump(statistics, file)
+                file.truncate()
+                fcntl.flock(file, fcntl.LOCK_UN)
+        except FileNotFoundError:  # collected on the next count
+            pass
+
+
+def where_condition(field: str, coperator: str, value):
+    """
+    compiles a single where condition into a test of a row
+    -
+    - numbers are compared as numbers, anything else as text
+    - like supports the % and _ wildcards
+    - a missing or None value never matches
+    """
+    coperator = coperator.lower()
+
+    if value is None:
+        return lambda data: False
+
+    if coperator == 'like':
+        pattern = ''.join('.*' if part == '%' else '.' if part == '_' else re.escape(part)
+                          for part in re.split('([%_])', str(value)))
+        match = re.compile(pattern, re.DOTALL).fullmatch
+
+        def like(data: dict) -> bool:
+            data_value = data.get(field)
+            return data_value is not None and match(str(data_value)) is not None
+
+        return like
+
+    compare = COMPARE_OPERATORS[coperator]
+    text = str(value)
+
+    if isinstance(value, (int, float)):
+        def compare_number(data: dict) -> bool:
+            data_value = data.get(field)
+
+            if data_value is None:
+                return False
+
+            if isinstance(data_value, (int, float)):
+                return compare(data_value, value)
+
+            return compare(str(data_value), text)
+
+        return compare_number
+
+    def compare_text(data: dict) -> bool:
+        data_value = data.get(field)
+        return data_value is not None and compare(str(data_value), text)
+
+    return compare_text
+
+
+def where_predicate(conditions: list):
+    """
+    compiles where conditions into a single predicate of a row, 'and' binds stronger than 'or'
+    and both stop at the first condition which decides the result
+    -
+    - conditions: list of dicts with the keys type, field, op and value
+    """
+    def conjunction(tests: list):
+        if len(tests) == 1:
+            return tests[0]
+
+        first, rest = tests[0], conjunction(tests[1:])
+        return lambda data: first(data) and rest(data)
+
+    def disjunction(tests: list):
+        if len(tests) == 1:
+            return tests[0]
+
+        first, rest = tests[0], disjunction(tests[1:])
+        return lambda data: first(data) or rest(data)
+
+    if not conditions:
+        return lambda data: True
+
+    groups = [[]]
+
+    for condition in conditions:
+        if condition['type'].lower() == 'or':
+            groups.append([])
+
+        groups[-1].append(where_condition(condition['field'], condition['op'], condition['value']))
+
+    return disjunction([conjunction(tests) for tests in groups])
+
+
+class FlatFileStorage():
+    """
+    stores every row of a table in a json file of its own. the sharded layout spreads the
+    files over two levels of directories named after the hash of the primary key
+    """
+    __location: str = ''
+    __sharded: bool = False
+
+    def __init__(self, location: str, sharded: bool = False):
+        """
+        init class
+        -
+        - location: the tables directory including a trailing separator
+        - sharded: use the sharded layout
+        """
+        self.__location = location
+        self.__sharded = sharded
+
+    def path(self, key: str) -> str:
+        """
+        returns the path of the file of a row
+        -
+        - key: the primary key
+        """
+        if not self.__sharded:
+            return self.__location+key
+
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+        return f"{self.__location}{digest[:2]}{os.sep}{digest[2:4]}{os.sep}{key}"
+
+    def exists(self, key: str) -> bool:
+        """
+        checks if a row exists
+        -
+        - key: the primary key
+        """
+        return os.path.isfile(self.path(key))
+
+    def read(self, key: str):
+        """
+        reads a row, returns None when not found
+        -
+        - key: the primary key
+        """
+        try:
+            with open(self.path(key), "r", encoding='utf-8') as file:
+                return json.load(file)
+        except OSError:
+            return None
+
+    def version(self, key: str):
+        """
+        returns the version of a row from the modification time and size of its file, None when not found
+        -
+        - key: the primary key
+        """
+        try:
+            stat = os.stat(self.path(key))
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def create(self, key: str, data: dict) -> bool:
+        """
+        writes a new row, fails when the row exists already, also when another process has just created it
+        -
+        - key: the primary key
+        - data: the field - value dict
+        """
+        path = self.path(key)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+
+        try:
+            try:
+                descriptor = os.open(path, flags, 0o666)
+            except FileNotFoundError:
+                if not self.__sharded:
+                    raise
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                descriptor = os.open(path, flags, 0o666)
+
+            with open(descriptor, "w", encoding='utf-8') as file:
+                json.dump(data, file)
+
+            return True
+        except OSError:
+            return False
+
+    def create_many(self, rows: list) -> list:
+        """
+        writes new rows and syncs their directories once, returns a success flag per row
+        -
+        - rows: list of primary key and data
+        """
+        results = [self.create(key, data) for key, data in rows]
+        directories = {os.path.dirname(self.path(key)) for (key, data), result in zip(rows, results) if result}
+
+        for directory in directories:
+            descriptor = os.open(directory, os.O_RDONLY)
+
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+        return results
+
+    def modify(self, key: str, callback):
+        """
+        replaces a row with the result of the callback while the row is locked
+        -
+        - key: the primary key
+        - callback: gets the current row and returns the new row
+        """
+        try:
+            with open(self.path(key), "r+", encoding='utf-8') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+
+                try:
+                    new_data = callback(json.load(file))
+                    file.seek(0)
+                    json.dump(new_data, file)
+                    file.truncate()
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+            return new_data
+        except OSError:
+            return False
+
+    def remove(self, key: str) -> bool:
+        """
+        removes a row
+        -
+        - key: the primary key
+        """
+        try:
+            os.remove(self.path(key))
+            return True
+        except OSError:
+            return False
+
+    def keys(self):
+        """
+        yields the primary keys of all rows
+        -
+        """
+        yield from self.__keys(self.__location, 2 if self.__sharded else 0)
+
+    def __keys(self, location: str, depth: int):
+        with os.scandir(location) as entries:
+            for entry in entries:
+                if depth == 0:
+                    if entry.is_file():
+                        yield entry.name
+                elif entry.is_dir():
+                    yield from self.__keys(entry.path, depth - 1)
+
+    def rows(self):
+        """
+        yields primary key and data of all rows
+        -
+        """
+        for key in self.keys():
+            data = self.read(key)
+
+            if data is not None:
+                yield key, data
+
+    def count(self) -> int:
+        """
+        counts the rows
+        -
+        """
+        return sum(1 for key in self.keys())
+
+    def close(self):
+        """
+        releases all resources
+        -
+        """
+
+
+class FlatSegmentStorage():
+    """
+    stores the rows of a table in append only segment files. every line in a segment
+    is either a row version [key, data] or a tombstone [key]. the offset map points
+    to the latest version of every row and is persisted in a keymap snapshot, so only
+    the segment tails written after the snapshot have to be replayed on open
+    """
+    __location: str = ''
+    __offsets: dict = {}
+    __replayed: dict = {}
+    __readers: dict = {}
+    __floor: int = 0
+
+    def __init__(self, location: str):
+        """
+        init class
+        -
+        - location: the tables directory including a trailing separator
+        """
+        self.__location = location
+        self.__offsets = {}
+        self.__replayed = {}
+        self.__readers = {}
+        self.__floor = 0
+        self.__load()
+
+    def __del__(self):
+        self.close()
+
+    def __segment(self, number: int) -> str:
+        return f"{self.__location}segment_{number:06d}"
+
+    def __segments(self) -> list:
+        numbers = []
+
+        with os.scandir(self.__location) as entries:
+            for entry in entries:
+                if entry.name.startswith('segment_'):
+                    numbers.append(int(entry.name[8:]))
+
+        return sorted(numbers)
+
+    def __reader(self, number: int) -> int:
+        reader = self.__readers.get(number)
+
+        if reader is None:
+            reader = os.open(self.__segment(number), os.O_RDONLY)
+            self.__readers[number] = reader
+
+        return reader
+
+    def __load(self):
+        """
+        loads the keymap snapshot and replays all segment tails
+        """
+        self.__snapshot()
+        self.__replay()
+
+    def __snapshot(self):
+        """
+        loads the keymap snapshot, segments below its first one are left over from a compaction
+        """
+        self.close()
+
+        try:
+            with open(self.__location+'.keymap', "r", encoding='utf-8') as file:
+                snapshot = json.load(file)
+
+            self.__offsets = {key: tuple(value) for key, value in snapshot['keys'].items()}
+            self.__replayed = {int(number): size for number, size in snapshot['segments'].items()}
+        except (OSError, ValueError, KeyError):
+            self.__offsets = {}
+            self.__replayed = {}
+
+        self.__floor = min(self.__replayed, default=0)
+
+    def __replay(self):
+        """
+        applies the records other writers have appended since the last replay. a compaction marker reloads
+        the snapshot, segments below the floor are not replayed while a compaction removes them
+        """
+        reloaded = False
+
+        while True:
+            segments = [number for number in self.__segments() if number >= self.__floor]
+
+            if any(number not in segments for number in self.__replayed):  # segments were compacted away
+                if reloaded:  # the snapshot misses segments as well, replay from scratch
+                    self.__offsets = {}
+                    self.__replayed = {}
+                    self.close()
+                else:
+                    self.__snapshot()
+                    reloaded = True
+
+                continue
+
+            marker = self.__apply(segments)
+
+            if marker is None:
+                return
+
+            self.__snapshot()
+            reloaded = True
+
+            if self.__floor <= marker:  # no snapshot of the compaction, its rows are in the segments after the marker
+                self.__offsets = {}
+                self.__replayed = {}
+                self.__floor = marker + 1
+
+    def __apply(self, segments: list):
+        """
+        applies the segment tails not replayed yet
+        - return: the number of the segment with a compaction marker, None when all records were applied
+        """
+        for number in segments:
+            start = self.__replayed.get(number, 0)
+
+            for offset, length, record in self.__records(number, start):
+                if len(record) == 1:
+                    if record[0] is None:  # compaction marker
+                        return number
+
+                    self.__offsets.pop(record[0], None)
+                else:
+                    self.__offsets[record[0]] = (number, offset, length)
+
+                start = offset + length + 1
+
+            self.__replayed[number] = start
+
+        return None
+
+    def __records(self, number: int, start: int = 0):
+        """
+        yields offset, length and the decoded record of all complete lines in a segment
+        """
+        try:
+            with open(self.__segment(number), "rb", buffering=1024*1024) as file:
+                file.seek(start)
+                offset = start
+
+                for line in file:
+                    if not line.endswith(b'\n'):  # a writer is still busy with this line
+                        break
+
+                    yield offset, len(line) - 1, json.loads(line)
+                    offset += len(line)
+        except FileNotFoundError:
+            return
+
+    def __refresh(self):
+        """
+        replays when the active segment has grown since the last replay
+        """
+        if not self.__replayed:
+            self.__replay()
+            return
+
+        number = max(self.__replayed)
+
+        try:
+            size = os.fstat(self.__reader(number)).st_size
+        except OSError:
+            size = -1
+
+        if size != self.__replayed[number] or size >= SEGMENT_SIZE:
+            self.__replay()
+
+    def __lock(self):
+        file = open(self.__location+'.lock', "a", encoding='utf-8')  # pylint: disable=consider-using-with
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
+    @staticmethod
+    def __unlock(file):
+        fcntl.flock(file, fcntl.LOCK_UN)
+        file.close()
+
+    def __append(self, records: list):
+        """
+        appends records to the active segment, the caller must hold the lock and have replayed
+        """
+        numbers = self.__segments()
+        number = numbers[-1] if numbers else 1
+        lines = [json.dumps(record).encode('utf-8') for record in records]
+        writer = os.open(self.__segment(number), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        try:
+            offset = os.lseek(writer, 0, os.SEEK_END)
+
+            if offset >= SEGMENT_SIZE:  # roll over to a new segment
+                os.close(writer)
+                self.checkpoint()
+                number += 1
+                writer = os.open(self.__segment(number), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                offset = 0
+
+            os.write(writer, b'\n'.join(lines) + b'\n')
+        finally:
+            os.close(writer)
+
+        for record, line in zip(records, lines):
+            if len(record) == 1:
+                self.__offsets.pop(record[0], None)
+            else:
+                self.__offsets[record[0]] = (number, offset, len(line))
+
+            offset += len(line) + 1
+
+        self.__replayed[number] = offset
+
+    def exists(self, key: str) -> bool:
+        """
+        checks if a row exists
+        -
+        - key: the primary key
+        """
+        self.__refresh()
+        return key in self.__offsets
+
+    def read(self, key: str):
+        """
+        reads a row with a single pread, returns None when not found
+        -
+        - key: the primary key
+        """
+        self.__refresh()
+        location = self.__offsets.get(key)
+
+        if location is None:
+            return None
+
+        number, offset, length = location
+
+        try:
+            return json.loads(os.pread(self.__reader(number), length, offset))[1]
+        except OSError:
+            return None
+
+    def version(self, key: str):
+        """
+        returns the version of a row, the location of its latest version in the segments, None when not found
+        -
+        - key: the primary key
+        """
+        self.__refresh()
+        return self.__offsets.get(key)
+
+    def create(self, key: str, data: dict) -> bool:
+        """
+        appends a new row
+        -
+        - key: the primary key
+        - data: the field - value dict
+        """
+        file = self.__lock()
+
+        try:
+            self.__replay()
+
+            if key in self.__offsets:
+                return False
+
+            self.__append([[key, data]])
+            return True
+        except OSError:
+            return False
+        finally:
+            self.__unlock(file)
+
+    def create_many(self, rows: list) -> list:
+        """
+        appends new rows with a single write, returns a success flag per row
+        -
+        - rows: list of primary key and data
+        """
+        file = self.__lock()
+
+        try:
+            self.__replay()
+            results = []
+            keys = set()
+
+            for key, data in rows:  # pylint: disable=unused-variable
+                results.append(key not in self.__offsets and key not in keys)
+                keys.add(key)
+
+            records = [[key, data] for (key, data), result in zip(rows, results) if result]
+
+            if records:
+                self.__append(records)
+
+            return results
+        except OSError:
+            return [False] * len(rows)
+        finally:
+            self.__unlock(file)
+
+    def modify(self, key: str, callback):
+        """
+        appends a new version of a row with the result of the callback while the table is locked
+        -
+        - key: the primary key
+        - callback: gets the current row and returns the new row
+        """
+        file = self.__lock()
+
+        try:
+            self.__replay()
+            current_data = self.read(key)
+
+            if current_data is None:
+                return False
+
+            new_data = callback(current_data)
+            self.__append([[key, new_data]])
+            return new_data
+        except OSError:
+            return False
+        finally:
+            self.__unlock(file)
+
+    def remove(self, key: str) -> bool:
+        """
+        appends a tombstone for a row
+        -
+        - key: the primary key
+        """
+        file = self.__lock()
+
+        try:
+            self.__replay()
+
+            if key not in self.__offsets:
+                return False
+
+            self.__append([[key]])
+            return True
+        except OSError:
+            return False
+        finally:
+            self.__unlock(file)
+
+    def keys(self):
+        """
+        yields the primary keys of all rows
+        -
+        """
+        self.__refresh()
+        yield from list(self.__offsets)
+
+    def rows(self):
+        """
+        yields primary key and data of all rows with one sequential read per segment
+        -
+        """
+        self.__refresh()
+        offsets = dict(self.__offsets)
+
+        for number in sorted(self.__replayed):
+            for offset, length, record in self.__records(number):  # pylint: disable=unused-variable
+                if len(record) == 2 and offsets.get(record[0]) == (number, offset, length):
+                    yield record[0], record[1]
+
+    def count(self) -> int:
+        """
+        counts the rows
+        -
+        """
+        self.__refresh()
+        return len(self.__offsets)
+
+    def checkpoint(self):
+        """
+        persists the offset map, the caller must hold the lock
+        -
+        """
+        snapshot = {'segments': self.__replayed, 'keys': self.__offsets}
+        temporary = self.__location+'.keymap.tmp'
+
+        with open(temporary, "w", encoding='utf-8') as file:
+            json.dump(snapshot, file)
+
+        os.replace(temporary, self.__location+'.keymap')
+
+    def compact(self):
+        """
+        rewrites the live rows into new segments and removes the old ones
+        -
+        """
+        file = self.__lock()
+
+        try:
+            self.__replay()
+            old_segments = self.__segments()
+            number = (old_segments[-1] if old_segments else 0) + 1
+            offsets = {}
+            replayed = {}
+            writer = None
+            size = 0
+
+            try:
+                for key, data in self.rows():
+                    if writer is None or size >= SEGMENT_SIZE:
+                        if writer is not None:
+                            writer.close()
+                            replayed[number] = size
+                            number += 1
+
+                        writer = open(self.__segment(number), "wb")  # pylint: disable=consider-using-with
+                        size = 0
+
+                    line = json.dumps([key, data]).encode('utf-8')
+                    writer.write(line + b'\n')
+                    offsets[key] = (number, size, len(line))
+                    size += len(line) + 1
+            finally:
+                if writer is not None:
+                    writer.close()
+                    replayed[number] = size
+
+            self.__offsets = offsets
+            self.__replayed = replayed
+            self.__floor = min(replayed, default=0)
+            self.checkpoint()
+
+            if old_segments:  # tell other processes to reload
+                with open(self.__segment(old_segments[-1]), "ab") as marker:
+                    marker.write(b'[null]\n')
+
+            self.close()
+
+            for old_number in old_segments:
+                os.remove(self.__segment(old_number))
+        finally:
+            self.__unlock(file)
+
+    def close(self):
+        """
+        releases all resources
+        -
+        """
+        for reader in self.__readers.values():
+            os.close(reader)
+
+        self.__readers = {}
+
+
+class FlatIndex():
+    """
+    secondary index of a table field. the index is kept in memory and persisted as an append
+    only log in the master directory, which other processes replay when it has grown.
+    numbers and texts are kept apart to compare them like a table scan does: equality is a
+    hash lookup, ranges and like prefixes are bisected on the sorted values
+    """
+    __filename: str = ''
+    __lockname: str = ''
+    __unique: bool = False
+    __numbers: dict = {}
+    __texts: dict = {}
+    __sorted_numbers: list = None
+    __sorted_texts: list = None
+    __inode: int = 0
+    __size: int = 0
+
+    def __init__(self, master: str, table: str, field: str, unique: bool = False):
+        """
+        init class
+        -
+        - master: the master directory of the database
+        - table: the name of the table
+        - field: the indexed field
+        - unique: reject duplicate values
+        """
+        self.__filename = f"{master}{os.sep}.index_{table}.{field}"
+        self.__lockname = f"{master}{os.sep}.index_{table}"
+        self.__unique = unique
+        self.__reset()
+
+    def __reset(self):
+        self.__numbers = {}
+        self.__texts = {}
+        self.__sorted_numbers = None
+        self.__sorted_texts = None
+        self.__inode = 0
+        self.__size = 0
+
+    def __bucket(self, value):
+        if isinstance(value, (int, float)):
+            return self.__numbers, value
+
+        return self.__texts, str(value)
+
+    def __apply(self, operation: int, value, key: str):
+        bucket, value = self.__bucket(value)
+
+        if operation == 1:
+            keys = bucket.get(value)
+
+            if keys is None:
+                bucket[value] = {key}
+                self.__sorted_numbers = self.__sorted_texts = None
+            else:
+                keys.add(key)
+        else:
+            keys = bucket.get(value, set())
+            keys.discard(key)
+
+            if not keys and value in bucket:
+                del bucket[value]
+                self.__sorted_numbers = self.__sorted_texts = None
+
+    def unique(self) -> bool:
+        """
+        returns if the index rejects duplicate values
+        -
+        """
+        return self.__unique
+
+    def lock(self):
+        """
+        locks all indexes of the table, returns the lock to pass to unlock
+        -
+        """
+        file = open(self.__lockname, "a", encoding='utf-8')  # pylint: disable=consider-using-with
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
+    @staticmethod
+    def unlock(file):
+        """
+        releases the lock
+        -
+        """
+        fcntl.flock(file, fcntl.LOCK_UN)
+        file.close()
+
+    def load(self, rows, field: str):
+        """
+        builds the index when it does not exist yet and replays the log, must not be called while locked
+        -
+        - rows: callable which yields primary key and data of all rows
+        - field: the indexed field
+        """
+        if not os.path.isfile(self.__filename):
+            file = self.lock()
+
+            try:
+                if not os.path.isfile(self.__filename):
+                    self.__build(rows(), field)
+            finally:
+                self.unlock(file)
+
+        self.replay()
+
+    def __build(self, rows, field: str):
+        temporary = self.__filename+'.tmp'
+
+        with open(temporary, "w", encoding='utf-8') as file:
+            for key, data in rows:
+                value = data.get(field)
+
+                if value is not None:
+                    file.write(json.dumps([1, value, key])+'\n')
+
+        os.replace(temporary, self.__filename)
+
+    def replay(self):
+        """
+        applies the log entries written since the last replay
+        -
+        """
+        try:
+            stat = os.stat(self.__filename)
+        except FileNotFoundError:
+            self.__reset()
+            return
+
+        if stat.st_ino != self.__inode:  # the log was rebuilt
+            self.__reset()
+            self.__inode = stat.st_ino
+
+        if stat.st_size <= self.__size:
+            return
+
+        with open(self.__filename, "rb") as file:
+            file.seek(self.__size)
+
+            for line in file:
+                if not line.endswith(b'\n'):  # a writer is still busy with this line
+                    break
+
+                operation, value, key = json.loads(line)
+                self.__apply(operation, value, key)
+                self.__size += len(line)
+
+    def append(self, entries: list):
+        """
+        writes entries to the log, the caller must hold the lock and have replayed
+        -
+        - entries: list of [operation, value, key], operation 1 adds and 0 removes
+        """
+        payload = ''.join(json.dumps(entry)+'\n' for entry in entries).encode('utf-8')
+
+        with open(self.__filename, "ab") as file:
+            file.write(payload)
+
+        for operation, value, key in entries:
+            self.__apply(operation, value, key)
+
+        self.__size += len(payload)
+
+    def rebuild(self):
+        """
+        rewrites the log with the current entries only, the caller must hold the lock and have replayed
+        -
+        """
+        entries = [[1, value, key] for bucket in (self.__numbers, self.__texts) for value, keys in bucket.items() for key in keys]
+        temporary = self.__filename+'.tmp'
+
+        with open(temporary, "w", encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry)+'\n')
+
+        os.replace(temporary, self.__filename)
+        self.__reset()
+        self.replay()
+
+    def conflicts(self, value, key: str) -> bool:
+        """
+        checks if another row has the same value
+        -
+        - value: the value
+        - key: the primary key of the row which gets the value
+        """
+        bucket, value = self.__bucket(value)
+        return len(bucket.get(value, set()) - {key}) > 0
+
+    def cardinality(self) -> int:
+        """
+        returns the number of distinct values
+        -
+        """
+        return len(self.__numbers) + len(self.__texts)
 
-        location = f"{self.__fullpath}{os.sep}{name}{os.sep}"
-        return os.path.exists(location)
+    @staticmethod
+    def __range(keys: list, coperator: str, value) -> list:
+        if coperator == '>':
+            return keys[bisect.bisect_right(keys, value):]
+        if coperator == '>=':
+            return keys[bisect.bisect_left(keys, value):]
+        if coperator == '<':
+            return keys[:bisect.bisect_left(keys, value)]
 
-    def sequence(self, name: str) -> int:
+        return keys[:bisect.bisect_right(keys, value)]
+
+    def lookup(self, coperator: str, value):
         """
-        increases the auto incremnt number of a table and returns it
+        returns the primary keys which might match a condition or None when the index cannot help
         -
-        - name: the name of the table
+        - coperator: compare operator
+        - value: the value
         """
-        if self.__connected is False:
-            raise FlatDBException("not connected to database")
+        coperator = coperator.lower()
 
-        location = f"{self.__master}{os.sep}.sequence_{name}"
-        sequence = 0
+        if value is None or coperator not in ('=', '>', '<', '>=', '<=', 'like'):
+            return None
 
-        with open(location, "r+", encoding="utf-8") as file:
-            fcntl.flock(file, fcntl.LOCK_EX)
-            sequence = int(file.read(9)) + 1
-            file.seek(0)
-            file.write(str(sequence))
-            file.truncate()
-            fcntl.flock(file, fcntl.LOCK_UN)
+        if coperator == 'like':
+            pattern = str(value)
+            prefix = re.split('[%_]', pattern, maxsplit=1)[0]
+
+            if not prefix:
+                return None
+
+            if prefix == pattern:
+                coperator = '='
+            else:
+                if self.__sorted_texts is None:
+                    self.__sorted_texts = sorted(self.__texts)
+
+                texts = self.__sorted_texts[bisect.bisect_left(self.__sorted_texts, prefix):]
+                values = [self.__texts[text] for text in itertools.takewhile(lambda text: text.startswith(prefix), texts)]
+                values += [keys for number, keys in self.__numbers.items() if str(number).startswith(prefix)]
+                return set().union(*values)
+
+        if isinstance(value, (int, float)):
+            text = str(value)
+
+            if coperator == '=':
+                values = [self.__numbers.get(value, set()), self.__texts.get(text, set())]
+            else:
+                if self.__sorted_numbers is None:
+                    self.__sorted_numbers = sorted(self.__numbers)
+
+                if self.__sorted_texts is None:
+                    self.__sorted_texts = sorted(self.__texts)
+
+                values = [self.__numbers[number] for number in self.__range(self.__sorted_numbers, coperator, value)]
+                values += [self.__texts[text] for text in self.__range(self.__sorted_texts, coperator, text)]
+        else:
+            text = str(value)
+
+            if coperator == '=':
+                values = [self.__texts.get(text, set())]
+                values += [keys for number, keys in self.__numbers.items() if str(number) == text]
+            else:
+                if self.__sorted_texts is None:
+                    self.__sorted_texts = sorted(self.__texts)
+
+                compare = COMPARE_OPERATORS[coperator]
+                values = [self.__texts[text] for text in self.__range(self.__sorted_texts, coperator, text)]
+                values += [keys for number, keys in self.__numbers.items() if compare(str(number), text)]
 
-        return sequence
+        return set().union(*values)
 
 
 class FlatTable():
@@ -190,8 +1470,11 @@ class FlatTable():
     __name: str = ''
     __fullpath: str = ''
     __pk: str = ''
+    __ddl: str = ''
     __fields: dict = {}
     __where_pending: list = []
+    __storage = None
+    __indexes: dict = {}
 
     def __init__(self, database: FlatDatabase, name: str, fields: str):
         """
@@ -204,6 +1487,12 @@ class FlatTable():
         self.__db = database
         self.__name = name
         self.__fullpath = database.fullpath()+os.sep+self.__name+os.sep
+        self.__pk = ''
+        self.__ddl = fields
+        self.__fields = {}
+        self.__where_pending = []
+        self.__storage = None
+        self.__indexes = {}
 
         meta = fields.split(',')
 
@@ -216,66 +1505,232 @@ class FlatTable():
             except IndexError:
                 field_type = 'TEXT'
 
-            try:
-                field_required = field_desc[2]
+            flags = [flag.upper() for flag in field_desc[2:]]
 
-                if field_required.upper() == "PRIMARY_KEY":
-                    self.__pk = field_name
-                    field_required = True
-                    autoincrement = len(field_desc) > 2 and field_desc[3].upper() == "AUTOINCREMENT"
-                else:
-                    autoincrement = False
-                    field_required = field_required.upper() == "REQUIRED"
-            except IndexError:
+            if "PRIMARY_KEY" in flags:
+                self.__pk = field_name
+                field_required = True
+                autoincrement = "AUTOINCREMENT" in flags
+                unique = False
+                indexed = False
+            else:
+                field_required = "REQUIRED" in flags
                 autoincrement = False
-                field_required = False
+                unique = "UNIQUE" in flags
+                indexed = unique or "INDEX" in flags
 
-            self.__fields[field_name] = {'type': field_type, 'required': field_required, 'autoincrement': autoincrement}
+            self.__fields[field_name] = {'type': field_type, 'required': field_required, 'autoincrement': autoincrement,
+                                         'unique': unique, 'index': indexed}
+
+            if indexed:
+                self.__indexes[field_name] = FlatIndex(database.master(), name, field_name, unique)
 
         if not self.__pk:
             raise FlatTableException(f"no primary key defined for table {name}")
 
-    def _where_pending(self, data: dict) -> bool:
+    def storage(self):
+        """
+        returns the storage of the table, which is opened on first use since the table might not exist yet
+        -
+        """
+        if self.__storage is None:
+            properties = self.__db.table_properties(self.__name)
+
+            if properties['storage'] == STORAGE_SEGMENT:
+                self.__storage = FlatSegmentStorage(self.__fullpath)
+            else:
+                self.__storage = FlatFileStorage(self.__fullpath, properties['layout'] == LAYOUT_SHARDED)
+
+        return self.__storage
+
+    def compact(self):
+        """
+        removes outdated row versions and tombstones from a segment storage
+        -
+        """
+        storage = self.storage()
+
+        if isinstance(storage, FlatSegmentStorage):
+            storage.compact()
+
+        if self.__indexes:
+            self._load_indexes()
+            file = next(iter(self.__indexes.values())).lock()
+
+            try:
+                for index in self.__indexes.values():
+                    index.replay()
+                    index.rebuild()
+            finally:
+                FlatIndex.unlock(file)
+
+        return self
+
+    def _load_indexes(self):
+        """
+        builds missing indexes and catches up with the changes of other processes
+        """
+        for field, index in self.__indexes.items():
+            index.load(self.storage().rows, field)
+
+    def _reindex(self, key: str, old_data: dict = None, new_data: dict = None):
+        """
+        maintains the indexes for a changed row, raises when a unique index would be violated
+        """
+        if not self.__indexes:
+            return
+
+        self._load_indexes()
+        file = next(iter(self.__indexes.values())).lock()
+
+        try:
+            changes = {}
+
+            for field, index in self.__indexes.items():
+                index.replay()
+                old_value = None if old_data is None else old_data.get(field)
+                new_value = None if new_data is None else new_data.get(field)
+
+                if type(old_value) is type(new_value) and old_value == new_value:
+                    continue
+
+                if index.unique() and new_value not in (None, '') and index.conflicts(new_value, key):
+                    raise FlatTableException(f"table {self.__name} duplicate value for unique field {field}")
+
+                entries = []
+
+                if old_value is not None:
+                    entries.append([0, old_value, key])
+
+                if new_value is not None:
+                    entries.append([1, new_value, key])
+
+                changes[field] = entries
+
+            for field, entries in changes.items():
+                self.__indexes[field].append(entries)
+        finally:
+            FlatIndex.unlock(file)
+
+    def _index_rows(self, rows: list) -> list:
+        """
+        adds the index entries of new rows with one lock, returns False for the rows violating a unique index
+        """
+        if not self.__indexes:
+            return [True] * len(rows)
+
+        self._load_indexes()
+        file = next(iter(self.__indexes.values())).lock()
+
+        try:
+            for index in self.__indexes.values():
+                index.replay()
+
+            results = []
+            seen = {field: set() for field, index in self.__indexes.items() if index.unique()}
+
+            for key, data in rows:
+                conflict = False
+
+                for field, values in seen.items():
+                    value = data.get(field)
+
+                    if value in (None, ''):
+                        continue
+
+                    if (type(value), value) in values or self.__indexes[field].conflicts(value, key):
+                        conflict = True
+
+                results.append(not conflict)
+
+                if not conflict:
+                    for field, values in seen.items():
+                        values.add((type(data.get(field)), data.get(field)))
+
+            for field, index in self.__indexes.items():
+                entries = [[1, data[field], key] for (key, data), result in zip(rows, results)
+                           if result and data.get(field) is not None]
+
+                if entries:
+                    index.append(entries)
+
+            return results
+        finally:
+            FlatIndex.unlock(file)
+
+    def _where_candidates(self):
         """
-        executes the actual where clause
+        returns the primary keys of the rows which might match the where conditions,
+        or None when the indexes cannot narrow the conditions down
         """
-        operators = {
-                '=': '==',
-                '!=': '!=',
-                '>': '>',
-                '<': '<',
-                '>=': '>=',
-                '<=': '<=',
-                'and': 'and',
-                'AND': 'and',
-                'or': 'or',
-                'OR': 'or',
-                'like': 'like',
-                'LIKE': 'like'
-        }
+        if not self.__indexes:
+            return None
+
+        if any(condition['type'].lower() == 'or' for condition in self.__where_pending):
+            return None
 
-        clause = ''
-        result = True
+        candidates = None
 
         for condition in self.__where_pending:
-            field = condition['field']
-            coperator = operators[condition['op']]
-            value = condition['value']
-            condition_type = condition['type']
-            data_value = data[field]
-
-            if coperator == 'like':
-                pattern = '^'+value.replace('%', '.*')+'$'
-                result = len(re.findall(pattern, data_value)) > 0
-                clause += f"{result} == True"
-            else:
-                if isinstance(value, (int, float)) and isinstance(data_value, (int, float)):
-                    clause += f"{condition_type} {data_value} {coperator} {value}"
-                else:
-                    clause += f"{condition_type} '{data_value}' {coperator} '{value}'"
+            index = self.__indexes.get(condition['field'])
 
-        result = eval(clause)  # pylint: disable=eval-used
-        return result
+            if index is None:
+                continue
+
+            index.load(self.storage().rows, condition['field'])
+            keys = index.lookup(condition['op'], condition['value'])
+
+            if keys is None:
+                continue
+
+            candidates = keys if candidates is None else candidates & keys
+
+        return candidates
+
+    def _where_rows(self, candidates):
+        """
+        yields primary key and data of the rows to evaluate the where conditions on
+        """
+        if candidates is None:
+            yield from self.storage().rows()
+            return
+
+        for primary_key in candidates:
+            data = self.storage().read(primary_key)
+
+            if data is not None:
+                yield primary_key, data
+
+    def _where_predicate(self):
+        """
+        compiles the pending where conditions once for all rows of a query
+        """
+        return where_predicate(self.__where_pending)
+
+    def _partitions(self, candidates):
+        """
+        splits the primary keys of the table for the scan processes,
+        or returns None when the table should be scanned sequentially
+        """
+        workers = self.__db.workers()
+
+        if workers < 2 or candidates is not None or self.statistics()['rows'] < PARALLEL_MIN_ROWS:
+            return None
+
+        keys = list(self.storage().keys())
+        size = max(1, -(-len(keys) // (workers * 4)))  # some partitions more than workers evens out slow ones
+        return [keys[start:start + size] for start in range(0, len(keys), size)]
+
+    def _scan(self, partitions: list, action: str, **params):
+        """
+        runs an action on the rows matching the pending where conditions in the scan processes,
+        yields the partition results in the order of the partitions
+        """
+        tasks = [{'path': self.__db.path(), 'database': self.__db.name(), 'table': self.__name, 'fields': self.__ddl,
+                  'conditions': list(self.__where_pending), 'keys': keys, 'action': action, **params}
+                 for keys in partitions]
+
+        return self.__db.executor().map(_scan_partition, tasks)
 
     def where(self, field: str, value: str, coperator: str = '=', conditional: str = 'and'):
         """
@@ -288,10 +1743,15 @@ class FlatTable():
         """
         if len(self.__where_pending) == 0:
             conditional = ''
+        elif conditional.lower() not in ('and', 'or'):
+            raise FlatTableException(f"conditional {conditional} unknown")
 
         if field not in self.__fields:
             raise FlatTableException(f"field {field}  unknown")
 
+        if coperator.lower() not in COMPARE_OPERATORS and coperator.lower() != 'like':
+            raise FlatTableException(f"operator {coperator} unknown")
+
         self.__where_pending.append({'type': conditional, 'field': field, 'op': coperator, 'value': value})
         return self
 
@@ -347,10 +1807,7 @@ class FlatTable():
         checks if the primary key existss
         -
         """
-        if isinstance(primary_key, int):
-            return os.path.isfile(self.__fullpath+str(primary_key))
-
-        return os.path.isfile(self.__fullpath+primary_key)
+        return self.storage().exists(str(primary_key))
 
     def insert(self, data: dict) -> bool:
         """
@@ -362,6 +1819,8 @@ class FlatTable():
         primary_key = data.get(self.__pk, '')
 
         if primary_key:
+            primary_key = str(primary_key)
+
             if self.id_exists(primary_key):
                 raise FlatTableException(f"table {self.__name} duplicate primary key")
         else:
@@ -377,13 +1836,69 @@ class FlatTable():
             if self.id_exists(primary_key):
                 raise FlatTableException(f"table {self.__name} duplicate primary key")
 
-        try:
-            with open(self.__fullpath+primary_key, "w", encoding='utf-8') as file:
-                json.dump(data, file)
+        self._reindex(primary_key, None, data)
+        result = self.storage().create(primary_key, data)
 
-            return True
-        except OSError:
-            return False
+        if result is False:
+            self._reindex(primary_key, data, None)
+        else:
+            self.__db.count_rows(self.__name, 1)
+
+        return result
+
+    def insert_many(self, rows: list) -> list:
+        """
+        inserts rows into the table with one sequence reservation, one index and storage write
+        and one statistics update, returns a success flag per row. a row missing a required value
+        or with a duplicate primary key fails alone
+        -
+        - rows: list of field - value dicts
+        """
+        valid = []
+
+        for data in rows:
+            try:
+                self.validate_fields(data)
+                valid.append(True)
+            except FlatTableException:  # a required value is missing, the row fails like a duplicate key
+                valid.append(False)
+
+        autoincrement = self.__fields[self.__pk]['autoincrement'] is True
+        missing = [data for data, result in zip(rows, valid) if result and not data.get(self.__pk, '')]
+
+        if missing and autoincrement:
+            for data, sequence in zip(missing, self.__db.sequences(self.__name, len(missing))):
+                data[self.__pk] = str(sequence)
+
+        keys = set()
+        results = []
+
+        for data, result in zip(rows, valid):
+            primary_key = str(data.get(self.__pk, ''))
+            results.append(result and bool(primary_key) and primary_key not in keys and not self.id_exists(primary_key))
+
+            if result:
+                keys.add(primary_key)
+
+        accepted = [(str(data[self.__pk]), data) for data, result in zip(rows, results) if result]
+        indexed = self._index_rows(accepted)
+        created = self.storage().create_many([row for row, result in zip(accepted, indexed) if result])
+        created = iter(created)
+        inserted = {}
+
+        for (primary_key, data), result in zip(accepted, indexed):
+            if not result:
+                continue
+
+            if next(created):
+                inserted[primary_key] = True
+            else:
+                self._reindex(primary_key, data, None)
+
+        if inserted:
+            self.__db.count_rows(self.__name, len(inserted))
+
+        return [result and inserted.get(str(data[self.__pk]), False) for data, result in zip(rows, results)]
 
     def update(self, primary_key, data: dict):
         """
@@ -405,22 +1920,19 @@ class FlatTable():
         if not self.id_exists(key):
             return False
 
-        try:
-            with open(self.__fullpath+key, "r+", encoding='utf-8') as file:
-                fcntl.flock(file, fcntl.LOCK_EX)
-                current_data = json.load(file)
-                new_data = {**current_data, **data}
-                self.validate_fields(new_data)
-                file.seek(0)
-                json.dump(new_data, file)
-                file.truncate()
-                fcntl.flock(file, fcntl.LOCK_UN)
-
+        def merge(current_data: dict) -> dict:
+            new_data = {**current_data, **data}
+            self.validate_fields(new_data)
+            self._reindex(key, current_data, new_data)
             return new_data
+
+        if self.__indexes:
+            self._load_indexes()
+
+        try:
+            return self.storage().modify(key, merge)
         except FlatValidationException as flatex:
             raise FlatValidationException(flatex.args) from flatex
-        except OSError:
-            return False
 
     def find(self, key):
         """
@@ -433,11 +1945,33 @@ class FlatTable():
         else:
             pkey = key
 
-        try:
-            with open(self.__fullpath+pkey, "r", encoding='utf-8') as file:
-                return json.load(file)
-        except OSError:
-            return None
+        return self.storage().read(pkey)
+
+    def version(self, key):
+        """
+        returns a value which changes with every write of a row, None when not found
+        -
+        - key: the primary key
+        """
+        return self.storage().version(key if isinstance(key, str) else str(key))
+
+    def find_many(self, keys) -> dict:
+        """
+        findes rows in the table, row files are read by READ_THREADS threads
+        -
+        - keys: list of primary keys
+        - return: dict of the found rows by primary key
+        """
+        keys = [key if isinstance(key, str) else str(key) for key in keys]
+        storage = self.storage()
+
+        if isinstance(storage, FlatSegmentStorage) or len(keys) < 2:  # a segment read is a single pread already
+            rows = [storage.read(key) for key in keys]
+        else:
+            with ThreadPoolExecutor(max_workers=min(READ_THREADS, len(keys))) as executor:
+                rows = list(executor.map(storage.read, keys))
+
+        return {data[self.__pk]: data for data in rows if data is not None}
 
     def delete(self, key) -> bool:
         """
@@ -450,68 +1984,245 @@ class FlatTable():
         else:
             pkey = key
 
-        try:
-            os.remove(self.__fullpath+pkey)
-            return True
-        except OSError:
-            return False
+        result = self._remove(pkey)
+
+        if result is True:
+            self.__db.count_rows(self.__name, -1)
+
+        return result
+
+    def _remove(self, key: str) -> bool:
+        """
+        removes a row and its index entries without counting it
+        """
+        if not self.__indexes:
+            return self.storage().remove(key)
+
+        data = self.storage().read(key)
+        result = self.storage().remove(key)
+
+        if result is True and data is not None:
+            self._reindex(key, data, None)
+
+        return result
+
+    def deleteall(self, *, limit: int = 0, offset: int = 0) -> int:
+        """
+        deletes the rows matching the where conditions and returns their number
+        -
+        - limit: sets limit of the selection
+        - offset: sets the selection offset
+        """
+        deleted = 0
+        partitions = None if limit or offset else self._partitions(self._where_candidates())
+
+        if partitions is not None:
+            deleted = sum(self._scan(partitions, 'delete'))
+            self.__where_pending.clear()
+        else:
+            for key in self.findall(limit=limit, offset=offset, return_ids=True):
+                if self._remove(key) is True:
+                    deleted += 1
+
+        if deleted > 0:
+            self.__db.count_rows(self.__name, -deleted)
+
+        return deleted
+
+    def updateall(self, data: dict, *, limit: int = 0, offset: int = 0) -> int:
+        """
+        updates the rows matching the where conditions and returns their number
+        -
+        - data: the field - value dict
+        - limit: sets limit of the selection
+        - offset: sets the selection offset
+        """
+        partitions = None if limit or offset else self._partitions(self._where_candidates())
+
+        if partitions is not None:
+            updated = sum(self._scan(partitions, 'update', data=data))
+            self.__where_pending.clear()
+            return updated
+
+        updated = 0
+
+        for key in self.findall(limit=limit, offset=offset, return_ids=True):
+            try:
+                if self.update(key, data) is not False:
+                    updated += 1
+            except FlatTableException:
+                continue
+
+        return updated
+
+    def analyze(self) -> dict:
+        """
+        counts the rows and distinct values of every field and stores them as the tables statistics
+        -
+        """
+        rows = 0
+        values = {field: set() for field in self.__fields}
+
+        for primary_key, data in self.storage().rows():  # pylint: disable=unused-variable
+            rows += 1
+
+            for field, value in data.items():
+                if value is not None and field in values:
+                    values[field].add(json.dumps(value) if isinstance(value, (list, dict)) else value)
+
+        statistics = {'rows': rows, 'cardinality': {field: len(distinct) for field, distinct in values.items()}}
+        self.__db.write_statistics(self.__name, statistics)
+        return statistics
+
+    def statistics(self) -> dict:
+        """
+        returns the statistics of the table, the row counter is maintained on every change,
+        the cardinality is collected by analyze()
+        -
+        """
+        statistics = self.__db.statistics(self.__name)
+
+        if statistics is None:  # tables created prior to v1.3.0
+            statistics = {'rows': self.storage().count(), 'cardinality': {}}
+            self.__db.write_statistics(self.__name, statistics)
+
+        return statistics
 
     def count(self) -> int:
         """
         counts the rows in the table
         """
+        if not self.__where_pending:
+            return self.statistics()['rows']
+
         counter = 0
+        predicate = self._where_predicate()
+        candidates = self._where_candidates()
+        partitions = self._partitions(candidates)
 
-        for dirpath, dirnames, filenames in os.walk(self.__fullpath[:-1]):
-            for filename in filenames:
-                if self.__where_pending:
-                    data = self.find(filename)
+        if partitions is not None:
+            counter = sum(self._scan(partitions, 'count'))
+            self.__where_pending.clear()
+            return counter
 
-                    if self._where_pending(data) is False:
-                        continue
+        self.__where_pending.clear()
 
+        for primary_key, data in self._where_rows(candidates):  # pylint: disable=unused-variable
+            if predicate(data):
                 counter += 1
 
-            break
-
-        self.__where_pending.clear()
         return counter
 
+    def iterall(self, *, limit: int = 0, offset: int = 0, return_ids: bool = False):
+        """
+        finds rows in the table and yields them one by one. the rows are read sequentially, even with scan processes,
+        so memory stays the same for any table size
+        -
+        - limit: sets limit of the selection
+        - offset: sets the selection offset
+        - return_ids: yield the ids only
+        """
+        matches = self._where_matches(self._where_candidates())
+        return self._select_window(matches, limit, offset, return_ids)
+
     def findall(self, *, limit: int = 0, offset: int = 0, return_ids: bool = False):
         """
-        finds rows in the table
+        finds rows in the table, large tables are scanned by the scan processes
         -
         - limit: sets limit of the selection
         - offset: sets the selection offset
         - return_ids: return a list of ids only
         """
+        candidates = self._where_candidates()
+        partitions = self._partitions(candidates)
 
-        result = []
+        if partitions is None:
+            matches = self._where_matches(candidates)
+        else:
+            matches = itertools.chain.from_iterable(self._scan(partitions, 'find'))
+            self.__where_pending.clear()
+
+        return list(self._select_window(matches, limit, offset, return_ids))
+
+    def _where_matches(self, candidates):
+        """
+        returns a generator over primary key and data of the rows matching the pending where conditions,
+        the conditions are cleared
+        """
+        predicate = self._where_predicate()
+        self.__where_pending.clear()
+        return ((primary_key, data) for primary_key, data in self._where_rows(candidates) if predicate(data))
+
+    @staticmethod
+    def _select_window(matches, limit: int, offset: int, return_ids: bool):
+        """
+        yields the matching rows, or their ids, within offset and limit
+        """
         offset_cnt = 0
         limit_cnt = 0
 
-        for dirpath, dirnames, filenames in os.walk(self.__fullpath[:-1]):
-            for filename in filenames:
-                if offset > 0 and offset_cnt < offset:
-                    offset_cnt += 1
-                    continue
+        for primary_key, data in matches:
+            if offset > 0 and offset_cnt < offset:
+                offset_cnt += 1
+                continue
 
-                data = self.find(filename)
+            limit_cnt += 1
+            yield primary_key if return_ids else data
 
-                if self.__where_pending and self._where_pending(data) is False:
-                    continue
+            if 0 < limit <= limit_cnt:
+                break
 
-                limit_cnt += 1
+_SCAN_TABLES = {}
+_SEQUENCE_HOLDERS = weakref.WeakSet()
 
-                if return_ids:
-                    result.append(filename)
-                else:
-                    result.append(data)
 
-                if 0 < limit <= limit_cnt:
-                    break
+def _release_sequences():
+    """
+    returns the unused numbers of the databases still holding sequence blocks at exit, the databases collected
+    before have returned theirs already
+    """
+    for database in list(_SEQUENCE_HOLDERS):
+        database.release_sequences()
 
-            break
 
-        self.__where_pending.clear()
-        return result
+atexit.register(_release_sequences)
+
+
+def _scan_partition(task: dict):
+    """
+    runs in a scan process, evaluates the where conditions on the rows of a partition and applies the action.
+    the tables are kept per process so a segment storage loads its key map only once
+    """
+    table_id = (task['path'], task['database'], task['table'], task['fields'])
+    table = _SCAN_TABLES.get(table_id)
+
+    if table is None:
+        table = FlatTable(FlatDatabase(task['path'], task['database']).connect(), task['table'], task['fields'])
+        _SCAN_TABLES[table_id] = table
+
+    storage = table.storage()
+    predicate = where_predicate(task['conditions'])
+    action = task['action']
+    result = 0 if action != 'find' else []
+
+    for key in task['keys']:
+        data = storage.read(key)
+
+        if data is None or not predicate(data):
+            continue
+
+        if action == 'find':
+            result.append((key, data))
+        elif action == 'count':
+            result += 1
+        elif action == 'delete':
+            if table._remove(key) is True:  # pylint: disable=protected-access
+                result += 1
+        elif action == 'update':
+            try:
+                if table.update(key, task['data']) is not False:
+                    result += 1
+            except FlatTableException:
+                continue
+
+    return result
@@ -3,15 +3,47 @@ module v1.3.1
 Data-Access-Layer and query builder for MySQL and SQLite
 """
 
+import io
+import os
 import re
+import sys
 import csv
+import time
+import random
+import logging
+import logging.handlers
+import keyword
 import operator
+import itertools
+import functools
+import threading
+import contextlib
+import contextvars
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import warnings
 import sqlite3
 import mysql.connector
 from . import flat
 
+try:
+    import numpy
+except ImportError:  # numpy is optional, only findall_columns needs it
+    numpy = None
+
 LAST_DATABASE_EXCEPTION: str = ''
+DEFAULT_DATABASE: str = 'default'
+PREPARED_STATEMENTS: int = 64  # prepared statements kept per mysql table
+RESULT_CACHE_BYTES: int = 64 * 1024 * 1024
+STATEMENT_HOOKS: tuple = ()  # replaced as a whole by add_hook() and remove_hook()
+BOUND_CONNECTION = contextvars.ContextVar('BOUND_CONNECTION', default=None)  # per thread and asyncio task
+LAST_WRITE = contextvars.ContextVar('LAST_WRITE', default=None)
+ROWFORMAT_DICT: str = 'dict'  # a dict per row
+ROWFORMAT_TUPLE: str = 'tuple'  # plain tuples, the positions of the columns are returned by rowindex()
+ROWFORMAT_NAMEDTUPLE: str = 'namedtuple'
+ROWFORMAT_SLOTS: str = 'slots'  # objects of a class with __slots__ for the columns
+ROWFORMAT_NATIVE: str = 'native'  # the rows of the driver, sqlite3.Row or mysql dicts
+ROWFORMATS = (ROWFORMAT_DICT, ROWFORMAT_TUPLE, ROWFORMAT_NAMEDTUPLE, ROWFORMAT_SLOTS, ROWFORMAT_NATIVE)
 
 
 class PDAException(Exception):
@@ -250,12 +282,20 @@ class DDL:
         Build the ddl for flatfile database.
         """
         sql = ''
+        indexed = [fields.split(',')[0].strip() for fields in self.__indexes.values()]  # flat indexes are single field
 
         for field, values in self.__fields.items():
             required = 'REQUIRED' if values['not_null'] is True else ''
             column_type = str(values['type']).upper()
             auto_increment = ''
 
+            if values['unique'] is True or field in self.__unique:
+                index = 'UNIQUE'
+            elif field in indexed:
+                index = 'INDEX'
+            else:
+                index = ''
+
             if values['auto_increment'] is True:
                 auto_increment = 'AUTOINCREMENT'
                 if self.__primary_key and self.__primary_key != field:
@@ -264,13 +304,15 @@ class DDL:
                 self.__primary_key = field
 
             if self.__primary_key and self.__primary_key == field:
-                sql += f"{field} {column_type} PRIMARY_KEY {auto_increment}, "
+                definition = [field, column_type, 'PRIMARY_KEY', auto_increment]
             else:
-                sql += f"{field} {column_type} {required}, "
+                definition = [field, column_type, required, index]
+
+            sql += " ".join(value for value in definition if value) + ", "
 
-        # Clean up the trailing comma and space and add a closing parenthesis if there are any fields.
+        # Clean up the trailing comma and space if there are any fields.
         if sql:
-            sql = sql[:-2] + ')'
+            sql = sql[:-2]
 
         return sql
 
@@ -289,264 +331,1342 @@ class Singleton(type):
         return cls.instances[cls]
 
 
-class Database(metaclass=Singleton):
+class Registry(type):
     """
-    class to deal with the different databases
+    metaclass in order to create one instance per name
     """
-    __dbname = None
-    __connection = None
-    __dbtype = None
+    instances = {}
 
-    def db_sq3(self, filename=''):
+    def __call__(cls, name: str = DEFAULT_DATABASE):
+        if (cls, name) not in cls.instances:
+            instance = super().__call__(name)
+            cls.instances[(cls, name)] = instance
+
+        return cls.instances[(cls, name)]
+
+
+class StatementHook():
+    """
+    base class of the hooks which observe the statements of all databases and the operations of flat tables,
+    see add_hook(). the event passed to before() and after() is the same dict with the keys
+    - operation: the function running the statement, like 'exec' or 'fetchall', 'flat' for flat tables
+    - sql: the statement, for flat tables the table operation and its where conditions
+    - params: the parameters
+    - duration: seconds the statement took, set for after()
+    - rowcount: rows fetched or changed, -1 when unknown, set for after()
+    - error: the exception of a failed statement or None, set for after()
+    """
+
+    def before(self, event: dict):
         """
-        create a connection to a sqlite database
+        called before a statement runs
         """
-        self.__dbname = filename
-        self.__dbtype = 'SQ3'
-        self.__connection = sqlite3.connect(self.__dbname)
-        self.__connection.isolation_level = None  # we want autocommits
-        self.__connection.row_factory = sqlite3.Row  # we want field value pairs
-        self.__connection.execute("PRAGMA foreign_keys = 1")  # we want fk always checked
-        return self
 
-    def db_msq(self, dbhost: str = '', dbname: str = '', dbuser: str = '', dbpass: str = ''):
+    def after(self, event: dict):
         """
-        create a connection to a mysql database
+        called after a statement ran or failed
         """
-        self.__dbname = dbname
-        self.__dbtype = 'MSQ'
-        self.__connection = mysql.connector.connect(host=dbhost, database=dbname, user=dbuser, password=dbpass)
-        return self
 
-    def db_flat(self, path: str, name: str):
-        """
-        create a connection with a flatfile database
+
+def add_hook(hook: StatementHook) -> StatementHook:
+    """
+    adds a hook which observes the statements of all databases
+    """
+    global STATEMENT_HOOKS  # pylint: disable=global-statement
+    STATEMENT_HOOKS = STATEMENT_HOOKS + (hook, )
+    return hook
+
+
+def remove_hook(hook: StatementHook):
+    """
+    removes a hook
+    """
+    global STATEMENT_HOOKS  # pylint: disable=global-statement
+    STATEMENT_HOOKS = tuple(added for added in STATEMENT_HOOKS if added is not hook)
+
+
+def statement_started(operation: str, sql: str, params=None) -> dict:
+    """
+    passes the event of a statement to the before() of the hooks
+    - return: the event for statement_finished(), None without hooks
+    """
+    hooks = STATEMENT_HOOKS
+
+    if not hooks:
+        return None
+
+    event = {'operation': operation, 'sql': sql, 'params': params, 'hooks': hooks, 'started': time.perf_counter()}
+
+    for hook in hooks:
+        try:
+            hook.before(event)
+        except Exception as hookex:  # pylint: disable=broad-except
+            warnings.warn(f"statement hook {type(hook).__name__} failed: {hookex}")
+
+    return event
+
+
+def statement_finished(event: dict, rowcount: int = -1, error: Exception = None):
+    """
+    adds duration, rowcount and error to the event of a statement and passes it to the after() of the hooks
+    """
+    if event is None:
+        return
+
+    event['duration'] = time.perf_counter() - event['started']
+    event['rowcount'] = rowcount
+    event['error'] = error
+
+    for hook in event['hooks']:
+        try:
+            hook.after(event)
+        except Exception as hookex:  # pylint: disable=broad-except
+            warnings.warn(f"statement hook {type(hook).__name__} failed: {hookex}")
+
+
+class SlowQueryLog(StatementHook):
+    """
+    logs the statements which took threshold seconds or longer, and failed ones, into a rotating log file
+    """
+    __threshold: float = 0.1
+    __sample: float = 1.0
+    __errors: bool = True
+    __params: bool = True
+    __handler: logging.handlers.RotatingFileHandler = None
+    __logger: logging.Logger = None
+    __counters: dict = {}
+    __lock: threading.Lock = None
+
+    def __init__(self, filename: str, threshold: float = 0.1, sample: float = 1.0, errors: bool = True,
+                 params: bool = True, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
         """
-        self.__dbname = name
-        self.__dbtype = 'FLAT'
-        self.__connection = flat.FlatDatabase(path, name).connect()
-        return self
+        init class
+        -
+        - filename: the log file
+        - threshold: seconds from which a statement is slow
+        - sample: share of the slow statements which are logged, 1.0 logs all of them
+        - errors: log the failed statements as well
+        - params: log the parameters of the statements
+        - max_bytes: size from which the log file is rotated
+        - backup_count: number of rotated log files kept
+        """
+        self.__threshold = threshold
+        self.__sample = sample
+        self.__errors = errors
+        self.__params = params
+        self.__handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                              encoding='utf-8', delay=True)
+        self.__handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        self.__logger = logging.Logger('easydb.slowquery')  # not registered, the application's logging is left alone
+        self.__logger.addHandler(self.__handler)
+        self.__counters = {'statements': 0, 'slow': 0, 'errors': 0, 'logged': 0}
+        self.__lock = threading.Lock()
+
+    def after(self, event: dict):
+        slow = event['duration'] >= self.__threshold
+        failed = event['error'] is not None
+
+        with self.__lock:
+            self.__counters['statements'] += 1
+            self.__counters['slow'] += slow
+            self.__counters['errors'] += failed
+
+        if not (failed and self.__errors) and not (slow and random.random() < self.__sample):
+            return
+
+        message = f"{event['duration'] * 1000:.1f}ms rows={event['rowcount']} {event['operation']}: {event['sql']}"
+
+        if self.__params and event['params'] is not None:
+            message += f" params={event['params']!r}"
+
+        if failed:
+            self.__logger.error("%s error=%s", message, event['error'])
+        else:
+            self.__logger.warning("%s", message)
 
-    def dbtype(self) -> str:
+        with self.__lock:
+            self.__counters['logged'] += 1
+
+    def statistics(self) -> dict:
         """
-        returns the type of database
-        - SQ3: SQLite
-        - MSQ> MySQL
-        - FLAT: Flatfile
+        returns the number of observed, slow, failed and logged statements
         """
-        return self.__dbtype
+        with self.__lock:
+            return dict(self.__counters)
 
-    def connection(self):
+    def close(self):
         """
-        returns the database connection
+        closes the log file
         """
-        return self.__connection
+        self.__handler.close()
 
-    def name(self):
+
+class ConnectionPool():
+    """
+    keeps between minsize and maxsize database connections, which are checked out by one thread or task at a time
+    """
+    __connect = None
+    __ping = None
+    __cursor = None
+    __maxsize: int = 0
+    __timeout: float = 0
+    __health_check: float = 0
+    __size: int = 0
+    __idle: deque = None
+    __cursors: dict = {}
+    __condition: threading.Condition = None
+
+    def __init__(self, connect, ping, cursor, minsize: int = 1, maxsize: int = 10, timeout: float = 30.0,
+                 health_check: float = 30.0):
         """
-        returns the database name
+        init class
+        -
+        - connect: callable returning a new connection
+        - ping: callable returning if a connection is still usable
+        - cursor: callable returning a new cursor for a connection
+        - minsize: connections opened in advance
+        - maxsize: maximum number of connections
+        - timeout: seconds to wait for a connection before giving up
+        - health_check: connections idle for more seconds are pinged before they are handed out
         """
-        return self.__dbname
+        self.__connect = connect
+        self.__ping = ping
+        self.__cursor = cursor
+        self.__maxsize = max(1, maxsize)
+        self.__timeout = timeout
+        self.__health_check = health_check
+        self.__size = 0
+        self.__idle = deque()
+        self.__cursors = {}
+        self.__condition = threading.Condition()
 
-    def execute(self, stmt, params=None):
+        for number in range(min(minsize, self.__maxsize)):  # pylint: disable=unused-variable
+            self.__idle.append((connect(), time.monotonic()))
+            self.__size += 1
+
+    def acquire(self):
         """
-        executes a database sql statement
-        -
-        - stmt: the sql statement
-        - params: sql parameters
-        - return: True when successfull, False when database exception
+        checks a connection out, raises PDAException when none gets available within the timeout
         """
+        deadline = time.monotonic() + self.__timeout
+        connection = None
+
+        with self.__condition:
+            while True:
+                if self.__idle:
+                    connection, released = self.__idle.pop()  # the most recently used one is the least likely to be stale
+                    break
+
+                if self.__size < self.__maxsize:
+                    self.__size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    raise PDAException(f"no database connection available within {self.__timeout} seconds")
+
+                self.__condition.wait(remaining)
+
         try:
-            if params is None:
-                self.__connection.execute(stmt)
-            else:
-                self.__connection.execute(stmt, params)
+            if connection is None:
+                connection = self.__connect()
+            elif time.monotonic() - released > self.__health_check and not self.__ping(connection):
+                self.__discard(connection)
+                connection = self.__connect()
+        except Exception:
+            with self.__condition:
+                self.__size -= 1
+                self.__condition.notify()
 
-            return True
-        except Exception as pdaex:  # pylint: disable=broad-except
-            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
-            LAST_DATABASE_EXCEPTION = str(pdaex)
-            return False
+            raise
 
-    @staticmethod
-    def isinitialized():
+        return connection
+
+    def release(self, connection):
         """
-        returns if the singleton is already initialized
+        returns a connection to the pool
         """
-        return len(Singleton.instances) > 0
+        with self.__condition:
+            self.__idle.append((connection, time.monotonic()))
+            self.__condition.notify()
 
-    @staticmethod
-    def fetchone(cursor, stmt, params=None):
+    def cursor(self, connection):
         """
-        fetches one row from the database
-        -
-        - cursor: the database cursor
-        - stmt: the sql statement
-        - return: None when no results, dict when results found or False when database exception
+        returns the cursor kept for a connection
         """
+        cursor = self.__cursors.get(id(connection))
+
+        if cursor is None:
+            cursor = self.__cursor(connection)
+            self.__cursors[id(connection)] = cursor
+
+        return cursor
+
+    def __discard(self, connection):
+        cursor = self.__cursors.pop(id(connection), None)
+
         try:
-            if params is None:
-                cursor.execute(stmt)
-                result = cursor.fetchone()
-            else:
-                cursor.execute(stmt, params)
-                result = cursor.fetchone()
+            if cursor is not None:
+                cursor.close()
 
-            if result is None:
-                return None
+            connection.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
 
-            return dict(result)
+    def size(self) -> int:
+        """
+        returns the number of open connections
+        """
+        return self.__size
 
-        except Exception as pdaex:  # pylint: disable=broad-except
-            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
-            LAST_DATABASE_EXCEPTION = str(pdaex)
-            return False
+    def close(self):
+        """
+        closes the idle connections
+        """
+        with self.__condition:
+            while self.__idle:
+                connection, released = self.__idle.pop()  # pylint: disable=unused-variable
+                self.__discard(connection)
+                self.__size -= 1
 
-    @staticmethod
-    def fetchall(cursor, stmt, params=None):
+
+class ResultCache():
+    """
+    keeps the results of findall and count for ttl seconds, beyond max_bytes the least recently used ones are evicted.
+    the results of a table are dropped whenever the table is written to through a table of the database
+    """
+    __ttl: float = 60.0
+    __max_bytes: int = RESULT_CACHE_BYTES
+    __entries: OrderedDict = None
+    __tables: dict = {}
+    __generations: dict = {}
+    __epoch: int = 0
+    __bytes: int = 0
+    __counters: dict = {}
+    __lock: threading.Lock = None
+
+    def __init__(self, ttl: float = 60.0, max_bytes: int = RESULT_CACHE_BYTES):
         """
-        fetches all rows from the database
+        init class
         -
-        - cursor: the database cursor
-        - stmt: the sql statement
-        - return: None when no results, list of dicts when results found or False when database exception
+        - ttl: seconds a result is kept
+        - max_bytes: estimated size of all results kept
         """
-        try:
-            if params is None:
-                cursor.execute(stmt)
-                result = cursor.fetchall()
-            else:
-                cursor.execute(stmt, params)
-                result = cursor.fetchall()
+        self.__ttl = ttl
+        self.__max_bytes = max_bytes
+        self.__entries = OrderedDict()  # key: (expires, size, table, result, columns)
+        self.__tables = {}
+        self.__generations = {}
+        self.__epoch = 0
+        self.__bytes = 0
+        self.__counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self.__lock = threading.Lock()
 
-            if result is None:
-                return None
+    def generation(self, table: str) -> tuple:
+        """
+        returns the write generation of a table, to be taken before its query runs and passed to put()
+        """
+        with self.__lock:
+            return self.__epoch, self.__generations.get(table, 0)
 
-            retvalue = []
+    def get(self, key):
+        """
+        returns a copy of a cached result
+        -
+        - key: the table, the statement and its parameters
+        - return: tuple of the result and the column positions of tuple rows, None when not cached or expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
 
-            for i, data in enumerate(result):  # pylint: disable=unused-variable
-                retvalue.append(dict(data))
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self.__remove(key)
 
-            return retvalue
+                self.__counters['misses'] += 1
+                return None
 
-        except Exception as pdaex:  # pylint: disable=broad-except
-            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
-            LAST_DATABASE_EXCEPTION = str(pdaex)
-            return False
+            self.__entries.move_to_end(key)
+            self.__counters['hits'] += 1
 
-    @staticmethod
-    def exec(cursor, stmt, params=None):
+        return ResultCache.copy(entry[3]), entry[4]
+
+    def put(self, key, table: str, result, generation: tuple, columns: dict = None) -> bool:
         """
-        executes a database sql statement
+        caches a copy of a result
         -
-        - cursor: the database cursor
-        - stmt: the sql statement
-        - params: sql parameters
-        - return: True when successfull, False when database exception
+        - key: the table, the statement and its parameters
+        - table: the table the result was read from
+        - generation: the generation of the table before the query ran, the result is dropped when it changed since
+        - columns: the column positions of tuple rows
+        - return: if the result was cached
         """
-        try:
-            if params is None:
-                cursor.execute(stmt)
-            else:
-                cursor.execute(stmt, params)
+        size = ResultCache.sizeof(result)
 
-            return True
-        except Exception as pdaex:  # pylint: disable=broad-except
-            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
-            LAST_DATABASE_EXCEPTION = str(pdaex)
+        if size > self.__max_bytes:
             return False
 
+        result = ResultCache.copy(result)
 
-class Table():
-    """
-    dealing with a table in the database
-    """
-    _name: str = ''
-    _ddl: DDL = None
-    _where_pending = []
+        with self.__lock:
+            if generation != (self.__epoch, self.__generations.get(table, 0)):  # written while the query ran
+                return False
 
-    def __init__(self, name: str = '', create_stmt: str = ''):
+            if key in self.__entries:
+                self.__remove(key)
+
+            self.__entries[key] = (time.monotonic() + self.__ttl, size, table, result, columns or {})
+            self.__tables.setdefault(table, set()).add(key)
+            self.__bytes += size
+
+            while self.__bytes > self.__max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.__counters['evictions'] += 1
+
+        return True
+
+    def invalidate(self, table: str = ''):
         """
-        init class
-        -
-        - name: the name of the table
-        - create_stmt: sql statment to create the table
+        drops the cached results of a table or of all tables, needed after changing them by other means than
+        a table of the database
         """
+        with self.__lock:
+            if table:
+                self.__generations[table] = self.__generations.get(table, 0) + 1
 
-        if name:
-            self._name = name
+                for key in list(self.__tables.get(table, ())):
+                    self.__remove(key)
+            else:
+                self.__epoch += 1
+                self.__entries.clear()
+                self.__tables.clear()
+                self.__bytes = 0
 
-        self._ddl = self.ddl()
-        self._where_pending = []
+            self.__counters['invalidations'] += 1
 
-        if Database.isinitialized():
-            dbtype = Database().dbtype()
+        return self
 
-            if dbtype == 'SQ3':
-                self.instance = TableSQ3(self._name, create_stmt, self._ddl)
-            elif dbtype == 'MSQ':
-                self.instance = TableMSQ(self._name, create_stmt, self._ddl)
-            elif dbtype == 'FLAT':
-                self.instance = TableFlat(self._name, self._ddl)
-            else:
-                pass
-        else:
-            raise PDAException("no database connection found")
+    def __remove(self, key):
+        expires, size, table, result, columns = self.__entries.pop(key)  # pylint: disable=unused-variable
+        self.__bytes -= size
+        keys = self.__tables.get(table)
 
-    @staticmethod
-    def ddl():
+        if keys is not None:
+            keys.discard(key)
+
+            if not keys:
+                del self.__tables[table]
+
+    def statistics(self) -> dict:
         """
-        method should be overwritten by using the DDL class
+        returns the hits, misses, evictions and invalidations so far together with the cached entries and their bytes
         """
-        return ''
+        with self.__lock:
+            return {**self.__counters, 'entries': len(self.__entries), 'bytes': self.__bytes}
 
     @staticmethod
-    def getsql(filename: str):
+    def copy(result):
         """
-        get a sql statement from a file
+        returns a copy of a result the caller may change, dict rows are copied, tuple rows are immutable
         """
-        try:
-            with open(filename, 'r', encoding="ascii") as file:
-                return file.read()
-        except OSError:
-            return False
+        if isinstance(result, list):
+            return [dict(row) if isinstance(row, dict) else row for row in result]
+
+        if isinstance(result, dict):
+            return dict(result)
+
+        return result
 
     @staticmethod
-    def quote(stringvalue: str) -> str:
+    def sizeof(result) -> int:
         """
-        places a given string in single quotes
-        -
-        - stringvalue: the string
-        - return: the string in quotes
+        returns the estimated bytes of a result, the column names are shared by the rows and not counted
         """
-        return TableBaseClass.quote(stringvalue)
+        if isinstance(result, list):
+            return sys.getsizeof(result) + sum(ResultCache.sizeof(row) for row in result)
 
-    def database(self) -> Database:
+        size = sys.getsizeof(result)
+
+        if isinstance(result, dict):
+            values = result.values()
+        elif isinstance(result, (tuple, sqlite3.Row)):
+            values = result
+        elif hasattr(result, '__slots__'):
+            values = [getattr(result, column) for column in result.__slots__]
+        else:
+            return size
+
+        return size + sum(sys.getsizeof(value) for value in values)
+
+
+class IdentityMap():
+    """
+    keeps the rows of a table found by primary key, the least recently used ones are evicted beyond size.
+    every row is kept together with its version, a cached row is only returned for the version asked for
+    """
+    __size: int = 1000
+    __rows: OrderedDict = None
+    __hits: int = 0
+    __misses: int = 0
+    __lock: threading.Lock = None
+
+    def __init__(self, size: int = 1000):
         """
-        returns the tables database
+        init class
         -
+        - size: number of rows kept
         """
-        return self.instance.database()
+        self.__size = max(1, size)
+        self.__rows = OrderedDict()  # key: (version, row)
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
 
-    def tablename(self) -> str:
+    def get(self, key, version=''):
         """
-        returns the name of the table
+        returns a copy of a cached row
+        -
+        - key: the normalized primary key
+        - version: the current version of the row
+        - return: the row, None when not cached or of another version
         """
-        return self.instance.tablename/()
+        with self.__lock:
+            entry = self.__rows.get(key)
 
-    def primarykey(self) -> str:
+            if entry is None or entry[0] != version:
+                self.__misses += 1
+                return None
+
+            self.__rows.move_to_end(key)
+            self.__hits += 1
+
+        return dict(entry[1])
+
+    def put(self, key, row: dict, version=''):
         """
-        returns the tables primary key
+        caches a copy of a row
         -
+        - key: the normalized primary key
+        - version: the version of the row
         """
-        return self.instance.primarykey()
+        with self.__lock:
+            self.__rows[key] = (version, dict(row))
+            self.__rows.move_to_end(key)
 
-    def fieldlist(self) -> str:
+            if len(self.__rows) > self.__size:
+                self.__rows.popitem(last=False)
+
+    def discard(self, key=None):
         """
-        returns a list of fields in a comma separated string
-        -
+        drops a row, all rows without key
         """
-        return self.instance.fieldlist()
+        with self.__lock:
+            if key is None:
+                self.__rows.clear()
+            else:
+                self.__rows.pop(key, None)
+
+    def statistics(self) -> dict:
+        """
+        returns the hits and misses so far and the number of cached rows
+        """
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses, 'rows': len(self.__rows)}
+
+
+class Database(metaclass=Registry):
+    """
+    class to deal with the different databases, Database() is the default one and Database(name)
+    a further database registered under that name
+    """
+    __alias: str = DEFAULT_DATABASE
+    __dbname = None
+    __connection = None
+    __dbtype = None
+    __connect = None
+    __pool: ConnectionPool = None
+    __replicas: list = []
+    __turn = None
+    __read_your_writes: float = 1.0
+    __schema: dict = {}
+    __results: ResultCache = None
+
+    def __init__(self, name: str = DEFAULT_DATABASE):
+        """
+        init class
+        -
+        - name: the name the database is registered under
+        """
+        self.__alias = name
+
+    def db_sq3(self, filename=''):
+        """
+        create a connection to a sqlite database
+        """
+        self.__dbname = filename
+        self.__dbtype = 'SQ3'
+        self.__pool = None
+        self.__replicas = []
+        self.__schema = {}
+        self.__results = None
+
+        def connect(pooled: bool = False):
+            connection = sqlite3.connect(filename, check_same_thread=not pooled)
+            connection.isolation_level = None  # we want autocommits
+            connection.row_factory = sqlite3.Row  # we want field value pairs
+            connection.execute("PRAGMA foreign_keys = 1")  # we want fk always checked
+            return connection
+
+        self.__connect = connect
+        self.__connection = connect()
+        return self
+
+    def db_msq(self, dbhost: str = '', dbname: str = '', dbuser: str = '', dbpass: str = ''):
+        """
+        create a connection to a mysql database
+        """
+        self.__dbname = dbname
+        self.__dbtype = 'MSQ'
+        self.__pool = None
+        self.__replicas = []
+        self.__schema = {}
+        self.__results = None
+
+        def connect(pooled: bool = False):
+            connection = mysql.connector.connect(host=dbhost, database=dbname, user=dbuser, password=dbpass)
+
+            if pooled:  # a pooled connection must not keep uncommitted changes for the next user
+                connection.autocommit = True
+
+            return connection
+
+        self.__connect = connect
+        self.__connection = connect()
+        return self
+
+    def pool(self, minsize: int = 1, maxsize: int = 10, timeout: float = 30.0, health_check: float = 30.0):
+        """
+        replaces the single connection with a connection pool. tables check a connection out
+        for every operation or from begintransaction until commit / rollback
+        -
+        - minsize: connections opened in advance
+        - maxsize: maximum number of connections
+        - timeout: seconds to wait for a connection before raising PDAException
+        - health_check: connections idle for more seconds are pinged before they are handed out
+        """
+        if self.__dbtype not in ('SQ3', 'MSQ'):
+            raise PDAException(f"connection pool not supported for database type {self.__dbtype}")
+
+        self.__connection.close()
+        self.__connection = None
+        connect = functools.partial(self.__connect, True)
+        self.__pool = ConnectionPool(connect, self.__ping, self.__newcursor, minsize, maxsize, timeout, health_check)
+        return self
+
+    def __ping(self, connection) -> bool:
+        try:
+            if self.__dbtype == 'MSQ':
+                connection.ping(reconnect=False)
+            else:
+                connection.execute("SELECT 1")
+
+            return True
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+    def __newcursor(self, connection):
+        if self.__dbtype == 'MSQ':
+            return connection.cursor(dictionary=True, buffered=True)
+
+        return connection.cursor()
+
+    def replica_sq3(self, filename: str, maxsize: int = 10):
+        """
+        adds a read only connection to a sqlite database as a replica
+        -
+        - filename: the sqlite database file
+        - maxsize: maximum number of connections to the replica
+        """
+        if self.__dbtype != 'SQ3':
+            raise PDAException("sqlite replicas need a sqlite primary database")
+
+        def connect():
+            connection = sqlite3.connect(f"file:{filename}?mode=ro", uri=True, check_same_thread=False)
+            connection.row_factory = sqlite3.Row  # we want field value pairs
+            return connection
+
+        return self.__replica(connect, maxsize)
+
+    def replica_msq(self, dbhost: str = '', dbname: str = '', dbuser: str = '', dbpass: str = '', maxsize: int = 10):
+        """
+        adds a connection to a mysql read replica
+        -
+        - maxsize: maximum number of connections to the replica
+        """
+        if self.__dbtype != 'MSQ':
+            raise PDAException("mysql replicas need a mysql primary database")
+
+        def connect():
+            connection = mysql.connector.connect(host=dbhost, database=dbname, user=dbuser, password=dbpass)
+            connection.autocommit = True  # otherwise a replica connection would keep reading its first snapshot
+            return connection
+
+        return self.__replica(connect, maxsize)
+
+    def __replica(self, connect, maxsize: int):
+        self.__replicas.append(ConnectionPool(connect, self.__ping, self.__newcursor, 0, maxsize))
+        self.__turn = itertools.count()
+        return self
+
+    def read_your_writes(self, seconds: float = 1.0):
+        """
+        sets how long the reads of a thread or task go to the primary database after it has written,
+        so it does not miss its own changes while the replicas catch up
+        -
+        - seconds: the read your writes window
+        """
+        self.__read_your_writes = seconds
+        return self
+
+    def pooled(self) -> bool:
+        """
+        returns if the database uses a connection pool
+        """
+        return self.__pool is not None
+
+    @contextlib.contextmanager
+    def bind(self):
+        """
+        binds a connection of the pool to the current thread or task until the with block ends,
+        unless one of the primary database is bound already. a bound replica is left aside for the block
+        """
+        current = self.binding()
+
+        if current is not None and not current.get('replica'):
+            yield current['connection']
+            return
+
+        if self.__pool is None:
+            if current is None:
+                yield self.__connection
+                return
+
+            binding = {'connection': self.__connection, 'holds': 0, 'pool': None}
+        else:
+            binding = {'connection': self.__pool.acquire(), 'holds': 0, 'pool': self.__pool}
+
+        self.__bind(binding)
+
+        try:
+            yield binding['connection']
+        finally:
+            if binding['holds'] == 0:  # not held by a transaction begun inside the block
+                self.__bind(current)
+
+                if binding['pool'] is not None:
+                    binding['pool'].release(binding['connection'])
+
+    @contextlib.contextmanager
+    def route(self, bind: bool = True):
+        """
+        binds a replica connection for a read, round robin over the replicas. reads go to the primary
+        database within a transaction or the read your writes window of the current thread or task
+        -
+        - bind: bind the replica connection to the current thread or task, otherwise it is only passed to the
+          with block, like for a stream which must not route the statements of its consumer
+        """
+        last_write = (LAST_WRITE.get() or {}).get(self.__alias)
+
+        if not self.__replicas or self.binding() is not None or \
+                last_write is not None and time.monotonic() - last_write < self.__read_your_writes:
+            with self.bind() as connection:
+                yield connection
+
+            return
+
+        pool = self.__replicas[next(self.__turn) % len(self.__replicas)]
+        binding = {'connection': pool.acquire(), 'holds': 0, 'pool': pool, 'replica': True}
+
+        if bind is True:
+            self.__bind(binding)
+
+        try:
+            yield binding['connection']
+        finally:
+            if bind is True:
+                self.__bind(None)
+
+            pool.release(binding['connection'])
+
+    def written(self):
+        """
+        notes a write of the current thread or task for the read your writes window
+        """
+        LAST_WRITE.set({**(LAST_WRITE.get() or {}), self.__alias: time.monotonic()})
+
+    def binding(self) -> dict:
+        """
+        returns the connection bound to the current thread or task, None when there is none
+        """
+        bindings = BOUND_CONNECTION.get()
+
+        if bindings is None:
+            return None
+
+        return bindings.get(self.__alias)
+
+    def __bind(self, binding: dict):
+        bindings = dict(BOUND_CONNECTION.get() or {})  # a copy, asyncio tasks inherit the dict of their parent
+
+        if binding is None:
+            bindings.pop(self.__alias, None)
+        else:
+            bindings[self.__alias] = binding
+
+        BOUND_CONNECTION.set(bindings)
+
+    def acquire(self):
+        """
+        binds a connection to the current thread or task until release() is called as often,
+        which keeps a transaction on the primary database and on one connection of the pool
+        """
+        binding = self.binding()
+
+        if binding is None or binding.get('replica'):  # a transaction never runs on a replica
+            connection = self.__connection if self.__pool is None else self.__pool.acquire()
+            self.__bind({'connection': connection, 'holds': 1, 'pool': self.__pool, 'previous': binding})
+        else:
+            binding['holds'] += 1
+
+        return self
+
+    def release(self):
+        """
+        returns the connection bound by acquire() to the pool
+        """
+        binding = self.binding()
+
+        if binding is None:
+            return self
+
+        binding['holds'] -= 1
+
+        if binding['holds'] <= 0:
+            self.__bind(binding.get('previous'))
+
+            if binding['pool'] is not None:
+                binding['pool'].release(binding['connection'])
+
+        return self
+
+    def cursor(self):
+        """
+        returns a cursor for the connection, for a pooled or replica connection the cursor kept for it
+        """
+        binding = self.binding()
+
+        if binding is not None and binding['pool'] is not None:
+            return binding['pool'].cursor(binding['connection'])
+
+        if self.__dbtype == 'MSQ':
+            return self.__connection.cursor(dictionary=True, buffered=True)
+
+        return self.__connection.cursor()
+
+    def db_flat(self, path: str, name: str, storage: str = flat.STORAGE_FILE, layout: str = flat.LAYOUT_FLAT,
+                workers: int = 0, sequence_block: int = 1):
+        """
+        create a connection with a flatfile database
+        -
+        - storage: storage of new tables, 'file' or 'segment'
+        - layout: directory layout of new file tables, 'flat' or 'sharded'
+        - workers: processes to scan large tables with, 0 scans sequentially
+        - sequence_block: autoincrement values reserved at once, unused ones are returned at exit if possible
+        """
+        self.__dbname = name
+        self.__dbtype = 'FLAT'
+        self.__pool = None
+        self.__replicas = []
+        self.__schema = {}
+        self.__results = None
+        self.__connection = flat.FlatDatabase(path, name, storage, layout, workers, sequence_block).connect()
+        return self
+
+    def dbtype(self) -> str:
+        """
+        returns the type of database
+        - SQ3: SQLite
+        - MSQ> MySQL
+        - FLAT: Flatfile
+        """
+        return self.__dbtype
+
+    def connection(self):
+        """
+        returns the database connection, with a connection pool the one bound to the current thread or task
+        """
+        binding = self.binding()
+
+        if binding is not None:
+            return binding['connection']
+
+        if self.__pool is not None:
+            raise PDAException("no pooled connection bound, use Database().bind()")
+
+        return self.__connection
+
+    def name(self):
+        """
+        returns the database name
+        """
+        return self.__dbname
+
+    def alias(self) -> str:
+        """
+        returns the name the database is registered under
+        """
+        return self.__alias
+
+    def schema(self, table: str):
+        """
+        returns the column metadata of a table, which is introspected once and then cached
+        -
+        - table: the name of the table
+        - return: list of column dicts, None when the table does not exist
+        """
+        meta_data = self.__schema.get(table)
+
+        if meta_data is not None:
+            return meta_data
+
+        with self.bind():
+            cursor = self.cursor()
+
+            if self.__dbtype == 'SQ3':
+                meta_data = Database.fetchall(cursor, f"PRAGMA table_info({TableBaseClass.quote(table)})")
+            elif self.__dbtype == 'MSQ':
+                meta_data = Database.fetchall(cursor, f"DESCRIBE {table}")
+            else:
+                raise PDAException(f"schema metadata not supported for database type {self.__dbtype}")
+
+            if not self.pooled():
+                cursor.close()
+
+        if not meta_data:  # the table does not exist (yet)
+            return None
+
+        self.__schema[table] = meta_data
+        return meta_data
+
+    def introspect(self) -> list:
+        """
+        caches the column metadata of all tables and views of the database with a single query
+        -
+        - return: list of the table names
+        """
+        if self.__dbtype == 'SQ3':
+            stmt = "SELECT m.name AS tablename, p.* FROM sqlite_master m, pragma_table_info(m.name) p " \
+                   "WHERE m.type IN ('table', 'view') ORDER BY m.name, p.cid"
+        elif self.__dbtype == 'MSQ':
+            stmt = "SELECT TABLE_NAME AS tablename, COLUMN_NAME AS `Field`, COLUMN_TYPE AS `Type`, " \
+                   "IS_NULLABLE AS `Null`, COLUMN_KEY AS `Key`, COLUMN_DEFAULT AS `Default` " \
+                   "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() " \
+                   "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        else:
+            raise PDAException(f"schema metadata not supported for database type {self.__dbtype}")
+
+        with self.bind():
+            cursor = self.cursor()
+            result = Database.fetchall(cursor, stmt)
+
+            if not self.pooled():
+                cursor.close()
+
+        if result is False:
+            raise PDAException("introspecting the database failed")
+
+        schema = {}
+
+        for column in result:
+            schema.setdefault(column.pop('tablename'), []).append(column)
+
+        self.__schema.update(schema)
+        return list(schema)
+
+    def invalidate(self, table: str = ''):
+        """
+        drops the cached metadata of a table or of all tables, needed after changing them by other means than
+        the create and drop methods of a table
+        """
+        if table:
+            self.__schema.pop(table, None)
+        else:
+            self.__schema.clear()
+
+        return self
+
+    def cache(self, ttl: float = 60.0, max_bytes: int = RESULT_CACHE_BYTES):
+        """
+        caches the results of findall and count of the tables of the database. writes through a table drop the
+        results of that table, changes by other processes show up after ttl seconds at the latest
+        -
+        - ttl: seconds a result is kept, 0 turns the cache off
+        - max_bytes: estimated size of all results kept
+        """
+        self.__results = ResultCache(ttl, max_bytes) if ttl > 0 else None
+        return self
+
+    def results(self) -> ResultCache:
+        """
+        returns the result cache, None when results are not cached
+        """
+        return self.__results
+
+    @staticmethod
+    def databases() -> dict:
+        """
+        returns the registered databases by their names
+        """
+        return {name: instance for (cls, name), instance in Registry.instances.items() if cls is Database}
+
+    def execute(self, stmt, params=None):
+        """
+        executes a database sql statement
+        -
+        - stmt: the sql statement
+        - params: sql parameters
+        - return: True when successfull, False when database exception
+        """
+        event = statement_started('execute', stmt, params)
+
+        try:
+            with self.bind() as connection:
+                if params is None:
+                    cursor = connection.execute(stmt)
+                else:
+                    cursor = connection.execute(stmt, params)
+
+            statement_finished(event, getattr(cursor, 'rowcount', -1))
+
+            if self.__results is not None:  # the tables the statement changed are unknown
+                self.__results.invalidate()
+
+            return True
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, error=pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            return False
+
+    @staticmethod
+    def isinitialized(alias: str = DEFAULT_DATABASE):
+        """
+        returns if the database with the given name is already initialized
+        """
+        return (Database, alias) in Registry.instances and Database(alias).dbtype() is not None
+
+    @staticmethod
+    def fetchone(cursor, stmt, params=None):
+        """
+        fetches one row from the database
+        -
+        - cursor: the database cursor
+        - stmt: the sql statement
+        - return: None when no results, dict when results found or False when database exception
+        """
+        event = statement_started('fetchone', stmt, params)
+
+        try:
+            if params is None:
+                cursor.execute(stmt)
+                result = cursor.fetchone()
+            else:
+                cursor.execute(stmt, params)
+                result = cursor.fetchone()
+
+            statement_finished(event, 0 if result is None else 1)
+
+            if result is None:
+                return None
+
+            return dict(result)
+
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, error=pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            return False
+
+    @staticmethod
+    def fetchall(cursor, stmt, params=None):
+        """
+        fetches all rows from the database
+        -
+        - cursor: the database cursor
+        - stmt: the sql statement
+        - return: None when no results, list of dicts when results found or False when database exception
+        """
+        event = statement_started('fetchall', stmt, params)
+
+        try:
+            if params is None:
+                cursor.execute(stmt)
+                result = cursor.fetchall()
+            else:
+                cursor.execute(stmt, params)
+                result = cursor.fetchall()
+
+            statement_finished(event, -1 if result is None else len(result))
+
+            if result is None:
+                return None
+
+            retvalue = []
+
+            for i, data in enumerate(result):  # pylint: disable=unused-variable
+                retvalue.append(dict(data))
+
+            return retvalue
+
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, error=pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            return False
+
+    @staticmethod
+    def fetchrows(cursor, stmt, params=None, fetchone: bool = False):
+        """
+        fetches rows from the database as the cursor returns them
+        -
+        - cursor: the database cursor
+        - stmt: the sql statement
+        - fetchone: fetch the first row only
+        - return: list of rows, the row or None for fetchone, False when database exception
+        """
+        event = statement_started('fetchrows', stmt, params)
+
+        try:
+            if params is None:
+                cursor.execute(stmt)
+            else:
+                cursor.execute(stmt, params)
+
+            if fetchone is True:
+                result = cursor.fetchone()
+                statement_finished(event, 0 if result is None else 1)
+                return result
+
+            result = cursor.fetchall()
+            statement_finished(event, len(result))
+            return result
+
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, error=pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            return False
+
+    @staticmethod
+    def fetchmany(cursor, stmt, params=None, size: int = 1000, native: bool = False):
+        """
+        fetches rows from the database in batches
+        -
+        - cursor: the database cursor
+        - stmt: the sql statement
+        - size: number of rows per batch
+        - native: yield the rows of the cursor instead of dicts
+        - return: yields lists of dicts, raises PDAException when database exception
+        """
+        event = statement_started('fetchmany', stmt, params)  # the duration includes the time the caller took
+        rowcount = 0
+
+        try:
+            if params is None:
+                cursor.execute(stmt)
+            else:
+                cursor.execute(stmt, params)
+
+            while True:
+                result = cursor.fetchmany(size)
+
+                if not result:
+                    break
+
+                rowcount += len(result)
+                yield result if native is True else [dict(data) for data in result]
+
+            statement_finished(event, rowcount)
+
+        except GeneratorExit:  # the caller stopped early
+            statement_finished(event, rowcount)
+            raise
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, rowcount, pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            raise PDAException("fetching rows from the database failed") from pdaex
+
+    @staticmethod
+    def execmany(cursor, stmt, params: list):
+        """
+        executes a database sql statement for a list of parameters
+        -
+        - cursor: the database cursor
+        - stmt: the sql statement
+        - params: list of sql parameters
+        - return: True when successfull, False when database exception
+        """
+        event = statement_started('execmany', stmt, params)
+
+        try:
+            cursor.executemany(stmt, params)
+            statement_finished(event, cursor.rowcount)
+            return True
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, error=pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            return False
+
+    @staticmethod
+    def exec(cursor, stmt, params=None):
+        """
+        executes a database sql statement
+        -
+        - cursor: the database cursor
+        - stmt: the sql statement
+        - params: sql parameters
+        - return: True when successfull, False when database exception
+        """
+        event = statement_started('exec', stmt, params)
+
+        try:
+            if params is None:
+                cursor.execute(stmt)
+            else:
+                cursor.execute(stmt, params)
+
+            statement_finished(event, cursor.rowcount)
+            return True
+        except Exception as pdaex:  # pylint: disable=broad-except
+            statement_finished(event, error=pdaex)
+            global LAST_DATABASE_EXCEPTION  # pylint: disable=global-statement
+            LAST_DATABASE_EXCEPTION = str(pdaex)
+            return False
+
+
+class Table():
+    """
+    dealing with a table in the database
+    """
+    _name: str = ''
+    _database: str = DEFAULT_DATABASE
+    _ddl: DDL = None
+    _where_pending = []
+    _create_stmt: str = ''
+    _instance = None
+
+    def __init__(self, name: str = '', create_stmt: str = '', database: str = ''):
+        """
+        init class
+        -
+        - name: the name of the table
+        - create_stmt: sql statment to create the table
+        - database: name of the database the table belongs to, by default the _database of the class
+        """
+
+        if name:
+            self._name = name
+
+        if database:
+            self._database = database
+
+        self._ddl = self.ddl()
+        self._where_pending = []
+        self._create_stmt = create_stmt
+        self._instance = None
+
+        if not Database.isinitialized(self._database):
+            raise PDAException(f"no database connection found for database {self._database}")
+
+    @property
+    def instance(self):
+        """
+        the table of the database, which is set up on first use
+        """
+        if self._instance is None:
+            db = Database(self._database)
+            dbtype = db.dbtype()
+
+            if dbtype == 'SQ3':
+                with db.bind():
+                    self._instance = TableSQ3(self._name, self._create_stmt, self._ddl, database=self._database)
+            elif dbtype == 'MSQ':
+                with db.bind():
+                    self._instance = TableMSQ(self._name, self._create_stmt, self._ddl, database=self._database)
+            elif dbtype == 'FLAT':
+                self._instance = TableFlat(self._name, self._ddl, database=self._database)
+            else:
+                pass
+
+        return self._instance
+
+    @staticmethod
+    def ddl():
+        """
+        method should be overwritten by using the DDL class
+        """
+        return ''
+
+    @staticmethod
+    def getsql(filename: str):
+        """
+        get a sql statement from a file
+        """
+        try:
+            with open(filename, 'r', encoding="ascii") as file:
+                return file.read()
+        except OSError:
+            return False
+
+    @staticmethod
+    def quote(stringvalue: str) -> str:
+        """
+        places a given string in single quotes
+        -
+        - stringvalue: the string
+        - return: the string in quotes
+        """
+        return TableBaseClass.quote(stringvalue)
+
+    def database(self) -> Database:
+        """
+        returns the tables database
+        -
+        """
+        return self.instance.database()
+
+    def tablename(self) -> str:
+        """
+        returns the name of the table
+        """
+        return self.instance.tablename/()
+
+    def primarykey(self) -> str:
+        """
+        returns the tables primary key
+        -
+        """
+        return self.instance.primarykey()
+
+    def fieldlist(self) -> str:
+        """
+        returns a list of fields in a comma separated string
+        -
+        """
+        return self.instance.fieldlist()
 
     def fields(self, field: str = '') -> dict:
         """
@@ -587,6 +1707,18 @@ class Table():
         """
         return self.instance.insert(data, empty_is_null)
 
+    def insert_many(self, rows, batch_size: int = 1000, empty_is_null: bool = True, on_insert_error=None) -> bool:
+        """
+        inserts rows into the table in batches
+        -
+        - rows: iterable of dicts with fields and their values to be inserted
+        - batch_size: rows inserted at once
+        - empty_is_null: should empty values be treated as NULL in the database
+        - on_insert_error: callable with the row number and the row when an insert failed, returning False stops
+        - return: True if all rows were processed, False when on_insert_error stopped it
+        """
+        return self.instance.insert_many(rows, batch_size, empty_is_null, on_insert_error)
+
     def delete(self, key) -> bool:
         """
         delete a row from the table
@@ -632,6 +1764,32 @@ class Table():
         """
         return self.instance.find(key)
 
+    def find_many(self, keys, chunk_size: int = 500):
+        """
+        finds many rows in the table with one query per chunk of keys
+        -
+        - keys: list of single values, or of dicts / tuples with ordered! primary key values
+        - chunk_size: number of primary key values per query
+        - return: dict of the found rows by primary key (a tuple for multiple key fields), False when sql is shit
+        """
+        return self.instance.find_many(keys, chunk_size)
+
+    def rowcache(self, size: int = 1000, version: str = ''):
+        """
+        keeps the rows found by find() in an identity map of the table
+        -
+        - size: number of rows kept, 0 turns the identity map off
+        - version: a column every write of a row changes, flat tables use the modification time and size of a row
+        """
+        self.instance.rowcache(size, version)
+        return self
+
+    def rowmap(self) -> IdentityMap:
+        """
+        returns the identity map of the table, None when rows are not kept
+        """
+        return self.instance.rowmap()
+
     def where(self, field: str, value: any, compare: str = '=', conditional: str = 'and'):
         """
         chain function
@@ -677,6 +1835,22 @@ class Table():
         """
         return self.instance.orderby(fields, direction)
 
+    def rowformat(self, rowformat: str = ROWFORMAT_DICT):
+        """
+        chain function
+        -
+        - rowformat: format of the rows of the next find, findfirst, findall or iterall,
+          'dict', 'tuple', 'namedtuple', 'slots' or 'native'
+        """
+        return self.instance.rowformat(rowformat)
+
+    def rowindex(self) -> dict:
+        """
+        returns the positions of the columns in the tuples of the last tuple result
+        -
+        """
+        return self.instance.rowindex()
+
     def count(self, select: str = '', prepared_params: tuple = ()) -> int:
         """
         counts the rows of the table
@@ -705,7 +1879,28 @@ class Table():
         - fetchone: fetch the first row of the result
         """
         self._where_pending.clear()
-        return self.instance.findall(select, prepared_params, fetchone)
+        return self.instance.findall(select, prepared_params, fetchone)
+
+    def iterall(self, select: str = '', prepared_params: tuple = (), batch_size: int = 1000):
+        """
+        finds all rows in the table and yields them one by one, memory stays the same for any result size
+        -
+        - select: the sql select statement
+        - prepared_params: which values to pass to the statement
+        - batch_size: rows to fetch from the database at once
+        """
+        self._where_pending.clear()
+        return self.instance.iterall(select, prepared_params, batch_size)
+
+    def findall_columns(self, columns='', batch_size: int = 10000) -> dict:
+        """
+        finds all rows in the table and returns a numpy array per column, needs numpy
+        -
+        - columns: list or comma separated string of the columns, all columns when left blank
+        - batch_size: rows to fetch from the database at once
+        """
+        self._where_pending.clear()
+        return self.instance.findall_columns(columns, batch_size)
 
     def begintransaction(self):
         """
@@ -728,9 +1923,27 @@ class Table():
         """
         return self.instance.rollbacktransaction()
 
+    def _converters(self) -> dict:
+        """
+        returns a function per numeric field converting a csv value to the fields type. none for a flat table,
+        which stores the values as they are given like all its other writes do
+        """
+        converters = {}
+
+        if isinstance(self.instance, TableFlat):
+            return converters
+
+        for field, properties in self.fields().items():
+            converter = numeric_type(properties['type'])
+
+            if converter is not None:
+                converters[field] = converter
+
+        return converters
+
     def import_csv(self, **kwargs) -> bool:
         """
-        imports data from a csv file into table
+        imports data from a csv file into table, the rows are inserted in batches with insert_many
         -
         - filename: name of the file to store the data
         - fields: which fields should be exported
@@ -738,10 +1951,16 @@ class Table():
         - enclosure: default: '"'
         - escape: default: '\'
         - limit: default: 99999
-        - offset: default: 0
+        - offset: rows to skip, default: 0
         - quoting: default: QUOTE_ALL
-        - on_insert_error: callable when insert failed
+        - batch_size: rows inserted in one transaction, default: 1000
+        - on_insert_error: callable with the line number and the row when insert failed, returning False stops
+        - workers: processes parsing chunks of the file, default: 0 parses in this process
+        - chunk_size: bytes of the file per chunk, default: 16MB
         """
+        if kwargs.get('workers', 0) > 1:
+            return self._import_csv_parallel(**kwargs)
+
         filename = kwargs.get('filename', f"{self._name}.csv")
         separator = kwargs.get('separator', ',')
         enclosure = kwargs.get('enclosure', '"')
@@ -749,10 +1968,24 @@ class Table():
         limit = kwargs.get('limit', 99999)
         offset = kwargs.get('offset', 0)
         quoting = kwargs.get('quoting', csv.QUOTE_ALL)
+        batch_size = kwargs.get('batch_size', 1000)
         on_insert_error = kwargs.get('on_insert_error', None)
 
+        converters = self._converters()
         linecount = 0
         fields = []
+        batch = []
+
+        def insert_batch() -> bool:
+            def batch_error(index, data):
+                if on_insert_error is not None:
+                    return on_insert_error(batch[index][0], data)
+
+                return None
+
+            result = self.insert_many([data for line, data in batch], len(batch), True, batch_error)
+            batch.clear()
+            return result
 
         with open(filename, mode='r', encoding='utf-8') as importfile:
             reader = csv.reader(importfile, delimiter=separator, quotechar=enclosure, escapechar=escape, quoting=quoting)
@@ -761,30 +1994,114 @@ class Table():
                 if len(row) > 0 and limit > 0:
                     if linecount == 0:  # 1st line is the header
                         fields = row
-                    elif linecount < offset:  # moving to offset
-                        continue
-                    else:
-                        data = {}  # build data and insert row
-
-                        try:
-                            dataerror = False
-
-                            for col, value in enumerate(row):
-                                field = fields[col]
-                                data[field] = value
-                        except IndexError:
-                            dataerror = True
+                    elif linecount > offset:
+                        data, dataerror = csv_record(fields, converters, row)  # build data and insert row
 
-                        if dataerror is True or self.insert(data) is False and on_insert_error is not None:  # on error call the callable
-                            result = on_insert_error(linecount, data)
+                        if dataerror is True:
+                            if on_insert_error is not None and on_insert_error(linecount, data) is False:
+                                return False  # callable suggested we should stop here
+                        else:
+                            batch.append((linecount, data))
 
-                            if result is False:  # callable suggested we should stop here
+                            if len(batch) >= batch_size and insert_batch() is False:
                                 return False
 
                         limit -= 1
 
                     linecount += 1
 
+        if batch and insert_batch() is False:
+            return False
+
+        return True
+
+    def _import_csv_parallel(self, **kwargs) -> bool:
+        """
+        imports a csv file whose chunks are parsed by a process pool. sql tables are written by this process
+        in the order of the file. flat tables are written by the workers, after counting the records of
+        every chunk to keep offset and limit, on_insert_error is called once all rows are written
+        """
+        filename = kwargs.get('filename', f"{self._name}.csv")
+        limit = kwargs.get('limit', 99999)
+        offset = kwargs.get('offset', 0)
+        batch_size = kwargs.get('batch_size', 1000)
+        on_insert_error = kwargs.get('on_insert_error', None)
+        workers = kwargs.get('workers')
+        dialect = {'delimiter': kwargs.get('separator', ','), 'quotechar': kwargs.get('enclosure', '"'),
+                   'escapechar': kwargs.get('escape', '\\'), 'quoting': kwargs.get('quoting', csv.QUOTE_ALL)}
+
+        header_end, chunks = csv_chunks(filename, kwargs.get('chunk_size', 16 * 1024 * 1024), dialect['quotechar'])
+        header = next(csv_rows(filename, 0, header_end, dialect), None)
+
+        if header is None:
+            return True
+
+        tasks = [{'filename': filename, 'start': start, 'end': end, 'dialect': dialect, 'fields': header,
+                  'converters': self._converters()} for start, end in chunks]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if isinstance(self.instance, TableFlat):
+                linecount = 1
+                write_tasks = []
+
+                for task, records in zip(tasks, csv_map(executor, csv_count_chunk, tasks, workers * 2)):
+                    if linecount + records > offset + 1 and linecount <= offset + limit:
+                        write_tasks.append({**task, 'line': linecount, 'first': offset + 1, 'last': offset + limit,
+                                            'batch_size': batch_size, 'table': self.instance.location()})
+
+                    linecount += records
+
+                try:
+                    for failures in csv_map(executor, csv_insert_chunk, write_tasks, workers * 2):
+                        for line, data in failures:
+                            if on_insert_error is not None and on_insert_error(line, data) is False:
+                                return False  # callable suggested we should stop here
+                except flat.FlatValidationException as pdaex:
+                    raise PDAException(pdaex.args) from pdaex
+                finally:  # the workers wrote past the caches of the table
+                    self.instance._uncache()  # pylint: disable=protected-access
+                    self.instance._forget()  # pylint: disable=protected-access
+
+                return True
+
+            linecount = 1
+            batch = []
+
+            def insert_batch() -> bool:
+                def batch_error(index, data):
+                    if on_insert_error is not None:
+                        return on_insert_error(batch[index][0], data)
+
+                    return None
+
+                result = self.insert_many([data for line, data in batch], len(batch), True, batch_error)
+                batch.clear()
+                return result
+
+            for records in csv_map(executor, csv_parse_chunk, tasks, workers * 2):
+                for data, dataerror in records:
+                    if linecount > offset + limit:
+                        break
+
+                    if linecount > offset:
+                        if dataerror is True:
+                            if on_insert_error is not None and on_insert_error(linecount, data) is False:
+                                return False  # callable suggested we should stop here
+                        else:
+                            batch.append((linecount, data))
+
+                            if len(batch) >= batch_size and insert_batch() is False:
+                                return False
+
+                    linecount += 1
+
+                if linecount > offset + limit:
+                    executor.shutdown(cancel_futures=True)
+                    break
+
+        if batch and insert_batch() is False:
+            return False
+
         return True
 
     def export_csv(self, **kwargs) -> int:
@@ -796,7 +2113,7 @@ class Table():
         - separator: default: ','
         - enclosure: default: '"'
         - escape: default: '\'
-        - limit: default: 1000
+        - limit: rows fetched at once, default: 1000
         - quoting: default: QUOTE_ALL
         """
         filename = kwargs.get('filename', f"{self._name}.csv")
@@ -807,34 +2124,277 @@ class Table():
         limit = kwargs.get('limit', 1000)
         quoting = kwargs.get('quoting', csv.QUOTE_ALL)
 
-        where_pending = self._where_pending
-        rowcount = self.count()
-        offset = 0
         lines = 0
 
         with open(filename, mode='w', encoding='utf-8') as exportfile:
             writer = csv.writer(exportfile, delimiter=separator, quotechar=enclosure, escapechar=escape, quoting=quoting)
             writer.writerow(fields)
 
-            while offset < rowcount:
-                if len(where_pending) > 0:
-                    for values in where_pending:
-                        param_field, param_value, param_compare, param__conditional = values
-                        self.where(param_field, param_value, param_compare, param__conditional)
+            for data_row in self.iterall(batch_size=limit):  # a single pass, the where conditions are applied once
+                writer.writerow([data_row[field] for field in fields])
+                lines += 1
 
-                data = self.limit(limit).offset(offset).findall()
+        return lines
 
-                for data_row in data:
-                    offset += 1
-                    field_values = []
 
-                    for field in fields:
-                        field_values.append(data_row[field])
+class FindLoader():
+    """
+    coalesces the find() calls of threads on a table. the keys requested within a window are fetched with a single
+    find_many, every key once, and each caller gets its row. callers asking for the same key share the row
+    """
+    __model = None
+    __kwargs: dict = {}
+    __window: float = 0.002
+    __max_batch: int = 500
+    __lock: threading.Lock = None
+    __batch: dict = None
+    __requests: int = 0
+    __queries: int = 0
 
-                    writer.writerow(field_values)
-                    lines += 1
+    def __init__(self, model, window: float = 0.002, max_batch: int = 500, **kwargs):
+        """
+        init class
+        -
+        - model: the Table subclass
+        - window: seconds to collect keys before they are fetched
+        - max_batch: number of keys which are fetched right away
+        - kwargs: passed on to the model, like database
+        """
+        self.__model = model
+        self.__kwargs = kwargs
+        self.__window = window
+        self.__max_batch = max_batch
+        self.__lock = threading.Lock()
+        self.__batch = None
+        self.__requests = 0
+        self.__queries = 0
 
-        return lines
+    @staticmethod
+    def normalize(key):
+        """
+        returns a key to compare requested keys and the keys of the rows with, the driver may return other types
+        """
+        if isinstance(key, dict):
+            key = tuple(key.values())
+
+        if isinstance(key, (tuple, list)):
+            return tuple(str(value) for value in key)
+
+        return str(key)
+
+    def find(self, key):
+        """
+        finds a single row by its primary key together with the keys of other threads
+        - key: the primary key of the table
+        - return: the row, None when not found, False when database exception
+        """
+        with self.__lock:
+            self.__requests += 1
+            batch = self.__batch
+            leader = batch is None  # the first caller of a window fetches the batch
+
+            if leader:
+                batch = {'keys': {}, 'full': threading.Event(), 'done': threading.Event(), 'rows': None, 'error': None}
+                self.__batch = batch
+
+            batch['keys'].setdefault(self.normalize(key), key)
+
+            if len(batch['keys']) >= self.__max_batch:
+                self.__batch = None
+                batch['full'].set()
+
+        if leader:
+            batch['full'].wait(self.__window)
+
+            with self.__lock:
+                if self.__batch is batch:
+                    self.__batch = None
+
+                self.__queries += 1
+
+            try:
+                rows = self.__model(**self.__kwargs).find_many(list(batch['keys'].values()), self.__max_batch)
+
+                if rows is not False:
+                    rows = {self.normalize(row_key): row for row_key, row in rows.items()}
+
+                batch['rows'] = rows
+            except Exception as pdaex:  # pylint: disable=broad-except
+                batch['error'] = pdaex
+            finally:
+                batch['done'].set()
+        else:
+            batch['done'].wait()
+
+        if batch['error'] is not None:
+            raise batch['error']
+
+        if batch['rows'] is False:
+            return False
+
+        return batch['rows'].get(self.normalize(key))
+
+    def statistics(self) -> dict:
+        """
+        returns the number of find requests and of the queries they needed
+        """
+        return {'requests': self.__requests, 'queries': self.__queries}
+
+
+def numeric_type(field_type):
+    """
+    returns int or float for a numeric column type of the database, None for other types
+    """
+    if isinstance(field_type, (bytes, bytearray)):
+        field_type = field_type.decode('utf-8')
+
+    field_type = str(field_type).lower()
+
+    if re.match(r'(tiny|small|medium|big)?int', field_type):
+        return int
+
+    if re.match(r'(real|float|double)', field_type):
+        return float
+
+    return None
+
+
+def column_arrays(columns: list, dtypes: list, batches) -> dict:
+    """
+    builds a numpy array per column from batches of row tuples, integer columns holding nulls become float arrays
+    -
+    - columns: the column names
+    - dtypes: the numpy dtype per column
+    - batches: iterable of lists of row tuples
+    """
+    chunks = [[] for column in columns]
+
+    for rows in batches:
+        for chunk, values, dtype in zip(chunks, zip(*rows), dtypes):
+            try:
+                chunk.append(numpy.array(values, dtype=dtype))
+            except (TypeError, ValueError):  # nulls or empty strings in a numeric column
+                values = [None if value == '' else value for value in values]
+
+                try:
+                    chunk.append(numpy.array(values, dtype=numpy.float64))
+                except (TypeError, ValueError):
+                    chunk.append(numpy.array(values, dtype=object))
+
+    return {column: numpy.concatenate(chunk) if chunk else numpy.array([], dtype=dtype)
+            for column, chunk, dtype in zip(columns, chunks, dtypes)}
+
+
+@functools.lru_cache(maxsize=256)
+def rowfactory(columns: tuple, rowformat: str):
+    """
+    returns a callable building a row of the given format from a tuple of column values,
+    None when the tuple is the row already
+    -
+    - columns: the column names of the result
+    - rowformat: 'tuple', 'namedtuple' or 'slots'
+    """
+    if rowformat == ROWFORMAT_TUPLE:
+        return None
+
+    if rowformat == ROWFORMAT_NAMEDTUPLE:
+        return namedtuple('Row', columns, rename=True)._make
+
+    if rowformat != ROWFORMAT_SLOTS:
+        raise PDAException(f"unknown row format {rowformat}")
+
+    names = tuple(name if name.isidentifier() and not keyword.iskeyword(name) and not name.startswith('_') else f"_{i}"
+                  for i, name in enumerate(columns))
+    namespace = {'__slots__': names, '_columns': dict(zip(columns, names))}
+    # a generated __init__ assigns all columns with one unpacking, like namedtuple and dataclasses do
+    exec(f"def __init__(self, values):\n    {''.join(f'self.{name}, ' for name in names)}= values", namespace)  # pylint: disable=exec-used
+
+    def getitem(self, column):
+        return getattr(self, self._columns[column])
+
+    def keys(self):
+        return list(self._columns)
+
+    def row_repr(self):
+        return f"Row({', '.join(f'{column}={self[column]!r}' for column in self._columns)})"
+
+    namespace.update({'__getitem__': getitem, 'keys': keys, '__repr__': row_repr})
+    return type('Row', (), namespace)
+
+
+def bound(method):
+    """
+    decorator binding a pooled connection of the primary database to the current thread or task
+    while a writing table method runs
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            with self._db.bind():  # pylint: disable=protected-access
+                return method(self, *args, **kwargs)
+        finally:
+            self._db.written()  # pylint: disable=protected-access
+            self._uncache()  # pylint: disable=protected-access
+
+    return wrapper
+
+
+def invalidating(method):
+    """
+    decorator dropping the cached results of the table after a writing flat table method ran
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._uncache()  # pylint: disable=protected-access
+
+    return wrapper
+
+
+def observed(method):
+    """
+    decorator passing the operations of a flat table to the statement hooks
+    """
+    operation = method.__name__.lstrip('_')
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not STATEMENT_HOOKS:
+            return method(self, *args, **kwargs)
+
+        event = statement_started('flat', *self._describe(operation, args))  # pylint: disable=protected-access
+
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception as pdaex:
+            statement_finished(event, error=pdaex)
+            raise
+
+        if isinstance(result, list) or operation == 'find_many' and isinstance(result, dict):
+            rowcount = len(result)
+        elif operation == 'find':
+            rowcount = 0 if result is None else 1
+        else:
+            rowcount = -1
+
+        statement_finished(event, rowcount)
+        return result
+
+    return wrapper
+
+
+def routed(method):
+    """
+    decorator binding a replica connection, if there is one, while a reading table method runs
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._db.route():  # pylint: disable=protected-access
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class TableBaseClass:
@@ -842,7 +2402,7 @@ class TableBaseClass:
     implements properties and functions for a database table
     """
     _type: str = None
-    _cursor = None
+    __cursor = None
     _where_str: str = ''
     _where_arr: list = []
     _limit: int = 0
@@ -857,13 +2417,18 @@ class TableBaseClass:
     _meta_data: list = []
     _parameter_marker = '?'
     _ddl: DDL = None
+    _statements: dict = {}
+    _rowformat: str = ROWFORMAT_DICT
+    _columns: dict = {}
+    _rowmap: IdentityMap = None
+    _versioncolumn: str = ''
 
     def __init__(self):
         """
         inits the class properties
         """
         self._type: str = None
-        self._cursor = None
+        self.__cursor = None
         self._where_str: str = ''
         self._where_arr: list = []
         self._limit: int = 0
@@ -878,6 +2443,38 @@ class TableBaseClass:
         self._meta_data: list = []
         self._parameter_marker = '?'
         self._ddl: DDL = None
+        self._statements: dict = {}
+        self._rowformat: str = ROWFORMAT_DICT
+        self._columns: dict = {}
+        self._rowmap: IdentityMap = None
+        self._versioncolumn: str = ''
+
+    @property
+    def _cursor(self):
+        """
+        the cursor of the table, for a pooled or replica connection the cursor kept for it
+        """
+        binding = self._db.binding()
+
+        if binding is not None and binding['pool'] is not None:
+            return self._db.cursor()
+
+        if self.__cursor is None:
+            self.__cursor = self._db.cursor()
+
+        return self.__cursor
+
+    @_cursor.setter
+    def _cursor(self, cursor):
+        self.__cursor = cursor
+
+    def _closecursor(self):
+        """
+        closes the own cursor of the table, pooled cursors are kept by the pool
+        """
+        if self.__cursor is not None and not self._db.pooled():
+            self.__cursor.close()
+            self.__cursor = None
 
     @staticmethod
     def quote(stringvalue: str) -> str:
@@ -886,6 +2483,101 @@ class TableBaseClass:
         """
         return "'" + stringvalue.replace("'", "''") + "'"
 
+    def _statement(self, operation: str, cols: tuple = ()) -> str:
+        """
+        returns the sql statement of an operation on a set of columns, which is built once per table
+        - operation: 'insert', 'update', 'delete' or 'find'
+        - cols: the columns inserted or updated
+        - raises exception when using an unkown column.
+        """
+        sql = self._statements.get((operation, cols))
+
+        if sql is not None:
+            return sql
+
+        for field in cols:
+            if field not in self._fields:
+                raise PDAException(f"field {field} in table {self._name} not defined")
+
+        if operation == 'insert':
+            marker = f"{self._parameter_marker}, " * len(cols)
+            sql = f"insert into {self._name} ({', '.join(cols)}) values ({marker[:-2]})"
+        elif operation == 'update':
+            assignments = ', '.join(f"{field}={self._parameter_marker}" for field in cols)
+            sql = f"update {self._name} set {assignments} where {self._pk_query}"
+        elif operation == 'delete':
+            sql = f"delete from {self._name} where {self._pk_query}"
+        elif operation == 'find':
+            sql = f"select * from {self._name} where {self._pk_query}"
+        else:
+            raise PDAException(f"unknown statement operation {operation}")
+
+        self._statements[(operation, cols)] = sql
+        return sql
+
+    def _hotcursor(self, sql: str):  # pylint: disable=unused-argument
+        """
+        returns the cursor to run a cached statement with, the table cursor by default
+        """
+        return self._cursor
+
+    def _resultcache(self) -> ResultCache:
+        """
+        returns the result cache of the database, None when results are not cached
+        """
+        return self._db.results()
+
+    def _uncache(self):
+        """
+        drops the cached results of the table
+        """
+        cache = self._resultcache()
+
+        if cache is not None:
+            cache.invalidate(self._name)
+
+    def _cached(self, key: tuple, query, rowformat: str = None, select: str = ''):
+        """
+        returns the result of a query from the result cache of the database, a result not cached yet gets cached
+        - key: identifies the query within the table, its statement and parameters
+        - query: callable running the query
+        - rowformat: the row format the query consumes, None when it returns no rows
+        - select: a custom select statement, which is not cached since it may read other tables whose writes
+          would not drop it
+        """
+        cache = None if select else self._resultcache()
+        key = (self._name, rowformat) + key
+
+        try:
+            hash(key)
+        except TypeError:  # parameters which cannot be part of a key
+            cache = None
+
+        if cache is None:
+            return query()
+
+        cached = cache.get(key)
+
+        if cached is not None:
+            result, columns = cached
+
+            if rowformat is not None:
+                self._rowformat = ROWFORMAT_DICT
+
+            if columns:
+                self._columns = columns
+
+            return result
+
+        generation = cache.generation(self._name)
+        result = query()
+
+        if result is not False:
+            tuples = rowformat not in (None, ROWFORMAT_DICT, ROWFORMAT_NATIVE)
+            cache.put(key, self._name, result, generation, self._columns if tuples else None)
+
+        return result
+
     def database(self) -> Database:
         """
         returns the database the table belongs to
@@ -926,6 +2618,7 @@ class TableBaseClass:
         """
         return self._name
 
+    @bound
     def create(self, sql: str):
         """
         creates the table
@@ -934,14 +2627,19 @@ class TableBaseClass:
         if not sql:
             raise PDAException("sql create statement is empty")
 
+        self._forget()
+
         if sql is None or self._name not in sql:
             raise PDAException("sql create statement invalid tablename")
 
-        if Database.exec(self._cursor, sql) is False:
-            raise PDAException(f"sql create table {self._name} statement failed")
+        for stmt in sql.split(';\n'):  # the ddl appends create index statements
+            if Database.exec(self._cursor, stmt) is False:
+                raise PDAException(f"sql create table {self._name} statement failed")
 
+        self._db.invalidate(self._name)
         return self
 
+    @bound
     def drop(self):
         """
         drops the table
@@ -949,12 +2647,15 @@ class TableBaseClass:
         """
         sql = f"DROP TABLE IF EXISTS {self._name};"
         result = Database.exec(self._cursor, sql)
+        self._db.invalidate(self._name)
+        self._forget()
 
         if result is False:
             raise PDAException(f"table {self._name} cannot be dropped")
 
         return self
 
+    @bound
     def insert(self, data: dict, empty_is_null: bool = True) -> bool:
         """
         inserts a row into the table.
@@ -962,43 +2663,77 @@ class TableBaseClass:
         - raises exception when using an unkown column.
         - returns true when the row cannot be inserted, otherwise false
         """
-        cols = '('
-        params = ' values ('
-        vals = []
+        values = {field: value for field, value in data.items()
+                  if value is not None and not (empty_is_null is True and isinstance(value, str) and not value)}
+        sql = self._statement('insert', tuple(values))
+        return Database.exec(self._hotcursor(sql), sql, tuple(values.values()))
 
-        for field, value in data.items():
-            if value is None:
-                continue
+    @bound
+    def insert_many(self, rows, batch_size: int = 1000, empty_is_null: bool = True, on_insert_error=None) -> bool:
+        """
+        inserts rows in batches, every batch is a transaction of its own or a savepoint in a running transaction.
+        rows with the same fields are sent with one executemany, which mysql turns into a multi row insert.
+        when a batch fails it is rolled back and inserted row by row to report the failing rows
+        - raises exception when using an unkown column.
+        - returns false when on_insert_error returned false, otherwise true
+        """
+        rows = iter(rows)
+        linecount = 0
 
-            if empty_is_null is True and isinstance(value, str) and not value:
-                continue
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
 
-            if field not in self._fields:
-                raise PDAException(f"field {field} in table {self._name} not defined")
+            if not batch:
+                return True
 
-            cols += f"{field}, "
-            params += f"{self._parameter_marker}, "
-            vals.append(value)
+            statements = {}
+
+            for data in batch:
+                values = {field: value for field, value in data.items()
+                          if value is not None and not (empty_is_null is True and isinstance(value, str) and not value)}
+                statements.setdefault(self._statement('insert', tuple(values)), []).append(tuple(values.values()))
+
+            transaction = not self._db.connection().in_transaction
+            Database.exec(self._cursor, "BEGIN" if transaction else "SAVEPOINT insert_many")
+            result = True
+
+            for sql, params in statements.items():
+                if Database.execmany(self._cursor, sql, params) is False:
+                    result = False
+                    break
+
+            if result is True:
+                Database.exec(self._cursor, "COMMIT" if transaction else "RELEASE SAVEPOINT insert_many")
+            else:
+                Database.exec(self._cursor, "ROLLBACK" if transaction else "ROLLBACK TO SAVEPOINT insert_many")
 
-        cols = cols[:-2] + ')'
-        params = params[:-2] + ')'
-        sql = f"insert into {self._name} {cols} {params}"
-        return Database.exec(self._cursor, sql, tuple(vals))
+                if not transaction:
+                    Database.exec(self._cursor, "RELEASE SAVEPOINT insert_many")
 
+                for data in batch:  # find the failing rows
+                    if self.insert(data, empty_is_null) is False and on_insert_error is not None:
+                        if on_insert_error(linecount, data) is False:  # callable suggested we should stop here
+                            return False
+
+                    linecount += 1
+
+                continue
+
+            linecount += len(batch)
+
+    @bound
     def delete(self, key) -> bool:
         """
         deletes a row from the table
         - returns true if successfull, else false
         """
-        sql = f"delete from {self._name} where {self._pk_query}"
-
-        if isinstance(key, dict):
-            result = Database.exec(self._cursor, sql, tuple(key.values()))
-        else:
-            result = Database.exec(self._cursor, sql, (key, ))
-
+        sql = self._statement('delete')
+        params = tuple(key.values()) if isinstance(key, dict) else (key, )
+        result = Database.exec(self._hotcursor(sql), sql, params)
+        self._forget(key)
         return result
 
+    @bound
     def deleteall(self):
         """
         deletes rows from the table
@@ -1013,39 +2748,29 @@ class TableBaseClass:
             self._where_arr.clear()
 
         result = Database.exec(self._cursor, sql, params)
+        self._forget()
         return result
 
+    @bound
     def update(self, key, data: dict) -> bool:
         """
         updates a single row
         - key: the primary key
         - data: column data to update
         """
-        sql = f"update  {self._name} set "
-        vals = []
-
-        for field, value in data.items():
-            if value is None:
-                continue
-
-            if field not in self._fields:
-                raise PDAException(f"field {field} in table {self._name} not defined")
-
-            vals.append(value)
-            sql += f"{field}={self._parameter_marker}, "
-
-        sql = sql[:-2] + f" where {self._pk_query}"
-
-        if isinstance(key, dict):
-            result = Database.exec(self._cursor, sql, tuple(data.values()) + tuple(key.values()))
-        else:
-            result = Database.exec(self._cursor, sql, tuple(data.values()) + (key, ))
+        values = {field: value for field, value in data.items() if value is not None}
+        sql = self._statement('update', tuple(values))
+        cursor = self._hotcursor(sql)
+        params = tuple(values.values()) + (tuple(key.values()) if isinstance(key, dict) else (key, ))
+        result = Database.exec(cursor, sql, params)
+        self._forget(key)
 
         if result is False:
             raise PDAException(f"data cannot be updated in table {self._name}")
 
-        return self._cursor.rowcount == 1
+        return cursor.rowcount == 1
 
+    @bound
     def updateall(self, data: dict) -> bool:
         """
         updates all rows
@@ -1065,28 +2790,147 @@ class TableBaseClass:
             vals.append(value)
             sql += f"{field}={self._parameter_marker}, "
 
-        sql = sql[:-2]
+        sql = sql[:-2]
+
+        if self._where_str:
+            sql += f" WHERE {self._where_str}"
+            params = tuple(self._where_arr)
+            self._where_str = ''
+            self._where_arr.clear()
+
+        result = Database.exec(self._cursor, sql, tuple(vals) + params)
+        self._forget()
+        return result
+
+    def rowcache(self, size: int = 1000, version: str = ''):
+        """
+        keeps up to size rows found by find() in an identity map, writes through the table keep it coherent.
+        rows changed by others are noticed by a version column, which is read instead of the row on every find,
+        without one the rows are not checked
+        - size: number of rows kept, 0 turns the identity map off
+        - version: a column every write of a row changes, like a counter or a modification timestamp
+        """
+        if version and version not in self._fields:
+            raise PDAException(f"field {version} in table {self._name} not defined")
+
+        self._rowmap = IdentityMap(size) if size > 0 else None
+        self._versioncolumn = version
+        return self
+
+    def rowmap(self) -> IdentityMap:
+        """
+        returns the identity map of the table, None when rows are not kept
+        """
+        return self._rowmap
+
+    def _forget(self, key=None):
+        """
+        drops a row, all rows without key, from the identity map
+        """
+        if self._rowmap is not None:
+            self._rowmap.discard(None if key is None else FindLoader.normalize(key))
+
+    def _rowversion(self, key):
+        """
+        returns the current version of a row to check a kept one with, None when the row does not exist
+        """
+        if not self._versioncolumn:
+            return ''
+
+        return self._readversion(key)
+
+    @routed
+    def _readversion(self, key):
+        """
+        reads the version column of a row
+        """
+        sql = f"select {self._versioncolumn} from {self._name} where {self._pk_query}"
+        params = tuple(key.values()) if isinstance(key, dict) else (key, )
+        result = Database.fetchall(self._hotcursor(sql), sql, params)
+
+        if not result:
+            return None
+
+        return result[0][self._versioncolumn]
+
+    def find(self, key):
+        """
+        finds a single row in the table, from the identity map if it keeps the row
+        - key: the primary key of the table
+        """
+        if self._rowmap is None or self._rowformat != ROWFORMAT_DICT:
+            return self._find(key)
+
+        normalized = FindLoader.normalize(key)
+        version = self._rowversion(key)
+
+        if version is None:
+            self._rowmap.discard(normalized)
+            return self._find(key)
+
+        row = self._rowmap.get(normalized, version)
+
+        if row is not None:
+            return row
 
-        if self._where_str:
-            sql += f" WHERE {self._where_str}"
-            params = tuple(self._where_arr)
-            self._where_str = ''
-            self._where_arr.clear()
+        row = self._find(key)
 
-        result = Database.exec(self._cursor, sql, tuple(vals) + params)
-        return result
+        if row:
+            self._rowmap.put(normalized, row, row[self._versioncolumn] if self._versioncolumn else version)
 
-    def find(self, key):
+        return row
+
+    @routed
+    def _find(self, key):
         """
         finds a single row in the table
         - key: the primary key of the table
         """
-        sql = f"select * from {self._name} where {self._pk_query}"
+        sql = self._statement('find')
+        params = tuple(key.values()) if isinstance(key, dict) else (key, )
 
-        if isinstance(key, dict):
-            result = Database.fetchone(self._cursor, sql, tuple(key.values()))
+        if self._rowformat == ROWFORMAT_DICT:
+            result = Database.fetchall(self._hotcursor(sql), sql, params)  # all rows, a prepared cursor is left clean
         else:
-            result = Database.fetchone(self._cursor, sql, (key, ))
+            result = self._fetch(self._cursor, sql, params)
+
+        if not result:
+            return None if result is not False else False
+
+        return result[0]
+
+    @routed
+    def find_many(self, keys, chunk_size: int = 500):
+        """
+        finds rows by their primary keys with chunked 'in' queries, or 'or' joined key queries for multiple key fields
+        - keys: list of primary keys, dicts or tuples for multiple key fields
+        - chunk_size: number of primary key values per query
+        """
+        names = list(self._pk.values())
+        keys = list(keys)
+        chunk_size = max(1, chunk_size // len(names))
+        result = {}
+
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+
+            if len(names) == 1:
+                params = tuple(chunk)
+                sql = f"select * from {self._name} where {names[0]} in ({', '.join([self._parameter_marker] * len(chunk))})"
+            else:
+                params = tuple(value for key in chunk for value in (key.values() if isinstance(key, dict) else key))
+                sql = f"select * from {self._name} where " + ' or '.join([f"({self._pk_query})"] * len(chunk))
+
+            rows = Database.fetchall(self._cursor, sql, params)
+
+            if rows is False:
+                return False
+
+            for row in rows:
+                if len(names) == 1:
+                    result[row[names[0]]] = row
+                else:
+                    result[tuple(row[name] for name in names)] = row
 
         return result
 
@@ -1144,6 +2988,73 @@ class TableBaseClass:
         self._orderby = fields + ' ' + direction
         return self
 
+    def rowformat(self, rowformat: str = ROWFORMAT_DICT):
+        """
+        chain function: rowFormat
+        - rowformat: format of the rows of the next find, findfirst, findall or iterall, dicts by default.
+          'tuple' returns the tuples of the driver, 'namedtuple' and 'slots' build lightweight row objects from them,
+          'native' passes the rows of the driver through
+        """
+        if rowformat not in ROWFORMATS:
+            raise PDAException(f"unknown row format {rowformat}")
+
+        self._rowformat = rowformat
+        return self
+
+    def rowindex(self) -> dict:
+        """
+        returns the positions of the columns in the tuples of the last tuple result
+        """
+        return self._columns
+
+    def _tuplecursor(self, connection=None):
+        """
+        returns a new cursor which fetches plain tuples
+        - connection: the connection of the cursor, the one of the database by default
+        """
+        cursor = (connection or self._db.connection()).cursor()
+        cursor.row_factory = None  # the connection makes sqlite3.Row objects
+        return cursor
+
+    def _fetch(self, cursor, sql: str, params, fetchone: bool = False):
+        """
+        fetches the rows of a statement in the format set by rowformat() and resets it
+        - cursor: the cursor for dicts and native rows
+        - fetchone: fetch the first row of the result
+        - return: the rows, the row or None for fetchone, False when database exception
+        """
+        rowformat = self._rowformat
+        self._rowformat = ROWFORMAT_DICT
+
+        if rowformat == ROWFORMAT_DICT:
+            if fetchone is True:
+                return Database.fetchone(cursor, sql, params)
+
+            return Database.fetchall(cursor, sql, params)
+
+        if rowformat == ROWFORMAT_NATIVE:
+            return Database.fetchrows(cursor, sql, params, fetchone)
+
+        cursor = self._tuplecursor()
+
+        try:
+            result = Database.fetchrows(cursor, sql, params, fetchone)
+            columns = tuple(description[0] for description in cursor.description or ())
+        finally:
+            cursor.close()
+
+        self._columns = {column: i for i, column in enumerate(columns)}
+        make = rowfactory(columns, rowformat)
+
+        if not result or make is None:
+            return result
+
+        if fetchone is True:
+            return make(result)
+
+        return list(map(make, result))
+
+    @routed
     def count(self, select: str = '', prepared_params: tuple = ()) -> int:
         """
         chain function: count the selected rows
@@ -1169,10 +3080,16 @@ class TableBaseClass:
             self._where_arr.clear()
 
         sql = f"SELECT count(*) as count from ({sql}) as T"
-        result = Database.fetchone(self._cursor, sql, params)
 
-        if result is None:
-            raise PDAException(f"count data from table {self._name} failed")
+        def query():
+            result = Database.fetchone(self._cursor, sql, params)
+
+            if result is None:
+                raise PDAException(f"count data from table {self._name} failed")
+
+            return result
+
+        result = self._cached(('count', sql, params), query, select=select)
 
         if result is False:
             return 0
@@ -1188,13 +3105,12 @@ class TableBaseClass:
         result = self.limit(1).findall(select, prepared_params, True)
         return result
 
-    def findall(self, select: str = '', prepared_params: tuple = (), fetchone: bool = False):
+    def _select(self, select: str = '', prepared_params: tuple = ()):
         """
-        finds all rows in the table
-        -
+        builds the select statement from the pending chain functions and resets them
         - select: the sql select statement
         - prepared_params: which values to pass to the statement
-        - fetchone: fetch the first row of the result
+        - return: the sql statement and its parameters
         """
         pkey = next(iter(self._pk.values()))
 
@@ -1233,20 +3149,118 @@ class TableBaseClass:
                 sql += f" OFFSET {self._offset}"
                 self._offset = 0
 
-        if fetchone is True:
-            result = Database.fetchone(self._cursor, sql, params)
-        else:
-            result = Database.fetchall(self._cursor, sql, params)
+        return sql, params
 
-        if result is False:
-            raise PDAException(f"findall data from table {self._name} failed")
+    @routed
+    def findall(self, select: str = '', prepared_params: tuple = (), fetchone: bool = False):
+        """
+        finds all rows in the table
+        -
+        - select: the sql select statement
+        - prepared_params: which values to pass to the statement
+        - fetchone: fetch the first row of the result
+        """
+        sql, params = self._select(select, prepared_params)
 
-        return result
+        def query():
+            result = self._fetch(self._cursor, sql, params, fetchone)
+
+            if result is False:
+                raise PDAException(f"findall data from table {self._name} failed")
+
+            return result
+
+        return self._cached(('findall', sql, params, fetchone), query, self._rowformat, select)
+
+    def _streamcursor(self, tuples: bool = False, connection=None):
+        """
+        returns a new cursor to stream a result with
+        - tuples: the cursor fetches plain tuples
+        - connection: the connection of the cursor, the one of the database by default
+        """
+        if tuples is True:
+            return self._tuplecursor(connection)
+
+        return (connection or self._db.connection()).cursor()
+
+    def iterall(self, select: str = '', prepared_params: tuple = (), batch_size: int = 1000):
+        """
+        finds all rows in the table and yields them one by one, fetching batch_size rows at a time
+        -
+        - select: the sql select statement
+        - prepared_params: which values to pass to the statement
+        - batch_size: rows to fetch from the database at once
+        """
+        sql, params = self._select(select, prepared_params)
+        rowformat = self._rowformat
+        self._rowformat = ROWFORMAT_DICT
+
+        def stream():
+            # a replica connection is kept by the stream only, the statements of the consumer go to the primary
+            with self._db.route(bind=False) as connection:
+                tuples = rowformat not in (ROWFORMAT_DICT, ROWFORMAT_NATIVE)
+                cursor = self._streamcursor(tuples, connection)
+
+                try:
+                    columns = None
+                    make = None
+
+                    for rows in Database.fetchmany(cursor, sql, params, batch_size, rowformat != ROWFORMAT_DICT):
+                        if tuples is True and columns is None:  # the columns are known after the first fetch
+                            columns = tuple(description[0] for description in cursor.description)
+                            self._columns = {column: i for i, column in enumerate(columns)}
+                            make = rowfactory(columns, rowformat)
+
+                        yield from rows if make is None else map(make, rows)
+                finally:
+                    cursor.close()
+
+        return stream()
+
+    def _columnlist(self, columns) -> tuple:
+        """
+        returns the column names and their numpy dtypes for findall_columns
+        - columns: list or comma separated string of the columns, all columns when empty
+        """
+        if numpy is None:
+            raise PDAException("findall_columns needs numpy, which is not installed")
+
+        if isinstance(columns, str):
+            columns = [column.strip() for column in columns.split(',') if column.strip()]
+
+        columns = list(columns) or list(self._fields)
+        dtypes = []
+
+        for column in columns:
+            if column not in self._fields:
+                raise PDAException(f"field {column} in table {self._name} not defined")
+
+            dtypes.append({int: numpy.int64, float: numpy.float64}.get(numeric_type(self._fields[column]['type']), object))
+
+        return columns, dtypes
+
+    @routed
+    def findall_columns(self, columns='', batch_size: int = 10000) -> dict:
+        """
+        finds all rows in the table and returns a numpy array per column. the rows are fetched as tuples in batches
+        and go into typed arrays right away, no row dicts are built
+        - columns: list or comma separated string of the columns, all columns when empty
+        - batch_size: rows to fetch from the database at once
+        """
+        columns, dtypes = self._columnlist(columns)
+        sql, params = self._select(f"SELECT {', '.join(columns)} FROM {self._name}")
+        cursor = self._streamcursor(True)
+
+        try:
+            return column_arrays(columns, dtypes, Database.fetchmany(cursor, sql, params, batch_size, True))
+        finally:
+            cursor.close()
 
     def begintransaction(self):
         """
-        starts a transaction
+        starts a transaction, a pooled connection stays bound until commit or rollback
         """
+        self._db.acquire()
         Database.exec(self._cursor, "BEGIN")
         return self
 
@@ -1255,6 +3269,8 @@ class TableBaseClass:
         commits a transaction
         """
         Database.exec(self._cursor, "COMMIT")
+        self._db.release()
+        self._uncache()  # results read by others meanwhile did not see the changes yet
         return self
 
     def rollbacktransaction(self):
@@ -1262,6 +3278,9 @@ class TableBaseClass:
         rolls back a transaction
         """
         Database.exec(self._cursor, "ROLLBACK")
+        self._db.release()
+        self._uncache()  # results read within the transaction saw the changes
+        self._forget()
         return self
 
 
@@ -1270,36 +3289,35 @@ class TableSQ3(TableBaseClass):
     handles a sqlite table
     """
 
-    def __init__(self, name: str, create_stmt: str, DDLdef=None, typedef: str = 'table'):
+    def __init__(self, name: str, create_stmt: str, DDLdef=None, typedef: str = 'table',
+                 database: str = DEFAULT_DATABASE):
         """
         init class
         -
         - name: the name of the table
         - create_stmt: either a sql statment or a DDL callable
         - type: either 'table' or 'view'
+        - database: name of the database the table belongs to
         """
         super().__init__()
         self._type = typedef
         self._name = name
         self._ddl = DDLdef
         self._parameter_marker = '?'
-        self._db = Database()
-
-        name = self.quote(name)
-        qtype = self.quote(typedef)
-        self._cursor = self._db.connection().cursor()
+        self._db = Database(database)
+        self._meta_data = self._db.schema(name)
 
-        stmt = f"SELECT count(*) as count FROM sqlite_master WHERE type={qtype} AND name={name};"
-        result = Database.fetchone(self._cursor, stmt)
-
-        if result['count'] == 0:  # table does not exist
-            if create_stmt is True:
-                self.create(create_stmt)  # create it with passed create stmt
-            else:
-                self.create(self._ddl.create_sq3())
+        if self._meta_data is None:  # table does not exist
+            try:
+                if create_stmt is True:
+                    self.create(create_stmt)  # create it with passed create stmt
+                else:
+                    self.create(self._ddl.create_sq3())
+            except PDAException:
+                if self._db.schema(name) is None:  # not created by another thread meanwhile
+                    raise
 
-        stmt = f"PRAGMA table_info({name})"
-        self._meta_data = Database.fetchall(self._cursor, stmt)
+            self._meta_data = self._db.schema(name)
 
         if not self._meta_data:
             raise PDAException(f"cannot retrieve metadata from table {name}")
@@ -1320,47 +3338,56 @@ class TableSQ3(TableBaseClass):
             self._pk_query = self._pk_query[:-5]
 
     def __del__(self):
-        self._cursor.close()
+        self._closecursor()
 
 
 class TableMSQ(TableBaseClass):
     """
     handles a mysql table
     """
+    __prepared: dict = {}
 
-    def __init__(self, name: str, create_stmt: str, DDLdef=None, typedef: str = 'table'):
+    def __init__(self, name: str, create_stmt: str, DDLdef=None, typedef: str = 'table',
+                 database: str = DEFAULT_DATABASE):
         """
         init class
         -
         - name: the name of the table
         - create_stmt: either a sql statment or a DDL callable
         - type: either 'table' or 'view'
+        - database: name of the database the table belongs to
         """
         super().__init__()
         self._type = typedef
         self._name = name
         self._ddl = DDLdef
         self._parameter_marker = '%s'
-        self._db = Database()
-
-        self._cursor = self._db.connection().cursor(dictionary=True, buffered=True)
-        stmt = f"SELECT 1 FROM {name};"
-        result = Database.fetchone(self._cursor, stmt)
-
-        if result is False:  # table does not exist
-            if create_stmt is True:
-                self.create(create_stmt)  # create it with passed create stmt
-            else:
-                self.create(self._ddl.create_msq())
-
-        stmt = f"DESCRIBE {name}"
-        self._meta_data = Database.fetchall(self._cursor, stmt)
+        self.__prepared = {}
+        self._db = Database(database)
+        self._meta_data = self._db.schema(name)
+
+        if self._meta_data is None:  # table does not exist
+            try:
+                if create_stmt is True:
+                    self.create(create_stmt)  # create it with passed create stmt
+                else:
+                    self.create(self._ddl.create_msq())
+            except PDAException:
+                if self._db.schema(name) is None:  # not created by another thread meanwhile
+                    raise
+
+            self._meta_data = self._db.schema(name)
 
         if not self._meta_data:
             raise PDAException(f"cannot retrieve metadata from table {name}")
 
         for key, value in enumerate(self._meta_data):  # building field dictionary from meta data
-            if isinstance(value['Key'], bytearray) and value['Key'].upper() == b'PRI':
+            column_key = value['Key']
+
+            if isinstance(column_key, (bytes, bytearray)):  # describe returns bytes, information_schema strings
+                column_key = column_key.decode('utf-8')
+
+            if column_key.upper() == 'PRI':
                 keynum = key
                 name = value['Field']
                 self._pk[keynum] = name
@@ -1380,7 +3407,49 @@ class TableMSQ(TableBaseClass):
             self._pk_query = self._pk_query[:-5]
 
     def __del__(self):
-        self._cursor.close()
+        self.__closeprepared()
+        self._closecursor()
+
+    def __closeprepared(self):
+        for connection, cursor in self.__prepared.values():  # pylint: disable=unused-variable
+            try:
+                cursor.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+        self.__prepared.clear()
+
+    def _hotcursor(self, sql: str):
+        """
+        returns a server side prepared cursor per connection and statement, the server parses the statement once
+        """
+        connection = self._db.connection()
+        prepared = self.__prepared.get((id(connection), sql))
+
+        if prepared is None:
+            if len(self.__prepared) >= PREPARED_STATEMENTS:
+                self.__closeprepared()
+
+            # keeps the connection referenced, so its id is not reused while the cursor is cached
+            prepared = (connection, connection.cursor(prepared=True, dictionary=True))
+            self.__prepared[(id(connection), sql)] = prepared
+
+        return prepared[1]
+
+    def _tuplecursor(self, connection=None):
+        """
+        returns a new buffered cursor which fetches plain tuples
+        - connection: the connection of the cursor, the one of the database by default
+        """
+        return (connection or self._db.connection()).cursor(buffered=True)
+
+    def _streamcursor(self, tuples: bool = False, connection=None):
+        """
+        returns an unbuffered cursor, the connection cannot execute other statements until the stream is consumed
+        - tuples: the cursor fetches plain tuples
+        - connection: the connection of the cursor, the one of the database by default
+        """
+        return (connection or self._db.connection()).cursor(dictionary=not tuples)
 
 
 class TableFlat(TableBaseClass):
@@ -1389,14 +3458,16 @@ class TableFlat(TableBaseClass):
     """
 
     __table: flat.FlatTable
+    __database: Database = None
 
-    def __init__(self, name: str, DDLdef=None, typedef: str = 'table'):
+    def __init__(self, name: str, DDLdef=None, typedef: str = 'table', database: str = DEFAULT_DATABASE):
         super().__init__()
         self._type = typedef
         self._name = name
         self._ddl = DDLdef
         self._parameter_marker = ''
-        self._db = Database().connection()
+        self.__database = Database(database)
+        self._db = self.__database.connection()
         self.__table = flat.FlatTable(self._db, self._name, self._ddl.create_flat())
         self._meta_data.clear()
         self._fields = self.__table.fields()
@@ -1405,14 +3476,62 @@ class TableFlat(TableBaseClass):
         if not self._db.table_exists(self._name):
             self.create('')
 
+    def _resultcache(self) -> ResultCache:
+        return self.__database.results()
+
+    def __pending(self) -> tuple:
+        """
+        returns the where conditions collected for the next query and resets them
+        """
+        where = tuple(self._where_arr)
+        self._where_arr = []
+        return where
+
+    def __applywhere(self, where: tuple):
+        for condition in where:
+            self.__table.where(*condition)
+
+    def rowcache(self, size: int = 1000, version: str = ''):
+        return super().rowcache(size)  # the modification time and size of a row tell its version
+
+    def _describe(self, operation: str, args: tuple) -> tuple:
+        """
+        returns a statement like description of an operation and its parameters for the statement hooks
+        """
+        sql = f"{operation} {self._name}"
+        conditions = []
+
+        for field, value, compare, conditional in self._where_arr:  # pylint: disable=unused-variable
+            conditions.append(f"{conditional} {field} {compare} ?" if conditions else f"{field} {compare} ?")
+
+        if conditions:
+            sql += " where " + " ".join(conditions)
+
+        if self._limit > 0:
+            sql += f" limit {self._limit}"
+
+        if self._offset > 0:
+            sql += f" offset {self._offset}"
+
+        return sql, args + tuple(condition[1] for condition in self._where_arr)
+
+    def _rowversion(self, key):
+        return self.__table.version(key)
+
+    @invalidating
     def create(self, sql: str):
         self._db.create_table(self._name)
+        self._forget()
         return self
 
+    @invalidating
     def drop(self):
         self._db.drop_table(self._name)
+        self._forget()
         return self
 
+    @invalidating
+    @observed
     def insert(self, data: dict, empty_is_null: bool = True) -> bool:
         try:
             return self.__table.insert(data)
@@ -1421,19 +3540,59 @@ class TableFlat(TableBaseClass):
         except flat.FlatValidationException as pdaex:
             raise PDAException(pdaex.args) from pdaex
 
+    def location(self) -> dict:
+        """
+        returns what a worker process needs to open the flat table
+        """
+        return {'path': self._db.path(), 'database': self._db.name(), 'table': self._name, 'fields': self._ddl.create_flat()}
+
+    @invalidating
+    @observed
+    def insert_many(self, rows, batch_size: int = 1000, empty_is_null: bool = True, on_insert_error=None) -> bool:
+        rows = iter(rows)
+        linecount = 0
+
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+
+            if not batch:
+                return True
+
+            try:
+                results = self.__table.insert_many(batch)
+            except flat.FlatValidationException as pdaex:
+                raise PDAException(pdaex.args) from pdaex
+
+            for data, result in zip(batch, results):
+                if result is False and on_insert_error is not None:
+                    if on_insert_error(linecount, data) is False:  # callable suggested we should stop here
+                        return False
+
+                linecount += 1
+
+    @invalidating
+    @observed
     def delete(self, key) -> bool:
-        return self.__table.delete(key)
+        result = self.__table.delete(key)
+        self._forget(key)
+        return result
 
+    @invalidating
+    @observed
     def deleteall(self):
-        for key in self.__table.findall(limit=self._limit, offset=self._offset, return_ids=True):
-            self.delete(key)
-
+        self.__applywhere(self.__pending())
+        self.__table.deleteall(limit=self._limit, offset=self._offset)
+        self._forget()
         self._limit = 0
         self._offset = 0
+        return True
 
+    @invalidating
+    @observed
     def update(self, key, data: dict) -> bool:
         try:
             result = self.__table.update(key, data)
+            self._forget(key)
 
             if result is False:
                 return False
@@ -1444,26 +3603,69 @@ class TableFlat(TableBaseClass):
         except flat.FlatValidationException as pdaex:
             raise PDAException(pdaex.args) from pdaex
 
+    @invalidating
+    @observed
     def updateall(self, data: dict) -> bool:
-        for key in self.__table.findall(limit=self._limit, offset=self._offset, return_ids=True):
-            self.update(key, data)
+        self.__applywhere(self.__pending())
+
+        try:
+            self.__table.updateall(data, limit=self._limit, offset=self._offset)
+        except flat.FlatValidationException as pdaex:
+            raise PDAException(pdaex.args) from pdaex
+        finally:
+            self._forget()
+            self._limit = 0
+            self._offset = 0
 
-        self._limit = 0
-        self._offset = 0
         return True
 
-    def find(self, key):
-        return self.__table.find(key)
+    @observed
+    def _find(self, key):
+        result = self.__table.find(key)
+
+        if result is None:
+            self._rowformat = ROWFORMAT_DICT
+            return None
+
+        return next(self._formatrows([result]))
+
+    def _formatrows(self, rows):
+        """
+        returns an iterator over the rows in the format set by rowformat() and resets it,
+        the row dicts of the flat table are the native rows
+        """
+        rowformat = self._rowformat
+        self._rowformat = ROWFORMAT_DICT
+
+        if rowformat in (ROWFORMAT_DICT, ROWFORMAT_NATIVE):
+            return iter(rows)
+
+        columns = tuple(self._fields)
+        self._columns = {column: i for i, column in enumerate(columns)}
+        make = rowfactory(columns, rowformat)
+        tuples = (tuple(row.get(column) for column in columns) for row in rows)
+        return tuples if make is None else map(make, tuples)
+
+    @observed
+    def find_many(self, keys, chunk_size: int = 500):
+        return self.__table.find_many(keys)
 
     def where(self, field: str, value: any, compare: str = '=', conditional: str = 'and'):
-        self.__table.where(field, value, compare, conditional)
+        self._where_arr.append((field, value, compare, conditional))  # applied by the query, a cached one needs none
         return self
 
     def addidentity(self, identify: bool = True):
         raise NotImplementedError()
 
+    @observed
     def count(self, select: str = '', prepared_params: tuple = ()) -> int:
-        return self.__table.count()
+        where = self.__pending()
+
+        def query():
+            self.__applywhere(where)
+            return self.__table.count()
+
+        return self._cached(('count', where), query)
 
     def findfirst(self, select: str = '', prepared_params: tuple = ()):
         result = self.findall()
@@ -1473,6 +3675,7 @@ class TableFlat(TableBaseClass):
 
         return False
 
+    @observed
     def findall(self, select: str = '', prepared_params: tuple = (), fetchone: bool = False):
         if self._orderby and (self._limit > 0 or self._offset > 0):
             # for computers memory sake, execution order of limit, offset and order_by is in reverse order.
@@ -1480,22 +3683,61 @@ class TableFlat(TableBaseClass):
             # resuling rows
             warnings.warn('execution order of limit/offset and order by is reverse')
 
-        result = self.__table.findall(limit=self._limit, offset=self._offset)
-
+        where = self.__pending()
+        limit, offset, orderby = self._limit, self._offset, self._orderby
         self._limit = min(self._limit, 0)
         self._offset = min(self._offset, 0)
+        self._orderby = ''
+
+        def query():
+            self.__applywhere(where)
+            result = self.__table.findall(limit=limit, offset=offset)
+
+            if orderby:
+                criteria = orderby.strip().replace('  ', '').split(" ")
+                direction = criteria.pop()
+                result = sorted(result, key=operator.itemgetter(*criteria), reverse=direction.upper() == 'DESC')
+
+            if self._rowformat != ROWFORMAT_DICT:
+                return list(self._formatrows(result))
 
+            return result
+
+        return self._cached(('findall', where, limit, offset, orderby), query, self._rowformat)
+
+    def iterall(self, select: str = '', prepared_params: tuple = (), batch_size: int = 1000):
         if self._orderby:
-            criteria = self._orderby.strip().replace('  ', '').split(" ")
-            direction = criteria.pop()
-            self._orderby = ''
+            warnings.warn('order by needs all rows in memory')
+            return iter(self.findall())
+
+        self.__applywhere(self.__pending())
+        result = self.__table.iterall(limit=self._limit, offset=self._offset)
+        self._limit = 0
+        self._offset = 0
+        return self._formatrows(result)
+
+    @observed
+    def findall_columns(self, columns='', batch_size: int = 10000) -> dict:
+        columns, dtypes = self._columnlist(columns)
+
+        if self._orderby:
+            rows = iter(self.findall())
+        else:
+            self.__applywhere(self.__pending())
+            rows = self.__table.iterall(limit=self._limit, offset=self._offset)
+            self._limit = 0
+            self._offset = 0
 
-            if direction.upper() == 'DESC':
-                return sorted(result, key=operator.itemgetter(*criteria), reverse=True)
+        def batches():
+            while True:
+                batch = [tuple(row.get(column) for column in columns) for row in itertools.islice(rows, batch_size)]
 
-            return sorted(result, key=operator.itemgetter(*criteria))
+                if not batch:
+                    break
 
-        return result
+                yield batch
+
+        return column_arrays(columns, dtypes, batches())
 
     def begintransaction(self):
         raise NotImplementedError()
@@ -1505,3 +3747,180 @@ class TableFlat(TableBaseClass):
 
     def rollbacktransaction(self):
         raise NotImplementedError()
+
+
+def csv_record(fields: list, converters: dict, row: list) -> tuple:
+    """
+    builds the field - value dict of a csv row
+    -
+    - fields: the field names from the header
+    - converters: functions converting the values of numeric fields
+    - row: the values
+    - return: the dict and True when the row has more values than fields
+    """
+    data = {}
+
+    try:
+        for col, value in enumerate(row):
+            field = fields[col]
+
+            if value and field in converters:
+                try:
+                    value = converters[field](value)
+                except ValueError:
+                    pass  # left to the database to complain about
+
+            data[field] = value
+    except IndexError:
+        return data, True
+
+    return data, False
+
+
+def csv_chunks(filename: str, chunk_size: int, enclosure: str = '"') -> tuple:
+    """
+    splits a csv file into chunks of about chunk_size bytes. a chunk ends at a newline with an even number
+    of enclosures before it, which is a record boundary as long as enclosures in values are doubled
+    -
+    - filename: the csv file
+    - chunk_size: bytes per chunk
+    - enclosure: the quote character
+    - return: the end of the header and a list of start and end offsets of the chunks
+    """
+    quote = enclosure.encode('utf-8')
+    boundaries = []
+    target = 0  # the first boundary is the end of the header
+    parity = 0
+    offset = 0
+
+    with open(filename, 'rb') as file:
+        while True:
+            block = file.read(1024 * 1024)
+
+            if not block:
+                break
+
+            position = 0
+
+            while position < len(block):
+                if offset + position < target:  # no boundary needed before the target
+                    skip = min(len(block), target - offset)
+                    parity ^= block.count(quote, position, skip) & 1
+                    position = skip
+                    continue
+
+                newline = block.find(b'\n', position)
+
+                if newline < 0:
+                    parity ^= block.count(quote, position) & 1
+                    break
+
+                parity ^= block.count(quote, position, newline) & 1
+                position = newline + 1
+
+                if parity == 0:
+                    boundaries.append(offset + position)
+                    target = offset + position + chunk_size
+
+            offset += len(block)
+
+    header_end = boundaries[0] if boundaries else offset
+    bounds = [header_end] + [boundary for boundary in boundaries[1:] if boundary < offset] + [offset]
+    return header_end, [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def csv_rows(filename: str, start: int, end: int, dialect: dict):
+    """
+    yields the non empty rows of a part of a csv file
+    """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        text = io.TextIOWrapper(io.BytesIO(file.read(end - start)), encoding='utf-8')
+
+    for row in csv.reader(text, **dialect):
+        if len(row) > 0:
+            yield row
+
+
+def csv_map(executor, function, tasks: list, window: int):
+    """
+    yields the results of the tasks in order, with at most window tasks running or waiting to be consumed
+    """
+    pending = deque()
+
+    for task in tasks:
+        pending.append(executor.submit(function, task))
+
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+def csv_parse_chunk(task: dict) -> list:
+    """
+    runs in a worker process, returns the data and the data error flag of every record in a chunk
+    """
+    return [csv_record(task['fields'], task['converters'], row)
+            for row in csv_rows(task['filename'], task['start'], task['end'], task['dialect'])]
+
+
+def csv_count_chunk(task: dict) -> int:
+    """
+    runs in a worker process, returns the number of records in a chunk
+    """
+    return sum(1 for row in csv_rows(task['filename'], task['start'], task['end'], task['dialect']))
+
+
+def csv_insert_chunk(task: dict) -> list:
+    """
+    runs in a worker process, inserts the records of a chunk between the first and the last line into a flat table
+    and returns the line number and data of the records which failed
+    """
+    location = task['table']
+    database = flat.FlatDatabase(location['path'], location['database']).connect()
+    table = flat.FlatTable(database, location['table'], location['fields'])
+    failures = []
+    batch = []
+
+    def insert_row(data: dict) -> bool:
+        try:
+            return table.insert(data)
+        except flat.FlatTableException:
+            return False
+
+    def insert_batch():
+        try:
+            results = table.insert_many([data for line, data in batch])
+        except flat.FlatTableException:  # the batch failed as a whole, find the failing rows
+            results = [insert_row(data) for line, data in batch]
+
+        for (line, data), result in zip(batch, results):
+            if result is False:
+                failures.append((line, data))
+
+        batch.clear()
+
+    for line, row in enumerate(csv_rows(task['filename'], task['start'], task['end'], task['dialect']), task['line']):
+        if line < task['first']:
+            continue
+
+        if line > task['last']:
+            break
+
+        data, dataerror = csv_record(task['fields'], task['converters'], row)
+
+        if dataerror is True:
+            failures.append((line, data))
+            continue
+
+        batch.append((line, data))
+
+        if len(batch) >= task['batch_size']:
+            insert_batch()
+
+    if batch:
+        insert_batch()
+
+    return failures
@@ -1,4 +1,7 @@
+import gc
+import os
 import unittest
+import weakref
 from easydb import flat
 
 # ====================================================================
@@ -12,9 +15,13 @@ class FlatTest(unittest.TestCase):
     datapath = 'tests/data'
     dbname = 'flat.db'
     tablename = 'Person'
+    segmenttable = 'PersonSegment'
+    indextable = 'PersonIndex'
 
     db = None
     Persons = None
+    Segments = None
+    Indexed = None
 
     def step_000(self):
         print("flat test setup...")
@@ -89,6 +96,265 @@ class FlatTest(unittest.TestCase):
         result = self.Persons.count()
         self.assertEqual(result, 3)
 
+    def step_013(self):
+        print("open / create segment table...")
+
+        if self.db.table_exists(self.segmenttable):
+            self.db.drop_table(self.segmenttable)
+
+        self.db.create_table(self.segmenttable, flat.STORAGE_SEGMENT)
+        ddl = 'PersonId integer primary_key autoincrement, first_name text, last_name text required, mail text'
+        self.Segments = flat.FlatTable(self.db, self.segmenttable, ddl)
+        self.assertEqual(self.db.table_properties(self.segmenttable)['storage'], flat.STORAGE_SEGMENT)
+
+    def step_014(self):
+        print("segment insert / update / delete...")
+
+        for first_name in ('John', 'Jim', 'Jane', "O'Neil"):
+            result = self.Segments.insert({'first_name': first_name, 'last_name': 'Softwood'})
+            self.assertEqual(result, True)
+
+        result = self.Segments.update(3, {'mail': 'jane.softwood@gmail.com'})
+        self.assertEqual(result['mail'], 'jane.softwood@gmail.com')
+        self.assertEqual(self.Segments.delete(2), True)
+        self.assertEqual(self.Segments.delete(2), False)
+        self.assertEqual(self.Segments.find(3)['mail'], 'jane.softwood@gmail.com')
+        self.assertIsNone(self.Segments.find(2))
+        self.assertEqual(self.Segments.count(), 3)
+
+    def step_015(self):
+        print("segment reopen and scan...")
+        ddl = 'PersonId integer primary_key autoincrement, first_name text, last_name text required, mail text'
+        segments = flat.FlatTable(self.db, self.segmenttable, ddl)
+        result = segments.findall()
+        self.assertEqual(sorted(row['first_name'] for row in result), ['Jane', 'John', "O'Neil"])
+        self.assertEqual(segments.where('first_name', 'J%', 'like').count(), 2)
+
+    def step_016(self):
+        print("segment compact...")
+        self.Segments.compact()
+        self.assertEqual(self.Segments.find(3)['first_name'], 'Jane')
+        self.assertEqual(self.Segments.count(), 3)
+        self.Segments.insert({'first_name': 'Jill', 'last_name': 'Softwood'})
+        ddl = 'PersonId integer primary_key autoincrement, first_name text, last_name text required, mail text'
+        segments = flat.FlatTable(self.db, self.segmenttable, ddl)
+        self.assertEqual(segments.find(5)['first_name'], 'Jill')
+        self.assertEqual(segments.count(), 4)
+
+    def step_017(self):
+        print("indexed table...")
+
+        if self.db.table_exists(self.indextable):
+            self.db.drop_table(self.indextable)
+
+        self.db.create_table(self.indextable)
+        ddl = 'PersonId integer primary_key autoincrement, name text, age integer index, mail text unique'
+        self.Indexed = flat.FlatTable(self.db, self.indextable, ddl)
+
+        for age in range(1, 101):
+            self.Indexed.insert({'name': f'name{age}', 'age': age, 'mail': f'mail{age}'})
+
+        self.assertEqual(self.Indexed.where('age', 10, '>=').where('age', 20, '<').count(), 10)
+        self.assertEqual(self.Indexed.where('mail', 'mail1%', 'like').count(), 12)
+        self.assertEqual(self.Indexed.where('age', 10, '>=').where('age', 20, '<').where('name', 'name15').count(), 1)
+
+    def step_018(self):
+        print("indexed table unique...")
+
+        with self.assertRaises(flat.FlatTableException):
+            self.Indexed.insert({'name': 'duplicate', 'age': 1, 'mail': 'mail1'})
+
+        with self.assertRaises(flat.FlatTableException):
+            self.Indexed.update(2, {'mail': 'mail1'})
+
+    def step_019(self):
+        print("indexed table update / delete...")
+        self.Indexed.update(5, {'age': 500})
+        self.Indexed.delete(6)
+        ddl = 'PersonId integer primary_key autoincrement, name text, age integer index, mail text unique'
+        indexed = flat.FlatTable(self.db, self.indextable, ddl)
+        self.assertEqual(indexed.where('age', 10, '<').count(), 7)
+        self.assertEqual(indexed.where('age', 500).findall()[0]['name'], 'name5')
+        self.assertEqual(indexed.insert({'name': 'reused', 'mail': 'mail6'}), True)
+
+    def step_020(self):
+        print("where with quotes, or and wildcards...")
+        self.assertEqual(self.Segments.where('first_name', "O'Neil").count(), 1)
+        self.assertEqual(self.Segments.where('first_name', 'J___', 'like').count(), 3)
+        result = self.Segments.where('first_name', 'John').where('first_name', 'Jill', '=', 'or').where('mail', None, '!=').count()
+        self.assertEqual(result, 1)
+        result = self.Indexed.where('age', 3, '<').where('age', 99, '>', 'or').count()
+        self.assertEqual(result, 4)
+
+    def step_021(self):
+        print("statistics...")
+        self.assertEqual(self.db.statistics(self.indextable)['rows'], 100)
+        self.assertEqual(self.Indexed.where('age', 90, '>').deleteall(), 11)
+        self.assertEqual(self.Indexed.count(), 89)
+        statistics = self.Indexed.analyze()
+        self.assertEqual(statistics['rows'], 89)
+        self.assertEqual(statistics['cardinality']['mail'], 89)
+        self.assertEqual(self.db.statistics(self.indextable)['rows'], 89)
+
+    def step_022(self):
+        print("sharded layout and migration...")
+        tablename = 'PersonSharded'
+        ddl = 'PersonId integer primary_key autoincrement, first_name text, last_name text required'
+
+        if self.db.table_exists(tablename):
+            self.db.drop_table(tablename)
+
+        self.db.create_table(tablename)
+        persons = flat.FlatTable(self.db, tablename, ddl)
+
+        for i in range(1, 21):
+            persons.insert({'first_name': f'Jim{i}', 'last_name': 'Softwood'})
+
+        self.db.migrate_table(tablename, flat.LAYOUT_SHARDED)
+        persons = flat.FlatTable(self.db, tablename, ddl)
+        self.assertEqual(persons.find(7)['first_name'], 'Jim7')
+        self.assertEqual(persons.where('first_name', 'Jim1%', 'like').count(), 11)
+        self.assertEqual(persons.insert({'first_name': 'Jim21', 'last_name': 'Softwood'}), True)
+        self.assertEqual(persons.update(21, {'last_name': 'Hardwood'})['last_name'], 'Hardwood')
+        self.assertEqual(persons.delete(1), True)
+        self.assertEqual(persons.id_exists(1), False)
+        self.assertEqual(len(persons.findall()), 20)
+
+        self.db.migrate_table(tablename, flat.LAYOUT_FLAT)
+        persons = flat.FlatTable(self.db, tablename, ddl)
+        self.assertEqual(len(persons.findall()), 20)
+        self.assertEqual(persons.find(21)['last_name'], 'Hardwood')
+
+    def step_023(self):
+        print("parallel scans...")
+        tablename = 'PersonParallel'
+        ddl = 'PersonId integer primary_key autoincrement, name text, age integer'
+        parallel_db = flat.FlatDatabase(self.datapath, self.dbname, workers=2).connect()
+
+        if parallel_db.table_exists(tablename):
+            parallel_db.drop_table(tablename)
+
+        parallel_db.create_table(tablename)
+        persons = flat.FlatTable(parallel_db, tablename, ddl)
+        sequential = flat.FlatTable(self.db, tablename, ddl)
+
+        for age in range(1, 51):
+            persons.insert({'name': f'name{age}', 'age': age})
+
+        min_rows = flat.PARALLEL_MIN_ROWS
+        flat.PARALLEL_MIN_ROWS = 0
+
+        try:
+            self.assertEqual(persons.where('age', 10, '>').count(), 40)
+            self.assertEqual(persons.where('age', 10, '>').findall(limit=5, offset=5),
+                             sequential.where('age', 10, '>').findall(limit=5, offset=5))
+            persons._scan = None  # iterall streams the rows itself, the scan processes would hold all of them
+            self.assertEqual(list(persons.where('age', 10, '>').iterall(limit=5, offset=5)),
+                             sequential.where('age', 10, '>').findall(limit=5, offset=5))
+            del persons._scan
+            self.assertEqual(persons.where('age', 40, '>').updateall({'name': 'senior'}), 10)
+            self.assertEqual(sequential.where('name', 'senior').count(), 10)
+            self.assertEqual(persons.where('name', 'senior').deleteall(), 10)
+            self.assertEqual(persons.count(), 40)
+            self.assertEqual(sequential.where('age', 0, '>').count(), 40)
+        finally:
+            flat.PARALLEL_MIN_ROWS = min_rows
+
+    def step_024(self):
+        print("sequence blocks...")
+        tablename = 'PersonBlocks'
+        ddl = 'PersonId integer primary_key autoincrement, name text'
+
+        if self.db.table_exists(tablename):
+            self.db.drop_table(tablename)
+
+        self.db.create_table(tablename)
+        first_db = flat.FlatDatabase(self.datapath, self.dbname, sequence_block=10).connect()
+        second_db = flat.FlatDatabase(self.datapath, self.dbname, sequence_block=10).connect()
+        first = flat.FlatTable(first_db, tablename, ddl)
+        second = flat.FlatTable(second_db, tablename, ddl)
+
+        for name in ('a', 'b', 'c'):
+            first.insert({'name': name})
+
+        second.insert({'name': 'd'})
+        self.assertEqual(first.where('name', 'c').findall()[0]['PersonId'], '3')
+        self.assertEqual(second.where('name', 'd').findall()[0]['PersonId'], '11')
+
+        first_db.release_sequences()  # another block follows, the numbers 4 - 10 stay unused
+        second_db.release_sequences()
+        self.assertEqual(self.db.sequence(tablename), 12)
+
+        third_db = flat.FlatDatabase(self.datapath, self.dbname, sequence_block=10).connect()
+        flat.FlatTable(third_db, tablename, ddl).insert({'name': 'e'})
+        third_ref = weakref.ref(third_db)
+        del third_db
+        gc.collect()
+        self.assertIsNone(third_ref())  # not kept alive by the exit hook, its block is returned when collected
+        self.assertEqual(self.db.sequence(tablename), 14)
+
+    def step_025(self):
+        print("segment compaction window...")
+        tablename = 'PersonCompaction'
+        ddl = 'PersonId integer primary_key autoincrement, name text'
+
+        if self.db.table_exists(tablename):
+            self.db.drop_table(tablename)
+
+        self.db.create_table(tablename, flat.STORAGE_SEGMENT)
+        writer = flat.FlatTable(self.db, tablename, ddl)
+        reader = flat.FlatTable(self.db, tablename, ddl)
+
+        for name in ('a', 'b', 'c'):
+            writer.insert({'name': name})
+
+        writer.update(1, {'name': 'updated'})
+        writer.delete(2)
+        self.assertEqual(reader.count(), 2)
+
+        location = os.path.join(self.db.fullpath(), tablename)
+        old_segments = {name: open(os.path.join(location, name), 'rb').read()
+                        for name in os.listdir(location) if name.startswith('segment_')}
+        writer.compact()
+        writer.update(1, {'name': 'compacted'})
+
+        # the old segments with the marker are still there until the compaction removes them
+        for name, data in old_segments.items():
+            with open(os.path.join(location, name), 'wb') as file:
+                file.write(data + (b'[null]\n' if name == max(old_segments) else b''))
+
+        for table in (reader, flat.FlatTable(self.db, tablename, ddl)):
+            self.assertEqual(table.find(1)['name'], 'compacted')
+            self.assertIsNone(table.find(2))
+            self.assertEqual(table.count(), 2)
+
+        for name in old_segments:
+            os.remove(os.path.join(location, name))
+
+        self.assertEqual(reader.find(3)['name'], 'c')
+        self.assertEqual(reader.count(), 2)
+
+    def step_026(self):
+        print("concurrent insert of a primary key...")
+        tablename = 'PersonRace'
+        ddl = 'PersonId integer primary_key autoincrement, name text'
+
+        if self.db.table_exists(tablename):
+            self.db.drop_table(tablename)
+
+        self.db.create_table(tablename)
+        first = flat.FlatTable(self.db, tablename, ddl)
+        second = flat.FlatTable(self.db, tablename, ddl)
+        self.assertEqual(first.insert({'PersonId': '7', 'name': 'first'}), True)
+
+        second.id_exists = lambda primary_key: False  # the other process checked before the row was written
+        self.assertEqual(second.insert({'PersonId': '7', 'name': 'second'}), False)
+        del second.id_exists
+
+        self.assertEqual(first.find('7')['name'], 'first')
+        self.assertEqual(self.db.statistics(tablename)['rows'], 1)
+        self.assertEqual(first.count(), 1)
+
     def _steps(self):
         for name in dir(self):
             if name.startswith("step"):
@@ -1,6 +1,9 @@
+import csv
+import asyncio
 import unittest
 from pathlib import Path
 from easydb import pda
+from easydb import aio
 
 # ====================================================================
 # Unittest V1.1.0
@@ -17,7 +20,8 @@ class TestModel(pda.Table):
             .integer('aId', True, True, True) \
             .text('aKey', 64, True, True) \
             .text('aString') \
-            .integer('aInt')
+            .integer('aInt') \
+            .index('aInt')
 
 
 class PdaTest(unittest.TestCase):
@@ -196,6 +200,253 @@ class PdaTest(unittest.TestCase):
         result = self.table.count()
         self.assertEqual(result, 0)
 
+    def step_032(self):
+        print("count rows where range on index...")
+
+        for i in range(1, 301):
+            self.table.insert({'aKey': f'RangeKey{i}', 'aString': 'StrVal', 'aInt': i})
+
+        result = self.table.where('aInt', 100, '>=').where('aInt', 200, '<').count()
+        self.assertEqual(result, 100)
+
+    def step_033(self):
+        print("insert duplicate unique...")
+        result = self.table.insert({'aKey': 'RangeKey1', 'aString': 'StrVal', 'aInt': 1})
+        self.assertEqual(result, False)
+
+    def step_034(self):
+        print("iterate all...")
+        result = list(self.table.iterall(batch_size=3))
+        self.assertEqual(len(result), self.table.count())
+        result = list(self.table.where('aInt', 100, '>=').where('aInt', 200, '<').iterall())
+        self.assertEqual(len(result), 100)
+        result = list(self.table.limit(5).iterall())
+        self.assertEqual(len(result), 5)
+
+    def step_035(self):
+        print("insert many...")
+        errors = []
+        rows = [{'aKey': f'BulkKey{i}', 'aString': 'bulk', 'aInt': 1000 + i} for i in range(10)]
+        rows.append({'aKey': 'BulkKey3', 'aString': 'bulk', 'aInt': 2000})
+        result = self.table.insert_many(rows, batch_size=4, on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [10])
+        self.assertEqual(self.table.where('aString', 'bulk').count(), 10)
+        self.assertEqual(self.table.where('aInt', 1000, '>=').where('aInt', 1010, '<').count(), 10)
+        result = self.table.insert_many([{'aKey': 'BulkKey1'}, {'aKey': 'BulkKey20'}], on_insert_error=lambda line, data: False)
+        self.assertEqual(result, False)
+
+    def step_036(self):
+        print("find many...")
+        keys = [row['aId'] for row in self.table.where('aString', 'bulk').findall()]
+        result = self.table.find_many(keys + ['999999'])
+        self.assertEqual(sorted(result), sorted(keys))
+        self.assertEqual(result[keys[0]]['aString'], 'bulk')
+
+    def step_037(self):
+        print("export to csv with where...")
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        self.table.where('aString', 'bulk')
+        result = self.table.export_csv(filename=filename, limit=3)
+        self.assertEqual(result, 10)
+
+    def step_038(self):
+        print("import from csv in batches...")
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        self.table.where('aString', 'bulk')
+        self.table.deleteall()
+        result = self.table.import_csv(filename=filename, offset=2, limit=5, batch_size=2)
+        self.assertEqual(result, True)
+        self.assertEqual(self.table.where('aString', 'bulk').count(), 5)
+        self.assertEqual(self.table.where('aInt', 1000, '>=').where('aInt', 1010, '<').count(), 5)
+        errors = []
+        result = self.table.import_csv(filename=filename, offset=2, limit=5, on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [3, 4, 5, 6, 7])
+
+    def step_039(self):
+        print("import from csv in parallel...")
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        self.table.where('aString', 'bulk')
+        self.table.deleteall()
+        result = self.table.import_csv(filename=filename, offset=2, limit=5, workers=2, chunk_size=64)
+        self.assertEqual(result, True)
+        self.assertEqual(self.table.where('aString', 'bulk').count(), 5)
+        errors = []
+        result = self.table.import_csv(filename=filename, offset=2, limit=5, workers=2, chunk_size=64,
+                                       on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [3, 4, 5, 6, 7])
+
+    def step_040(self):
+        print("row formats...")
+        self.table.where('aString', 'bulk')
+        rows = self.table.findall()
+        self.table.where('aString', 'bulk')
+        result = self.table.rowformat('tuple').findall()
+        index = self.table.rowindex()
+        self.assertEqual([row[index['aKey']] for row in result], [row['aKey'] for row in rows])
+        self.table.where('aString', 'bulk')
+        result = list(self.table.rowformat('slots').iterall())
+        self.assertEqual([row.aKey for row in result], [row['aKey'] for row in rows])
+        self.assertEqual(self.table.rowformat('namedtuple').find(rows[0]['aId']).aKey, rows[0]['aKey'])
+
+    def step_041(self):
+        print("columnar fetch...")
+        if pda.numpy is None:
+            print("numpy not installed, skipped")
+            return
+
+        self.table.where('aString', 'bulk')
+        rows = self.table.findall()
+        self.table.where('aString', 'bulk')
+        result = self.table.findall_columns(['aId', 'aInt'], batch_size=2)
+        self.assertEqual(result['aInt'].dtype, pda.numpy.int64)
+        self.assertEqual(result['aInt'].tolist(), [int(row['aInt']) for row in rows])
+        self.assertEqual(sorted(result['aId'].tolist()), sorted(int(row['aId']) for row in rows))
+
+    def step_042(self):
+        print("asyncio api...")
+        pda.Database('asyncflat').db_flat(self.datapath, 'asyncflat.db')
+        adb = aio.AsyncDatabase('asyncflat', workers=4)
+
+        async def run():
+            await adb.table(TestModel).drop()
+            await adb.table(TestModel).count()  # sets the table up before the concurrent inserts
+            await asyncio.gather(*(adb.table(TestModel).insert({'aKey': f'AsyncKey{i}', 'aString': 'async', 'aInt': i})
+                                   for i in range(20)))
+            table = adb.table(TestModel)
+            self.assertEqual(await table.where('aString', 'async').count(), 20)
+            self.assertEqual(sorted((await table.find_many(range(1, 21))).keys()), sorted(str(i) for i in range(1, 21)))
+            rows = [row async for row in table.where('aInt', 15, '>=').iterall()]
+            self.assertEqual(len(rows), 5)
+
+        asyncio.run(run())
+        adb.close()
+
+    def step_043(self):
+        print("result cache...")
+        pda.Database('cachedflat').db_flat(self.datapath, 'cachedflat.db').cache(ttl=60)
+        cache = pda.Database('cachedflat').results()
+        tm = TestModel(database='cachedflat')
+        tm.drop()
+        tm = TestModel(database='cachedflat')
+        tm.instance.insert_many({'aKey': f'CacheKey{i}', 'aString': 'cached', 'aInt': i} for i in range(10))
+
+        rows = tm.where('aInt', 5, '<').orderby('aInt').findall()
+        self.assertEqual(tm.where('aInt', 5, '<').orderby('aInt').findall(), rows)
+        self.assertEqual(tm.where('aInt', 5, '>=').count(), 5)
+        self.assertEqual(tm.where('aInt', 5, '>=').count(), 5)
+        self.assertEqual(cache.statistics()['hits'], 2)
+
+        tm.where('aInt', 7, '>').deleteall()
+        self.assertEqual(cache.statistics()['entries'], 0)
+        self.assertEqual(tm.where('aInt', 5, '>=').count(), 3)
+        self.assertEqual(len(tm.findall()), 8)
+
+    def step_044(self):
+        print("identity map...")
+        tm = TestModel(database='cachedflat').rowcache(5)
+        other = TestModel(database='cachedflat')
+        self.assertEqual(tm.find(1)['aKey'], 'CacheKey0')
+        self.assertEqual(tm.find('1')['aKey'], 'CacheKey0')
+        self.assertEqual(tm.rowmap().statistics(), {'hits': 1, 'misses': 1, 'rows': 1})
+
+        tm.update(1, {'aString': 'updated'})
+        self.assertEqual(tm.find(1)['aString'], 'updated')
+        other.update(1, {'aString': 'changed by another table'})  # noticed by the size of the row file
+        self.assertEqual(tm.find(1)['aString'], 'changed by another table')
+        other.delete(1)
+        self.assertIsNone(tm.find(1))
+
+    def step_045(self):
+        print("statement hooks...")
+        events = []
+
+        class Recorder(pda.StatementHook):
+            def before(self, event: dict):
+                events.append(event)
+
+        recorder = pda.add_hook(Recorder())
+        tm = TestModel(database='cachedflat')
+
+        try:
+            tm.where('aInt', 3, '>').where('aInt', 9, '<').limit(2).findall()
+            tm.find(2)
+        finally:
+            pda.remove_hook(recorder)
+
+        self.assertEqual([event['operation'] for event in events], ['flat', 'flat'])
+        self.assertEqual(events[0]['sql'], 'findall Person where aInt > ? and aInt < ? limit 2')
+        self.assertEqual(events[0]['params'][-2:], (3, 9))
+        self.assertEqual((events[1]['sql'], events[1]['rowcount']), ('find Person', 1))
+
+    def step_046(self):
+        print("insert many with an invalid row...")
+        tm = TestModel(database='cachedflat')
+        errors = []
+        rows = [{'aKey': 'ValidKey1', 'aString': 'valid'}, {'aString': 'no key'}, {'aKey': 'ValidKey2', 'aString': 'valid'}]
+        result = tm.insert_many(rows, on_insert_error=lambda linecount, data: errors.append((linecount, data)))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [(1, {'aString': 'no key'})])
+        self.assertEqual(tm.where('aString', 'valid').count(), 2)
+
+    def step_047(self):
+        print("import csv with an invalid row...")
+        filename = f"{self.datapath}/invalid.csv"
+
+        with open(filename, 'w', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+            writer.writerows([['aKey', 'aString', 'aInt'], ['CsvKey1', 'csv', '1'], ['', 'csv', '2'], ['CsvKey3', 'csv', '3']])
+
+        for workers in (0, 2):
+            tm = TestModel(database='cachedflat')
+            tm.drop()
+            tm = TestModel(database='cachedflat')
+            errors = []
+            result = tm.import_csv(filename=filename, workers=workers, chunk_size=16,
+                                   on_insert_error=lambda linecount, data: errors.append((linecount, data)))
+            self.assertEqual(result, True)
+            self.assertEqual(errors, [(2, {'aKey': '', 'aString': 'csv', 'aInt': '2'})])
+            self.assertEqual(sorted(row['aKey'] for row in tm.findall()), ['CsvKey1', 'CsvKey3'])
+
+    def step_048(self):
+        print("parallel csv import with the result cache...")
+        filename = f"{self.datapath}/cached.csv"
+
+        with open(filename, 'w', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+            writer.writerow(['aKey', 'aString', 'aInt'])
+            writer.writerows([f'ImportKey{i}', 'import', str(i)] for i in range(50))
+
+        tm = TestModel(database='cachedflat')
+        tm.drop()
+        tm = TestModel(database='cachedflat').rowcache(10)
+        self.assertEqual(tm.count(), 0)
+        self.assertEqual(tm.findall(), [])
+        self.assertIsNone(tm.find(1))
+        self.assertEqual(tm.import_csv(filename=filename, workers=2, chunk_size=256), True)
+        self.assertEqual(tm.count(), 50)
+        self.assertEqual(len(tm.findall()), 50)
+        self.assertIsNotNone(tm.find(1))
+
+    def step_049(self):
+        print("import csv next to inserted rows...")
+        filename = f"{self.datapath}/mixed.csv"
+
+        with open(filename, 'w', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+            writer.writerows([['aKey', 'aString', 'aInt'], ['MixedKey7', 'mixed', '7'], ['MixedKey9', 'mixed', '9']])
+
+        for workers in (0, 2):
+            tm = TestModel(database='cachedflat')
+            tm.drop()
+            tm = TestModel(database='cachedflat')
+            tm.insert({'aKey': 'MixedKey5', 'aString': 'mixed', 'aInt': '5'})
+            self.assertEqual(tm.import_csv(filename=filename, workers=workers, chunk_size=16), True)
+            rows = tm.orderby('aInt').findall()  # the imported values are stored like the inserted ones
+            self.assertEqual([row['aInt'] for row in rows], ['5', '7', '9'])
+
     def _steps(self):
         for name in dir(self):
             if name.startswith("step"):
@@ -1,3 +1,5 @@
+import time
+import threading
 import unittest
 from pathlib import Path
 from easydb import pda
@@ -19,7 +21,8 @@ class TestModel(pda.Table):
             .text('aString') \
             .integer('aInt') \
             .datetime('adatetime', False, False, 'CURRENT_TIMESTAMP') \
-            .text('defaultcol', 32, False, False, 'test content')
+            .text('defaultcol', 32, False, False, 'test content') \
+            .index('aInt')
 
 
 class TestModelCopy(pda.Table):
@@ -289,6 +292,287 @@ class PdaTest(unittest.TestCase):
         result = tmc.where('aInt', '99').deleteall()
         self.assertEqual(result, True)
 
+    def step_041(self):
+        print("iterate all...")
+        tm = TestModel()
+        result = list(tm.iterall(batch_size=3))
+        self.assertEqual(result, tm.findall())
+        result = list(tm.where('aInt', 100, '>=').iterall(batch_size=7))
+        self.assertEqual(result, tm.where('aInt', 100, '>=').findall())
+
+    def step_042(self):
+        print("insert many...")
+        tm = TestModel()
+        errors = []
+        rows = [{'aKey': f'BulkKey{i}', 'aString': 'bulk', 'aInt': 1000 + i} for i in range(10)]
+        rows.append({'aKey': 'BulkKey3', 'aString': 'bulk', 'aInt': 2000})
+        result = tm.insert_many(rows, batch_size=4, on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [10])
+        self.assertEqual(tm.where('aString', 'bulk').count(), 10)
+        result = tm.insert_many([{'aKey': 'BulkKey1'}, {'aKey': 'BulkKey20'}], on_insert_error=lambda line, data: False)
+        self.assertEqual(result, False)
+
+    def step_043(self):
+        print("find many...")
+        tm = TestModel()
+        keys = [row['aId'] for row in tm.where('aString', 'bulk').findall()]
+        result = tm.find_many(keys + [999999], chunk_size=3)
+        self.assertEqual(sorted(result), sorted(keys))
+        self.assertEqual(result[keys[0]]['aString'], 'bulk')
+
+    def step_044(self):
+        print("export to csv with where...")
+        tm = TestModel()
+        filename = f"{self.datapath}/{tm.name()}Bulk.csv"
+        tm.where('aString', 'bulk')
+        result = tm.export_csv(filename=filename, limit=3)
+        self.assertEqual(result, 10)
+
+    def step_045(self):
+        print("import from csv in batches...")
+        tmc = TestModelCopy()
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, batch_size=2)
+        self.assertEqual(result, True)
+        self.assertEqual(tmc.where('aString', 'bulk').count(), 5)
+        errors = []
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [3, 4, 5, 6, 7])
+
+    def step_046(self):
+        print("import from csv in parallel...")
+        tmc = TestModelCopy()
+        tmc.where('aString', 'bulk')
+        tmc.deleteall()
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, workers=2, chunk_size=64)
+        self.assertEqual(result, True)
+        self.assertEqual(tmc.where('aString', 'bulk').count(), 5)
+        errors = []
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, workers=2, chunk_size=64,
+                                on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [3, 4, 5, 6, 7])
+
+
+    def step_047(self):
+        print("connection pool...")
+        pda.Database().db_msq(self.host, self.database, self.user, self.password).pool(minsize=1, maxsize=2, timeout=0.5)
+        errors = []
+
+        def insert_rows(thread):
+            try:
+                tm = TestModel()
+
+                for i in range(20):
+                    if tm.insert({'aKey': f'PoolKey{thread}-{i}', 'aString': 'pool', 'aInt': i}) is False:
+                        errors.append(pda.LAST_DATABASE_EXCEPTION)
+            except pda.PDAException as pdaex:
+                errors.append(str(pdaex))
+
+        threads = [threading.Thread(target=insert_rows, args=(thread, )) for thread in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'pool').count(), 80)
+
+        held = threading.Event()
+        done = threading.Event()
+
+        def hold_connection():
+            holder = TestModel().begintransaction()
+            held.set()
+            done.wait()
+            holder.committransaction()
+
+        tm.begintransaction()  # this thread and the holder use both connections
+        holder = threading.Thread(target=hold_connection)
+        holder.start()
+        held.wait()
+        waiting = threading.Thread(target=insert_rows, args=('timeout', ))
+        waiting.start()
+        waiting.join()
+        done.set()
+        holder.join()
+        tm.committransaction()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('no database connection available', errors[0])
+        self.db = pda.Database().db_msq(self.host, self.database, self.user, self.password)
+
+    def step_048(self):
+        print("read replicas...")
+        # the primary stands in as its own replica, there is no replication lag to observe
+        pda.Database().replica_msq(self.host, self.database, self.user, self.password).read_your_writes(0.2)
+
+        tm = TestModel()
+        self.assertEqual(tm.insert({'aKey': 'ReplicaKey', 'aString': 'replica', 'aInt': 1}), True)
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'replica').count(), 1)  # read your writes on the primary
+
+        time.sleep(0.3)
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'replica').count(), 1)  # read from the replica
+        self.assertEqual(len(list(TestModel().iterall(batch_size=10))), TestModel().count())
+        self.db = pda.Database().db_msq(self.host, self.database, self.user, self.password)
+
+    def step_049(self):
+        print("named databases...")
+
+        class HotModel(TestModel):
+            _database: str = 'hot'
+
+        pda.Database('hot').db_sq3(':memory:')
+        hot = HotModel()
+        self.assertEqual(hot.insert({'aKey': 'HotKey', 'aString': 'hot', 'aInt': 1}), True)
+        self.assertEqual(HotModel().count(), 1)
+        self.assertEqual(TestModel().where('aString', 'hot').count(), 0)
+        self.assertEqual(pda.Database().dbtype(), 'MSQ')
+
+    def step_050(self):
+        print("statement cache...")
+        tm = TestModel()
+        tm.where('aString', 'statement')
+        tm.deleteall()
+
+        for i in range(3):
+            self.assertEqual(tm.insert({'aKey': f'StatementKey{i}', 'aString': 'statement', 'aInt': i}), True)
+
+        key = tm.where('aKey', 'StatementKey1').findall()[0]['aId']
+        self.assertEqual(tm.update(key, {'aInt': 10, 'defaultcol': None}), True)
+        self.assertEqual(tm.find(key)['aInt'], 10)
+        self.assertEqual(tm.delete(key), True)
+        self.assertIsNone(tm.find(key))
+        statements = tm.instance._statements  # pylint: disable=protected-access
+        self.assertEqual(sorted(operation for operation, cols in statements), ['delete', 'find', 'insert', 'update'])
+
+        with self.assertRaises(pda.PDAException):
+            tm.insert({'aKey': 'StatementKey3', 'unknown': 1})
+
+    def step_051(self):
+        print("schema cache and lazy tables...")
+        self.db.invalidate()
+        self.assertIn('Person', self.db.introspect())
+        self.assertEqual(TestModel().primarykey(), {0: 'aId'})
+
+        class SchemaModel(TestModel):
+            _name: str = 'PersonSchema'
+
+        SchemaModel().drop()
+        self.assertNotIn('extra', SchemaModel().fields())
+        self.db.execute("ALTER TABLE PersonSchema ADD COLUMN extra text")
+        self.assertNotIn('extra', SchemaModel().fields())  # cached until invalidated
+        self.db.invalidate('PersonSchema')
+        self.assertIn('extra', SchemaModel().fields())
+
+    def step_052(self):
+        print("row formats...")
+        tm = TestModel()
+        tm.where('aString', 'statement')
+        rows = tm.findall()
+        key = rows[0]['aId']
+
+        tm.where('aString', 'statement')
+        result = tm.rowformat('tuple').findall()
+        index = tm.rowindex()
+        self.assertEqual([row[index['aKey']] for row in result], [row['aKey'] for row in rows])
+
+        tm.where('aString', 'statement')
+        result = tm.rowformat('namedtuple').findall()
+        self.assertEqual([row.aKey for row in result], [row['aKey'] for row in rows])
+
+        tm.where('aString', 'statement')
+        result = list(tm.rowformat('slots').iterall(batch_size=1))
+        self.assertEqual([row.aKey for row in result], [row['aKey'] for row in rows])
+        self.assertEqual(result[0]['aInt'], rows[0]['aInt'])
+        self.assertFalse(hasattr(result[0], '__dict__'))
+
+        tm.where('aString', 'statement')
+        result = tm.rowformat('native').findall()
+        self.assertIsInstance(result[0], dict)
+        self.assertEqual(tm.rowformat('tuple').find(key)[index['aId']], key)
+        self.assertEqual(tm.find(key), rows[0])  # the format is reset after each query
+
+        with self.assertRaises(pda.PDAException):
+            tm.rowformat('xml')
+
+    def step_053(self):
+        print("columnar fetch...")
+        if pda.numpy is None:
+            print("numpy not installed, skipped")
+            return
+
+        tm = TestModel()
+        tm.where('aString', 'statement')
+        rows = tm.findall()
+        tm.where('aString', 'statement')
+        result = tm.findall_columns('aKey, aInt', batch_size=1)
+        self.assertEqual(list(result), ['aKey', 'aInt'])
+        self.assertEqual(result['aInt'].dtype, pda.numpy.int64)
+        self.assertEqual(result['aInt'].tolist(), [row['aInt'] for row in rows])
+        self.assertEqual(result['aKey'].tolist(), [row['aKey'] for row in rows])
+
+        tm.where('aString', 'nothing found')
+        self.assertEqual(len(tm.findall_columns()['aId']), 0)
+
+        with self.assertRaises(pda.PDAException):
+            tm.findall_columns('unknown')
+
+    def step_054(self):
+        print("result cache...")
+        db = pda.Database().cache(ttl=60)
+        tm = TestModel()
+        rows = tm.where('aInt', 5, '<').orderby('aId').findall()
+        self.assertEqual(tm.where('aInt', 5, '<').orderby('aId').findall(), rows)
+        self.assertEqual(tm.where('aInt', 5, '<').count(), len(rows))
+        self.assertEqual(tm.where('aInt', 5, '<').count(), len(rows))
+        self.assertEqual(db.results().statistics()['hits'], 2)
+
+        tm.insert({'aKey': 'CacheKeyNew', 'aString': 'cached', 'aInt': 1})
+        self.assertEqual(db.results().statistics()['entries'], 0)
+        self.assertEqual(tm.where('aInt', 5, '<').count(), len(rows) + 1)
+        db.cache(ttl=0)
+
+    def step_055(self):
+        print("identity map...")
+        tm = TestModel().rowcache(5, 'aInt')
+        other = TestModel()
+        tm.insert({'aKey': 'RowcacheKey', 'aString': 'rowcache', 'aInt': 1})
+        key = tm.where('aKey', 'RowcacheKey').findfirst()['aId']
+        self.assertEqual(tm.find(key)['aString'], 'rowcache')
+        self.assertEqual(tm.find(key)['aString'], 'rowcache')
+        self.assertEqual(tm.rowmap().statistics()['hits'], 1)
+        other.update(key, {'aString': 'versioned', 'aInt': 2})
+        self.assertEqual(tm.find(key)['aString'], 'versioned')
+        tm.delete(key)
+        self.assertIsNone(tm.find(key))
+
+    def step_056(self):
+        print("statement hooks and slow query log...")
+        logfile = Path(self.datapath) / 'slow_mysql.log'
+        logfile.unlink(missing_ok=True)
+        slowlog = pda.add_hook(pda.SlowQueryLog(str(logfile), threshold=0.0))
+        tm = TestModel()
+
+        try:
+            tm.where('aString', 'statement').findall()
+            tm.insert({'aKey': 'HookKey', 'aString': 'hook'})
+            self.assertEqual(tm.insert({'aKey': 'HookKey', 'aString': 'hook'}), False)
+        finally:
+            pda.remove_hook(slowlog)
+            slowlog.close()
+
+        statistics = slowlog.statistics()
+        self.assertEqual((statistics['errors'], statistics['logged']), (1, statistics['statements']))
+        self.assertIn('Duplicate entry', logfile.read_text(encoding='utf-8'))
+
     def _steps(self):
         for name in dir(self):
             if name.startswith("step"):
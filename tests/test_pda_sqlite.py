@@ -1,6 +1,12 @@
+import csv
+import time
+import sqlite3
+import threading
+import asyncio
 import unittest
 from pathlib import Path
 from easydb import pda
+from easydb import aio
 
 # ====================================================================
 # Unittest V1.2.0
@@ -19,7 +25,8 @@ class TestModel(pda.Table):
             .text('aString') \
             .integer('aInt') \
             .datetime('adatetime', False, False, 'CURRENT_TIMESTAMP') \
-            .text('defaultcol', 32, False, False, 'test content')
+            .text('defaultcol', 32, False, False, 'test content') \
+            .index('aInt')
 
 
 class TestModelCopy(pda.Table):
@@ -287,6 +294,534 @@ class PdaTest(unittest.TestCase):
         result = tmc.where('aInt', '99').deleteall()
         self.assertEqual(result, True)
 
+    def step_041(self):
+        print("iterate all...")
+        tm = TestModel()
+        result = list(tm.iterall(batch_size=3))
+        self.assertEqual(result, tm.findall())
+        result = list(tm.where('aInt', 100, '>=').iterall(batch_size=7))
+        self.assertEqual(result, tm.where('aInt', 100, '>=').findall())
+
+    def step_042(self):
+        print("insert many...")
+        tm = TestModel()
+        errors = []
+        rows = [{'aKey': f'BulkKey{i}', 'aString': 'bulk', 'aInt': 1000 + i} for i in range(10)]
+        rows.append({'aKey': 'BulkKey3', 'aString': 'bulk', 'aInt': 2000})
+        result = tm.insert_many(rows, batch_size=4, on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [10])
+        self.assertEqual(tm.where('aString', 'bulk').count(), 10)
+        result = tm.insert_many([{'aKey': 'BulkKey1'}, {'aKey': 'BulkKey20'}], on_insert_error=lambda line, data: False)
+        self.assertEqual(result, False)
+
+    def step_043(self):
+        print("find many...")
+        tm = TestModel()
+        keys = [row['aId'] for row in tm.where('aString', 'bulk').findall()]
+        result = tm.find_many(keys + [999999], chunk_size=3)
+        self.assertEqual(sorted(result), sorted(keys))
+        self.assertEqual(result[keys[0]]['aString'], 'bulk')
+
+    def step_044(self):
+        print("export to csv with where...")
+        tm = TestModel()
+        filename = f"{self.datapath}/{tm.name()}Bulk.csv"
+        tm.where('aString', 'bulk')
+        result = tm.export_csv(filename=filename, limit=3)
+        self.assertEqual(result, 10)
+
+    def step_045(self):
+        print("import from csv in batches...")
+        tmc = TestModelCopy()
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, batch_size=2)
+        self.assertEqual(result, True)
+        self.assertEqual(tmc.where('aString', 'bulk').count(), 5)
+        errors = []
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [3, 4, 5, 6, 7])
+
+    def step_046(self):
+        print("import from csv in parallel...")
+        tmc = TestModelCopy()
+        tmc.where('aString', 'bulk')
+        tmc.deleteall()
+        filename = f"{self.datapath}/{self.table.name()}Bulk.csv"
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, workers=2, chunk_size=64)
+        self.assertEqual(result, True)
+        self.assertEqual(tmc.where('aString', 'bulk').count(), 5)
+        errors = []
+        result = tmc.import_csv(filename=filename, offset=2, limit=5, workers=2, chunk_size=64,
+                                on_insert_error=lambda line, data: errors.append(line))
+        self.assertEqual(result, True)
+        self.assertEqual(errors, [3, 4, 5, 6, 7])
+
+    def step_047(self):
+        print("split csv at record boundaries...")
+        filename = f"{self.datapath}/multiline.csv"
+
+        with open(filename, mode='w', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
+            writer.writerow(['aKey', 'aString'])
+
+            for i in range(50):
+                writer.writerow([f'key{i}', f'line one\n"line" {i}\nline three'])
+
+        header_end, chunks = pda.csv_chunks(filename, 40)
+        self.assertGreater(len(chunks), 10)
+        rows = [row for start, end in chunks for row in pda.csv_rows(filename, start, end, {})]
+
+        with open(filename, mode='r', encoding='utf-8', newline='') as csvfile:
+            self.assertEqual(rows, list(csv.reader(csvfile))[1:])
+
+    def step_048(self):
+        print("connection pool...")
+        filename = f"{self.datapath}/{self.dbname}"
+        pda.Database().db_sq3(filename).pool(minsize=1, maxsize=2, timeout=0.5)
+        errors = []
+
+        def insert_rows(thread):
+            try:
+                tm = TestModel()
+
+                for i in range(20):
+                    if tm.insert({'aKey': f'PoolKey{thread}-{i}', 'aString': 'pool', 'aInt': i}) is False:
+                        errors.append(pda.LAST_DATABASE_EXCEPTION)
+            except pda.PDAException as pdaex:
+                errors.append(str(pdaex))
+
+        threads = [threading.Thread(target=insert_rows, args=(thread, )) for thread in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'pool').count(), 80)
+
+        held = threading.Event()
+        done = threading.Event()
+
+        def hold_connection():
+            holder = TestModel().begintransaction()
+            held.set()
+            done.wait()
+            holder.committransaction()
+
+        tm.begintransaction()  # this thread and the holder use both connections
+        holder = threading.Thread(target=hold_connection)
+        holder.start()
+        held.wait()
+        waiting = threading.Thread(target=insert_rows, args=('timeout', ))
+        waiting.start()
+        waiting.join()
+        done.set()
+        holder.join()
+        tm.committransaction()
+        self.assertEqual(len(errors), 1)
+        self.assertIn('no database connection available', errors[0])
+        self.db = pda.Database().db_sq3(filename)
+
+    def step_049(self):
+        print("read replicas...")
+        filename = f"{self.datapath}/{self.dbname}"
+        replicaname = f"{self.datapath}/replica.db"
+        replica = sqlite3.connect(replicaname)
+        self.db.connection().backup(replica)  # the replica lags behind from now on
+        replica.close()
+        pda.Database().replica_sq3(replicaname).read_your_writes(0.2)
+
+        tm = TestModel()
+        count = tm.where('aString', 'replica').count()
+        self.assertEqual(count, 0)
+        self.assertEqual(tm.insert({'aKey': 'ReplicaKey', 'aString': 'replica', 'aInt': 1}), True)
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'replica').count(), 1)  # read your writes on the primary
+
+        time.sleep(0.3)
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'replica').count(), 0)  # read from the replica
+        tm.begintransaction()
+        tm = TestModel()
+        self.assertEqual(tm.where('aString', 'replica').count(), 1)  # transactions stay on the primary
+        tm.committransaction()
+
+        pda.Database().read_your_writes(0)
+        tm = TestModel()
+        keys = []
+
+        for row in tm.limit(2).iterall():  # streamed from the replica, the writes of the loop go to the primary
+            self.assertEqual(tm.update(row['aId'], {'aString': 'streamed'}), True)
+            tm.begintransaction()
+            tm.delete(-1)
+            tm.committransaction()
+            keys.append(row['aId'])
+
+        self.db = pda.Database().db_sq3(filename)
+        self.assertEqual(sorted(row['aId'] for row in TestModel().where('aString', 'streamed').findall()), sorted(keys))
+        self.assertEqual(len(keys), 2)
+
+    def step_050(self):
+        print("named databases...")
+
+        class HotModel(TestModel):
+            _database: str = 'hot'
+
+        pda.Database('hot').db_sq3(':memory:')
+        pda.Database('archive').db_flat(self.datapath, 'archive.flat')
+        self.assertLessEqual({'archive', 'default', 'hot'}, set(pda.Database.databases()))
+
+        hot = HotModel()
+        archive = TestModel(database='archive')
+        self.assertEqual(hot.insert({'aKey': 'HotKey', 'aString': 'hot', 'aInt': 1}), True)
+        archive.where('aString', 'archive')
+        archive.deleteall()
+        self.assertEqual(archive.insert({'aKey': 'ArchiveKey', 'aString': 'archive', 'aInt': 1}), True)
+
+        self.assertIs(hot.database(), pda.Database('hot'))
+        self.assertEqual(HotModel().count(), 1)
+        self.assertEqual(TestModel(database='archive').where('aString', 'archive').count(), 1)
+        self.assertEqual(TestModel().where('aString', 'hot').count(), 0)
+        self.assertEqual(pda.Database().dbtype(), 'SQ3')
+
+        with self.assertRaises(pda.PDAException):
+            TestModel(database='unknown')
+
+    def step_051(self):
+        print("statement cache...")
+        tm = TestModel()
+        tm.where('aString', 'statement')
+        tm.deleteall()
+
+        for i in range(3):
+            self.assertEqual(tm.insert({'aKey': f'StatementKey{i}', 'aString': 'statement', 'aInt': i}), True)
+
+        key = tm.where('aKey', 'StatementKey1').findall()[0]['aId']
+        self.assertEqual(tm.update(key, {'aInt': 10, 'defaultcol': None}), True)
+        self.assertEqual(tm.find(key)['aInt'], 10)
+        self.assertEqual(tm.delete(key), True)
+        self.assertIsNone(tm.find(key))
+        statements = tm.instance._statements  # pylint: disable=protected-access
+        self.assertEqual(sorted(operation for operation, cols in statements), ['delete', 'find', 'insert', 'update'])
+
+        with self.assertRaises(pda.PDAException):
+            tm.insert({'aKey': 'StatementKey3', 'unknown': 1})
+
+    def step_052(self):
+        print("schema cache and lazy tables...")
+        statements = []
+        self.db.invalidate()
+        self.assertIn('Person', self.db.introspect())
+        self.db.connection().set_trace_callback(statements.append)
+
+        tm = TestModel()
+        self.assertEqual(statements, [])  # nothing is queried until the table is used
+
+        for i in range(3):
+            TestModel().count()
+
+        self.assertEqual([stmt for stmt in statements if 'PRAGMA' in stmt or 'sqlite_master' in stmt], [])
+        self.db.connection().set_trace_callback(None)
+
+        class SchemaModel(TestModel):
+            _name: str = 'PersonSchema'
+
+        SchemaModel().drop()
+        self.assertNotIn('extra', SchemaModel().fields())
+        self.db.execute("ALTER TABLE PersonSchema ADD COLUMN extra text")
+        self.assertNotIn('extra', SchemaModel().fields())  # cached until invalidated
+        self.db.invalidate('PersonSchema')
+        self.assertIn('extra', SchemaModel().fields())
+        self.assertEqual(tm.where('aString', 'statement').count(), 2)
+
+    def step_053(self):
+        print("row formats...")
+        tm = TestModel()
+        tm.where('aString', 'statement')
+        rows = tm.findall()
+        key = rows[0]['aId']
+
+        tm.where('aString', 'statement')
+        result = tm.rowformat('tuple').findall()
+        index = tm.rowindex()
+        self.assertEqual([row[index['aKey']] for row in result], [row['aKey'] for row in rows])
+
+        tm.where('aString', 'statement')
+        result = tm.rowformat('namedtuple').findall()
+        self.assertEqual([row.aKey for row in result], [row['aKey'] for row in rows])
+
+        tm.where('aString', 'statement')
+        result = list(tm.rowformat('slots').iterall(batch_size=1))
+        self.assertEqual([row.aKey for row in result], [row['aKey'] for row in rows])
+        self.assertEqual(result[0]['aInt'], rows[0]['aInt'])
+        self.assertFalse(hasattr(result[0], '__dict__'))
+
+        tm.where('aString', 'statement')
+        result = tm.rowformat('native').findall()
+        self.assertIsInstance(result[0], sqlite3.Row)
+        self.assertEqual(tm.rowformat('tuple').find(key)[index['aId']], key)
+        self.assertEqual(tm.find(key), rows[0])  # the format is reset after each query
+
+        with self.assertRaises(pda.PDAException):
+            tm.rowformat('xml')
+
+    def step_054(self):
+        print("columnar fetch...")
+        if pda.numpy is None:
+            print("numpy not installed, skipped")
+            return
+
+        tm = TestModel()
+        tm.where('aString', 'statement')
+        rows = tm.findall()
+        tm.where('aString', 'statement')
+        result = tm.findall_columns('aKey, aInt', batch_size=1)
+        self.assertEqual(list(result), ['aKey', 'aInt'])
+        self.assertEqual(result['aInt'].dtype, pda.numpy.int64)
+        self.assertEqual(result['aInt'].tolist(), [row['aInt'] for row in rows])
+        self.assertEqual(result['aKey'].tolist(), [row['aKey'] for row in rows])
+
+        tm.where('aString', 'nothing found')
+        self.assertEqual(len(tm.findall_columns()['aId']), 0)
+
+        with self.assertRaises(pda.PDAException):
+            tm.findall_columns('unknown')
+
+    def step_055(self):
+        print("asyncio api...")
+        pda.Database('async').db_sq3(f"{self.datapath}/async.db")
+        adb = aio.AsyncDatabase('async', workers=4, pool=True)
+
+        async def run():
+            await adb.table(TestModel).drop()
+            await asyncio.gather(*(adb.table(TestModel).insert({'aKey': f'AsyncKey{i}', 'aString': 'async', 'aInt': i})
+                                   for i in range(20)))
+            table = adb.table(TestModel)
+            self.assertEqual(await table.where('aString', 'async').count(), 20)
+            rows = await table.where('aInt', 10, '<').orderby('aInt', 'DESC').limit(3).findall()
+            self.assertEqual([row['aInt'] for row in rows], [9, 8, 7])
+            keys = [row['aKey'] async for row in table.where('aInt', 15, '>=').iterall(batch_size=2)]
+            self.assertEqual(sorted(keys), [f'AsyncKey{i}' for i in range(15, 20)])
+
+            async for row in table.where('aInt', 18, '>=').iterall(batch_size=1):  # the table is not held by the loop
+                self.assertEqual((await table.find(row['aId']))['aKey'], row['aKey'])
+                self.assertEqual(await table.where('aString', 'async').count(), 20)
+
+            await table.begintransaction()
+            await table.insert({'aKey': 'AsyncRollback', 'aString': 'async'})
+            self.assertEqual(await table.where('aKey', 'AsyncRollback').count(), 1)
+            await table.rollbacktransaction()
+            self.assertEqual(await adb.table(TestModel).where('aString', 'async').count(), 20)
+
+        asyncio.run(run())
+        adb.close()
+        self.assertTrue(adb.database().pooled())
+
+    def step_056(self):
+        print("coalesced finds...")
+        tm = TestModel(database='async')  # pooled since step_055, its connections can be used by any thread
+        tm.where('aInt', 5, '<')
+        rows = {row['aId']: row for row in tm.findall()}
+        loader = pda.FindLoader(TestModel, window=0.2, database='async')
+        results = {}
+
+        def find(key):
+            results[key] = loader.find(key)
+
+        keys = list(rows) + [str(key) for key in rows] + [-1]
+        threads = [threading.Thread(target=find, args=(key, )) for key in keys]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(loader.statistics(), {'requests': len(keys), 'queries': 1})
+        self.assertEqual({key: results[key] for key in rows}, rows)
+        self.assertEqual({key: results[str(key)] for key in rows}, rows)
+        self.assertIsNone(results[-1])
+
+        adb = aio.AsyncDatabase('async', workers=2)
+        async_loader = aio.AsyncFindLoader(adb, TestModel)
+        keys = list(rows)
+
+        async def run():
+            return await asyncio.gather(*(async_loader.find(key) for key in keys + keys[:2] + [-1]))
+
+        result = asyncio.run(run())
+        self.assertEqual(result, [rows[key] for key in keys + keys[:2]] + [None])
+        self.assertEqual(async_loader.statistics(), {'requests': len(keys) + 3, 'queries': 1})
+        adb.close()
+
+    def step_057(self):
+        print("result cache...")
+        pda.Database('cached').db_sq3(f"{self.datapath}/cached.db").cache(ttl=0.5, max_bytes=20000)
+        cache = pda.Database('cached').results()
+        tm = TestModel(database='cached')
+        tm.drop()
+        tm = TestModel(database='cached')
+        tm.insert_many({'aKey': f'CacheKey{i}', 'aString': 'cached', 'aInt': i} for i in range(10))
+
+        rows = tm.where('aInt', 5, '<').orderby('aInt').findall()
+        rows[0]['aInt'] = -1  # the cached rows are copies
+        self.assertEqual(tm.where('aInt', 5, '<').orderby('aInt').findall()[0]['aInt'], 0)
+        self.assertEqual(tm.where('aInt', 5, '<').count(), 5)
+        self.assertEqual(tm.where('aInt', 5, '<').count(), 5)
+        self.assertEqual(tm.rowformat(pda.ROWFORMAT_TUPLE).where('aInt', 5, '<').orderby('aInt').findall()[0][0], 1)
+        self.assertEqual(tm.rowformat(pda.ROWFORMAT_TUPLE).where('aInt', 5, '<').orderby('aInt').findall()[1][0], 2)
+        self.assertEqual(tm.rowindex()['aId'], 0)
+        statistics = cache.statistics()
+        self.assertEqual((statistics['hits'], statistics['misses'], statistics['entries']), (3, 3, 3))
+
+        tm.insert({'aKey': 'CacheKeyNew', 'aString': 'cached', 'aInt': 1})
+        self.assertEqual(cache.statistics()['entries'], 0)
+        self.assertEqual(tm.where('aInt', 5, '<').count(), 6)
+
+        time.sleep(0.6)
+        self.assertEqual(tm.where('aInt', 5, '<').count(), 6)
+        self.assertEqual(cache.statistics()['misses'], 5)
+
+        for i in range(10):  # the results of 10 rows each do not fit all
+            tm.where('aInt', i, '!=').findall()
+
+        statistics = cache.statistics()
+        self.assertGreater(statistics['evictions'], 0)
+        self.assertLessEqual(statistics['bytes'], 20000)
+        pda.Database('cached').cache(ttl=0)
+        self.assertIsNone(pda.Database('cached').results())
+
+    def step_058(self):
+        print("identity map...")
+        tm = TestModel().rowcache(5)
+        other = TestModel()
+        tm.insert({'aKey': 'RowcacheKey', 'aString': 'rowcache', 'aInt': 1})
+        key = tm.where('aKey', 'RowcacheKey').findfirst()['aId']
+
+        tm.find(key)['aString'] = 'changed by the caller'  # the kept row is a copy
+        self.assertEqual(tm.find(key)['aString'], 'rowcache')
+        self.assertEqual(tm.find(str(key))['aId'], key)
+        self.assertEqual(tm.rowmap().statistics(), {'hits': 2, 'misses': 1, 'rows': 1})
+
+        tm.update(key, {'aString': 'updated'})
+        self.assertEqual(tm.find(key)['aString'], 'updated')
+        other.update(key, {'aString': 'other'})
+        self.assertEqual(tm.find(key)['aString'], 'updated')  # not checked without a version column
+
+        tm.rowcache(5, 'aInt')
+        self.assertEqual(tm.find(key)['aString'], 'other')
+        other.update(key, {'aString': 'versioned', 'aInt': 2})
+        self.assertEqual(tm.find(key)['aString'], 'versioned')
+        self.assertEqual(tm.find(key)['aString'], 'versioned')
+        self.assertEqual(tm.rowmap().statistics()['hits'], 1)
+        other.delete(key)
+        self.assertIsNone(tm.find(key))
+
+        for row in tm.limit(10).findall():
+            tm.find(row['aId'])
+
+        self.assertEqual(tm.rowmap().statistics()['rows'], 5)
+
+        with self.assertRaises(pda.PDAException):
+            tm.rowcache(5, 'unknown')
+
+    def step_059(self):
+        print("statement hooks and slow query log...")
+        events = []
+
+        class Recorder(pda.StatementHook):
+            def after(self, event: dict):
+                events.append(dict(event))
+
+        logfile = Path(self.datapath) / 'slow.log'
+        logfile.unlink(missing_ok=True)
+        recorder = pda.add_hook(Recorder())
+        slowlog = pda.add_hook(pda.SlowQueryLog(str(logfile), threshold=0.0, max_bytes=200, backup_count=1))
+        errorlog = pda.add_hook(pda.SlowQueryLog(f"{self.datapath}/error.log", threshold=0.0, sample=0.0))
+        tm = TestModel()
+
+        try:
+            tm.where('aString', 'statement').findall()
+            tm.insert({'aKey': 'HookKey', 'aString': 'hook'})
+            self.assertEqual(tm.insert({'aKey': 'HookKey', 'aString': 'hook'}), False)
+        finally:
+            pda.remove_hook(recorder)
+            pda.remove_hook(slowlog)
+            pda.remove_hook(errorlog)
+            slowlog.close()
+            errorlog.close()
+
+        self.assertEqual([event['operation'] for event in events], ['fetchall', 'exec', 'exec'])
+        self.assertEqual(events[0]['params'], ('statement', ))
+        self.assertGreater(events[0]['rowcount'], 0)
+        self.assertGreater(events[0]['duration'], 0)
+        self.assertEqual((events[1]['rowcount'], events[1]['error']), (1, None))
+        self.assertIsInstance(events[2]['error'], sqlite3.IntegrityError)
+        self.assertEqual(slowlog.statistics(), {'statements': 3, 'slow': 3, 'errors': 1, 'logged': 3})
+        self.assertEqual(errorlog.statistics()['logged'], 1)  # no slow statement sampled, the failed one logged
+        self.assertIn('UNIQUE constraint failed', logfile.read_text(encoding='utf-8'))
+        self.assertTrue((Path(self.datapath) / 'slow.log.1').exists())  # rotated after 200 bytes
+
+        tm.insert({'aKey': 'HookKey2', 'aString': 'hook'})
+        self.assertEqual(len(events), 3)
+
+    def step_060(self):
+        print("asyncio with a synchronous database...")
+        pda.Database('memory').db_sq3(':memory:')
+        tm = TestModel(database='memory')
+        tm.insert({'aKey': 'MemoryKey', 'aString': 'memory'})
+
+        with self.assertRaises(pda.PDAException):  # every pooled connection would open an empty database
+            aio.AsyncDatabase('memory', pool=True)
+
+        self.assertFalse(pda.Database('memory').pooled())
+        self.assertEqual(TestModel(database='memory').count(), 1)
+
+        pda.Database('mixed').db_sq3(f"{self.datapath}/mixed.db")
+        tm = TestModel(database='mixed')
+        tm.drop()
+        tm = TestModel(database='mixed')
+        tm.insert({'aKey': 'SyncKey', 'aString': 'mixed'})
+
+        with self.assertRaises(pda.PDAException):  # the synchronous tables keep their connection
+            aio.AsyncDatabase('mixed')
+
+        self.assertFalse(pda.Database('mixed').pooled())
+        pda.Database('mixed').pool(maxsize=2)
+        adb = aio.AsyncDatabase('mixed', workers=2)
+
+        async def run():
+            table = adb.table(TestModel)
+            self.assertEqual(await table.where('aString', 'mixed').count(), 1)
+            await table.insert({'aKey': 'AsyncKey', 'aString': 'mixed'})
+
+        asyncio.run(run())
+        adb.close()
+        self.assertEqual(sorted(row['aKey'] for row in tm.where('aString', 'mixed').findall()), ['AsyncKey', 'SyncKey'])
+
+    def step_061(self):
+        print("result cache with a custom select...")
+        pda.Database('cached').cache(ttl=60)
+        tm = TestModel(database='cached')
+        copy = TestModelCopy(database='cached')
+        copy.drop()
+        copy = TestModelCopy(database='cached')
+        self.assertEqual(copy.count(), 0)
+        select = "SELECT Person.* FROM Person WHERE aKey IN (SELECT aKey FROM PersonCopy)"
+        self.assertEqual(tm.findall(select), [])
+        self.assertEqual(tm.count(select), 0)
+
+        copy.insert({'aKey': 'CacheKey1', 'aString': 'copied'})  # drops the results of PersonCopy only
+        self.assertEqual([row['aKey'] for row in tm.findall(select)], ['CacheKey1'])
+        self.assertEqual(tm.count(select), 1)
+        self.assertEqual(pda.Database('cached').results().statistics()['entries'], 0)
+        pda.Database('cached').cache(ttl=0)
+
     def _steps(self):
         for name in dir(self):
             if name.startswith("step"):